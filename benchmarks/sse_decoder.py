@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of the event stream decoder.
+
+Compares the original ``iter_lines`` based loop with `EventStream` at several chunk sizes on a
+synthetic stream of prefetched result events.
+
+    python benchmarks/sse_decoder.py [--events 20000] [--payload 2048]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import timeit
+
+from requests import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from watercrawl.events import EventStream  # noqa: E402
+
+
+def legacy_process_eventstream(response: Response):
+    for line in response.iter_lines():
+        line = line.decode('utf-8')
+        if line.startswith('data:'):
+            line = line[5:].strip()
+            data = json.loads(line)
+            yield data
+
+
+def make_stream(events: int, payload: int) -> bytes:
+    lines = []
+    for i in range(events):
+        if i % 50 == 0:
+            lines.append(b': keep-alive\n\n')
+        event = {'type': 'result', 'data': {'uuid': str(i), 'url': f'https://example.com/{i}',
+                                            'result': {'markdown': 'x' * payload}}}
+        lines.append(b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n')
+    return b''.join(lines)
+
+
+def make_response(body: bytes) -> Response:
+    response = Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--payload', type=int, default=2048)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    body = make_stream(args.events, args.payload)
+    candidates = [('iter_lines (legacy)', lambda: legacy_process_eventstream(make_response(body)))]
+    for chunk_size in (512, 8 * 1024, 64 * 1024, 256 * 1024):
+        candidates.append((
+            f'EventStream chunk_size={chunk_size}',
+            lambda chunk_size=chunk_size: EventStream(make_response(body), chunk_size=chunk_size),
+        ))
+
+    print(f'{args.events} events, {len(body) / 1024 / 1024:.1f} MiB, best of {args.repeat}')
+    baseline = None
+    for name, factory in candidates:
+        best = min(timeit.repeat(lambda: sum(1 for _ in factory()), number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f'{name:<36} {best * 1000:9.1f} ms  {args.events / best:12.0f} events/s  {baseline / best:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-call overhead of each transport.
+
+Runs small status calls (`get_crawl_request`) against a local keep-alive HTTP server, so the numbers
+are dominated by client-side work rather than network latency.
+
+    python benchmarks/transport_overhead.py [--calls 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from watercrawl import WaterCrawlAPIClient  # noqa: E402
+
+BODY = json.dumps({'uuid': '00000000-0000-0000-0000-000000000000', 'status': 'running'}).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in a single segment so delayed ACKs do not dominate the timings.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/'
+
+    transports = ['requests', 'urllib3']
+    try:
+        import httpx  # noqa: F401
+        transports.append('httpx')
+    except ImportError:
+        pass
+
+    print(f'{args.calls} sequential get_crawl_request calls, best of {args.repeat}')
+    baseline = None
+    for name in transports:
+        client = WaterCrawlAPIClient('key', base_url=base_url, transport=name)
+        client.get_crawl_request('warmup')
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                client.get_crawl_request('00000000-0000-0000-0000-000000000000')
+            best = min(best, time.perf_counter() - start)
+        client.transport.close()
+        per_call = best / args.calls * 1e6
+        baseline = baseline or per_call
+        print(f'{name:<10} {per_call:8.1f} us/call  {baseline / per_call:5.2f}x')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
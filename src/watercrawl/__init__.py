@@ -1,9 +1,59 @@
 from .api import WaterCrawlAPIClient
+from .archive import CrawlArchive
+from .buffering import BufferedMonitor
+from .bulk import BulkResult
+from .dedup import NearDuplicateFilter, MinHasher
+from .graph import LinkGraph, LinkGraphBuilder
+from .journal import JobJournal, JournalEntry, ResumableJob
+from .limiter import AdaptiveLimiter, LimiterStats
+from .monitoring import InstrumentedMonitor, MonitorStats
+from .pipeline import UrlPipeline, SearchScrapePipeline, SitemapCrawlPipeline
+from .postprocess import PostProcessor, Chunk
+from .planner import CrawlPlanner, BatchCrawlHandle, plan_batches
+from .scheduler import Scheduler, WorkloadClass, WorkloadStats
+from .search import MultiSearch
+from .sitemap import SitemapIndex, SitemapDiff
+from .tracing import Tracer, Span
+from .transport import Transport, RequestsTransport, Urllib3Transport, HTTPXTransport
 
 version = '0.1.0'
 
 __all__ = [
     'WaterCrawlAPIClient',
+    'BulkResult',
+    'CrawlArchive',
+    'SitemapIndex',
+    'SitemapDiff',
+    'CrawlPlanner',
+    'BatchCrawlHandle',
+    'plan_batches',
+    'InstrumentedMonitor',
+    'MonitorStats',
+    'BufferedMonitor',
+    'Tracer',
+    'Span',
+    'Transport',
+    'RequestsTransport',
+    'Urllib3Transport',
+    'HTTPXTransport',
+    'Scheduler',
+    'WorkloadClass',
+    'WorkloadStats',
+    'JobJournal',
+    'JournalEntry',
+    'ResumableJob',
+    'MultiSearch',
+    'UrlPipeline',
+    'SearchScrapePipeline',
+    'SitemapCrawlPipeline',
+    'PostProcessor',
+    'Chunk',
+    'NearDuplicateFilter',
+    'MinHasher',
+    'LinkGraph',
+    'LinkGraphBuilder',
+    'AdaptiveLimiter',
+    'LimiterStats',
 ]
 
 __version__ = version
@@ -1,92 +1,222 @@
 import json
-from typing import Union, Generator, Literal
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
+from typing import Union, Generator, Literal, Iterable, Iterator, Callable, Dict, IO, List
 from urllib.parse import urljoin
 import warnings
 
 import requests
 from requests import Response
+from requests.exceptions import RequestException
+
+from .archive import CrawlArchive
+from .bulk import BulkResult, run_bulk, collect_from_pages, iter_completed, unique_ids
+from .events import EventStream, MonitorStream, DEFAULT_CHUNK_SIZE
+from .limiter import AdaptiveLimiter
+from .pipeline import SearchScrapePipeline, SitemapCrawlPipeline
+from .polling import MONITOR_MODES, AdaptiveInterval, FallbackMonitor, poll_request
+from .projection import Spec, compile_fields, event_decoder, project
+from .scheduler import Scheduler, scheduled
+from .search import MultiSearch
+from .streaming import iter_json_items, write_chunks
+from .tracing import Tracer, traced
+from .transport import Transport, RequestsTransport, get_transport
 
 
 class BaseAPIClient:
-    def __init__(self, api_key, base_url):
+    def __init__(self, api_key, base_url, tracer: Tracer = None, http2: bool = False,
+                 transport: Union[str, Transport] = None, scheduler: Scheduler = None,
+                 limiter: AdaptiveLimiter = None):
         self.api_key = api_key
         self.base_url = base_url
-        self.session = self.init_session()
+        self.tracer = tracer
+        self.scheduler = scheduler
+        self.limiter = limiter
+        if limiter is not None and scheduler is not None:
+            # The scheduler admits calls in priority order within the limiter's current limit.
+            scheduler.set_max_concurrency(limiter.limit)
+            limiter.add_listener(scheduler.set_max_concurrency)
+        self.http2 = http2
+        self.transport = self.init_transport(transport)
+
+    @property
+    def session(self):
+        """
+        The calling thread's ``requests.Session`` with the default transport, or the transport itself for
+        other backends. Set headers on ``transport.headers`` to apply them to every thread.
+
+        Assigning a ``requests.Session`` replaces the transport with a `RequestsTransport` that sends every
+        request, from any thread, through that session.
+        """
+        return getattr(self.transport, 'session', self.transport)
+
+    @session.setter
+    def session(self, session: requests.Session):
+        self.transport = RequestsTransport(session=session)
 
     def init_session(self):
         session = requests.Session()
-        session.headers.update({'X-API-Key': self.api_key})
-        session.headers.update({'Content-Type': 'application/json'})
-        session.headers.update({'Accept': 'application/json'})
-        session.headers.update({'User-Agent': 'WaterCrawl-Plugin'})
-        session.headers.update({'Accept-Language': 'en-US'})
+        session.headers.update(self.default_headers())
         return session
 
+    def init_transport(self, transport: Union[str, Transport] = None) -> Transport:
+        if transport in (None, 'requests') and not self.http2:
+            transport = RequestsTransport(session_factory=self.init_session)
+        else:
+            transport = get_transport(transport, http2=self.http2)
+        transport.headers.update(self.default_headers())
+        return transport
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def default_headers(self) -> dict:
+        return {
+            'X-API-Key': self.api_key,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'WaterCrawl-Plugin',
+            'Accept-Language': 'en-US',
+        }
+
+    def _span(self, name: str, category: str = 'client', **args):
+        if self.tracer is None:
+            return nullcontext(args)
+        return self.tracer.span(name, category, **args)
+
+    def workload_for(self, endpoint: str):
+        """Scheduler workload of calls to ``endpoint`` made outside of a `Scheduler.workload` block."""
+        return None
+
+    def _request(self, method: str, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
+        if self.scheduler is None:
+            return self.__limited(method, endpoint, query_params, data, **kwargs)
+        workload = self.scheduler.current_workload() or self.workload_for(endpoint) or self.scheduler.default_workload
+        with self._span('queue', 'scheduler', workload=workload):
+            self.scheduler.acquire(workload)
+        try:
+            return self.__limited(method, endpoint, query_params, data, **kwargs)
+        finally:
+            self.scheduler.release(workload)
+
+    def __limited(self, method: str, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
+        if self.limiter is None:
+            return self.__send(method, endpoint, query_params, data, **kwargs)
+        with self._span('queue', 'limiter', limit=self.limiter.limit):
+            started = self.limiter.acquire(block=self.scheduler is None)
+        try:
+            response = self.__send(method, endpoint, query_params, data, **kwargs)
+        except (RequestException, OSError):
+            self.limiter.release(started, error=True)
+            raise
+        except BaseException:
+            self.limiter.cancel()
+            raise
+        self.limiter.release(started, status=response.status_code)
+        return response
+
+    def __send(self, method: str, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
+        with self._span(method, 'http', endpoint=endpoint):
+            return self.transport.request(
+                method,
+                urljoin(self.base_url, endpoint),
+                params=query_params,
+                json=data, **kwargs
+            )
+
     def _get(self, endpoint: str, query_params: dict = None, **kwargs):
-        return self.session.get(
-            urljoin(self.base_url, endpoint),
-            params=query_params,
-            **kwargs
-        )
+        return self._request('GET', endpoint, query_params=query_params, **kwargs)
 
     def _post(self, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
-        return self.session.post(
-            urljoin(self.base_url, endpoint),
-            params=query_params,
-            json=data, **kwargs
-        )
+        return self._request('POST', endpoint, query_params=query_params, data=data, **kwargs)
 
     def _put(self, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
-        return self.session.put(
-            urljoin(self.base_url, endpoint),
-            params=query_params,
-            json=data, **kwargs
-        )
+        return self._request('PUT', endpoint, query_params=query_params, data=data, **kwargs)
 
     def _delete(self, endpoint: str, query_params: dict = None, **kwargs):
-        return self.session.delete(
-            urljoin(self.base_url, endpoint),
-            params=query_params,
-            **kwargs
-        )
+        return self._request('DELETE', endpoint, query_params=query_params, **kwargs)
 
     def _patch(self, endpoint: str, query_params: dict = None, data: dict = None, **kwargs):
-        return self.session.patch(
-            urljoin(self.base_url, endpoint),
-            params=query_params,
-            json=data, **kwargs
-        )
+        return self._request('PATCH', endpoint, query_params=query_params, data=data, **kwargs)
 
 
 class WaterCrawlAPIClient(BaseAPIClient):
-    def __init__(self, api_key, base_url: str = 'https://app.watercrawl.dev/'):
-        super().__init__(api_key, base_url)
-
-    def process_eventstream(self, response: Response):
-        for line in response.iter_lines():
-            line = line.decode('utf-8')
-            if line.startswith('data:'):
-                line = line[5:].strip()
-                data = json.loads(line)
-                yield data
-
-    def process_response(self, response: Response) -> Union[dict, bytes, list, None, Generator]:
-        response.raise_for_status()
-        if response.status_code == 204:
-            return None
-        if response.headers.get('Content-Type') == 'application/json':
-            return response.json()
+    def __init__(self, api_key, base_url: str = 'https://app.watercrawl.dev/',
+                 eventstream_chunk_size: int = DEFAULT_CHUNK_SIZE, tracer: Tracer = None, http2: bool = False,
+                 transport: Union[str, Transport] = None, scheduler: Scheduler = None,
+                 monitor_mode: Literal['stream', 'poll', 'auto'] = 'stream', stall_timeout: float = 60.0,
+                 max_workers: int = 8, limiter: AdaptiveLimiter = None):
+        super().__init__(api_key, base_url, tracer=tracer, http2=http2, transport=transport, scheduler=scheduler,
+                         limiter=limiter)
+        if monitor_mode not in MONITOR_MODES:
+            raise ValueError(f'Unknown monitor mode: {monitor_mode}. Supported modes are: {", ".join(MONITOR_MODES)}.')
+        self.eventstream_chunk_size = eventstream_chunk_size
+        self.monitor_mode = monitor_mode
+        self.stall_timeout = stall_timeout
+        self.poll_min_interval = 1.0
+        self.poll_max_interval = 15.0
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool running the `submit_*` calls, created on first use with ``max_workers`` threads."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='watercrawl')
+            return self._executor
+
+    def close(self):
+        """Wait for submitted calls, shut down the thread pool and close the transport."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        super().close()
 
-        if response.headers.get('Content-Type') == 'application/octet-stream':
-            return response.content
+    def workload_for(self, endpoint: str):
+        for marker, workload in (('/crawl-requests/', 'crawl'), ('/search/', 'search'), ('/sitemaps/', 'sitemap')):
+            if marker in endpoint:
+                return workload
+        return None
+
+    def process_eventstream(self, response: Response, fields: Spec = None) -> EventStream:
+        decode = event_decoder(fields)
+        if self.tracer is not None:
+            decode = self.tracer.wrap(decode, 'event', 'sse')
+        return EventStream(response, chunk_size=self.eventstream_chunk_size, decode=decode)
+
+    def process_response(self, response: Response, fields: Spec = None) -> Union[dict, bytes, list, None, Generator]:
+        content_type = response.headers.get('Content-Type')
+        with self._span('process_response', 'decode', status=response.status_code, content_type=content_type):
+            response.raise_for_status()
+            if response.status_code == 204:
+                return None
+            if content_type == 'application/json':
+                if fields:
+                    return project(response.content, fields)
+                return response.json()
 
-        if response.headers.get('Content-Type') == 'text/event-stream':
-            return self.process_eventstream(response)
+            if content_type == 'application/octet-stream':
+                return response.content
 
-        if response.headers.get('Content-Type') == 'application/zip':
-            return response.content
+            if content_type == 'text/event-stream':
+                return self.process_eventstream(response, fields)
 
-        raise Exception(f'Unknown response type: {response.headers.get("Content-Type")}')
+            if content_type == 'application/zip':
+                return response.content
+
+            raise Exception(f'Unknown response type: {content_type}')
 
     def get_crawl_requests_list(self, page: int = None, page_size: int = None):
         query_params = {
@@ -166,36 +296,135 @@ class WaterCrawlAPIClient(BaseAPIClient):
             )
         )
 
-    def monitor_crawl_request(self, item_id: str, download=True) -> Generator:
-        return self.process_response(
-            self._get(
-                f'/api/v1/core/crawl-requests/{item_id}/status/',
-                stream=True,
-                query_params={
-                    'prefetched': download
-                }
-            )
+    @traced()
+    def download_crawl_request_archive(self, item_id: str, spool_max_size: int = 16 * 1024 * 1024,
+                                       chunk_size: int = 1024 * 1024) -> CrawlArchive:
+        """
+        Download the crawl request archive into a spooled temporary file and open it lazily.
+
+        Args:
+            item_id: UUID of the crawl request
+            spool_max_size: Archives larger than this many bytes are spooled to disk instead of memory
+            chunk_size: Number of bytes read from the network per write
+
+        Returns:
+            CrawlArchive reading entries from the temporary file on demand
+        """
+        response = self._get(
+            f'/api/v1/core/crawl-requests/{item_id}/download/',
+            stream=True,
         )
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        try:
+            with response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    spool.write(chunk)
+            spool.seek(0)
+            return CrawlArchive(spool)
+        except BaseException:
+            spool.close()
+            raise
+
+    def monitor_crawl_request(self, item_id: str, download=True, fields: List[str] = None,
+                              mode: Literal['stream', 'poll', 'auto'] = None,
+                              stop_on_close: bool = False) -> MonitorStream:
+        """
+        Monitor a crawl request in real-time.
+
+        Args:
+            item_id: UUID of the crawl request to monitor
+            download: If True, download results; if False, return URLs
+            fields: Dotted paths (e.g. ``url``, ``result.markdown``) to keep from each result event's data;
+                other keys are skipped without being decoded
+            mode: ``stream`` reads the event stream, ``poll`` polls the request and its results pages, and
+                ``auto`` streams but switches to polling when the stream stalls for ``stall_timeout``
+                seconds or breaks (default: the client's ``monitor_mode``)
+            stop_on_close: Stop the crawl request if the monitor is closed before it reached a final state
+
+        Returns:
+            Closeable MonitorStream; use it in a ``with`` block to release its connection when leaving early
+
+        Yields:
+            Dictionary containing event type and data
+        """
+        spec = compile_fields(fields) if fields else None
+        return self.__monitor(
+            mode,
+            lambda timeout: self.process_response(
+                self._get(
+                    f'/api/v1/core/crawl-requests/{item_id}/status/',
+                    stream=True,
+                    query_params={
+                        'prefetched': download
+                    },
+                    timeout=timeout,
+                ),
+                fields=spec,
+            ),
+            lambda: self.get_crawl_request(item_id),
+            lambda page, page_size: self.get_crawl_request_results(
+                item_id, page=page, page_size=page_size, download=download, fields=fields
+            ),
+            stop=(lambda: self.stop_crawl_request(item_id)) if stop_on_close else None,
+        )
+
+    def __monitor(self, mode: str, open_stream, get_request, get_results_page=None, stop=None) -> MonitorStream:
+        mode = mode or self.monitor_mode
+        if mode not in MONITOR_MODES:
+            raise ValueError(f'Unknown monitor mode: {mode}. Supported modes are: {", ".join(MONITOR_MODES)}.')
+
+        def poll(seen=None):
+            interval = AdaptiveInterval(self.poll_min_interval, self.poll_max_interval)
+            return poll_request(get_request, get_results_page, interval=interval, seen=seen)
 
-    def get_crawl_request_results(self, item_id: str, page: int = None, page_size: int = None, download=False):
+        if mode == 'stream':
+            monitor = open_stream(None)
+        elif mode == 'poll':
+            monitor = MonitorStream(poll())
+        else:
+            monitor = FallbackMonitor(lambda: open_stream((self.stall_timeout, self.stall_timeout)), poll)
+        if isinstance(monitor, MonitorStream):
+            monitor.on_abandon = stop
+        return monitor
+
+    def get_crawl_request_results(self, item_id: str, page: int = None, page_size: int = None, download=False,
+                                  fields: List[str] = None):
+        """
+        Get a page of crawl request results.
+
+        Args:
+            item_id: UUID of the crawl request
+            page: Page number (1-indexed, default: 1)
+            page_size: Number of items per page (default: 10)
+            download: If True, download results; if False, return URLs
+            fields: Dotted paths to keep from each result object, see `monitor_crawl_request`
+        """
         query_params = {
             'page': page or 1,
             'page_size': page_size or 10,
             'prefetched': download
         }
+        spec = None
+        if fields:
+            spec = {'count': True, 'next': True, 'previous': True, 'results': compile_fields(fields)}
         return self.process_response(
             self._get(
                 f'/api/v1/core/crawl-requests/{item_id}/results/',
                 query_params=query_params,
-            )
+            ),
+            fields=spec,
         )
 
+    @traced()
+    @scheduled('interactive')
     def scrape_url(self,
                    url: str,
                    page_options: dict = None,
                    plugin_options: dict = None,
                    sync: bool = True,
-                   download: bool = True
+                   download: bool = True,
+                   fields: List[str] = None
                    ):
         result = self.create_crawl_request(
             url=url,
@@ -205,9 +434,11 @@ class WaterCrawlAPIClient(BaseAPIClient):
         if not sync:
             return result
 
-        for result in self.monitor_crawl_request(result['uuid'], download):
-            if result['type'] == 'result':
-                return result['data']
+        with self._span('monitor', uuid=result['uuid']), \
+                self.monitor_crawl_request(result['uuid'], download, fields=fields) as events:
+            for result in events:
+                if result['type'] == 'result':
+                    return result['data']
 
     def download_result(self, result_object: dict):
         """[DEPRECATED] Download and parse the result object if necessary. Will be removed in a future version."""
@@ -262,6 +493,50 @@ class WaterCrawlAPIClient(BaseAPIClient):
 
         raise ValueError(f'Unknown format: {output_format}. Supported formats are: json, graph, markdown.')
 
+    def iter_crawl_request_sitemap(self, crawl_request: Union[str, dict], chunk_size: int = 64 * 1024) -> Generator:
+        """
+        Stream the JSON sitemap of a crawl request, yielding one sitemap entry at a time.
+
+        Args:
+            crawl_request: UUID or crawl request object
+            chunk_size: Number of bytes read from the network at a time
+
+        Yields:
+            Sitemap entries, parsed incrementally so memory stays flat regardless of the sitemap size
+        """
+        crawl_request = self.__get_crawl_request_for_sitemap(crawl_request)
+        with requests.get(crawl_request['sitemap'], stream=True) as response:
+            response.raise_for_status()
+            yield from iter_json_items(response.iter_content(chunk_size=chunk_size))
+
+    @traced()
+    def download_crawl_request_sitemap(self, crawl_request: Union[str, dict], sink: Union[str, IO[bytes]],
+                                       output_format: str = 'json', chunk_size: int = 64 * 1024) -> int:
+        """
+        Stream the sitemap of a crawl request to a file without loading it into memory.
+
+        Args:
+            crawl_request: UUID or crawl request object
+            sink: Path or binary file object to write to
+            output_format: One of json, graph, markdown
+            chunk_size: Number of bytes read from the network at a time
+
+        Returns:
+            Number of bytes written
+        """
+        crawl_request = self.__get_crawl_request_for_sitemap(crawl_request)
+        if output_format == 'json':
+            response = requests.get(crawl_request['sitemap'], stream=True)
+        elif output_format in ('graph', 'markdown'):
+            response = self._get(
+                f'/api/v1/core/crawl-requests/{crawl_request["uuid"]}/sitemap/{output_format}/',
+                stream=True,
+            )
+        else:
+            raise ValueError(f'Unknown format: {output_format}. Supported formats are: json, graph, markdown.')
+
+        return self.__write_response(response, sink, chunk_size)
+
     def download_sitemap(self, crawl_request: Union[str, dict]) -> Union[dict, list]:
         """
         [DEPRECATED] Download the sitemap for a given crawl request. use `get_crawl_request_sitemap` instead.
@@ -332,6 +607,8 @@ class WaterCrawlAPIClient(BaseAPIClient):
             )
         )
 
+    @traced()
+    @scheduled('interactive')
     def create_search_request(self, query: str, search_options: dict = None, result_limit: int = 5, sync: bool = True,
                               download: bool = True) -> Union[dict, Generator]:
         """
@@ -370,34 +647,46 @@ class WaterCrawlAPIClient(BaseAPIClient):
         if not sync:
             return response
 
-        for result in self.monitor_search_request(response['uuid'], download):
-            if result['type'] == 'state' and result['data']['status'] in ["finished", "failed"]:
-                return result['data']
+        with self._span('monitor', uuid=response['uuid']), \
+                self.monitor_search_request(response['uuid'], download) as events:
+            for result in events:
+                if result['type'] == 'state' and result['data']['status'] in ["finished", "failed"]:
+                    return result['data']
 
         raise Exception('Search request failed')
 
-    def monitor_search_request(self, item_id: str, download=True) -> Generator:
+    def monitor_search_request(self, item_id: str, download=True,
+                               mode: Literal['stream', 'poll', 'auto'] = None,
+                               stop_on_close: bool = False) -> MonitorStream:
         """
         Monitor a search request in real-time.
         
         Args:
             item_id: UUID of the search request to monitor
             download: If True, download results; if False, return URLs
+            mode: Monitoring mode, see `monitor_crawl_request`
+            stop_on_close: Stop the search request if the monitor is closed before it reached a final state
             
         Returns:
-            Generator yielding search events
+            Closeable MonitorStream yielding search events
             
         Yields:
             Dictionary containing event type and data
         """
-        return self.process_response(
-            self._get(
-                f'/api/v1/core/search/{item_id}/status/',
-                stream=True,
-                query_params={
-                    'prefetched': download
-                }
-            )
+        return self.__monitor(
+            mode,
+            lambda timeout: self.process_response(
+                self._get(
+                    f'/api/v1/core/search/{item_id}/status/',
+                    stream=True,
+                    query_params={
+                        'prefetched': download
+                    },
+                    timeout=timeout,
+                )
+            ),
+            lambda: self.get_search_request(item_id, download=download),
+            stop=(lambda: self.stop_search_request(item_id)) if stop_on_close else None,
         )
 
     def stop_search_request(self, item_id: str) -> None:
@@ -504,28 +793,98 @@ class WaterCrawlAPIClient(BaseAPIClient):
 
         raise ValueError(f'Unknown format: {output_format}. Supported formats are: json, graph, markdown.')
 
-    def monitor_sitemap_request(self, item_id: str, download: bool = True) -> Generator:
+    def iter_sitemap_results(self, sitemap_request: Union[str, dict], chunk_size: int = 64 * 1024) -> Generator:
+        """
+        Stream the JSON sitemap results, yielding one sitemap entry at a time.
+        :param sitemap_request: UUID or sitemap request object
+        :param chunk_size: Number of bytes read from the network at a time
+        :return: Generator of sitemap entries, parsed incrementally
+        """
+        if isinstance(sitemap_request, str):
+            sitemap_request = self.get_sitemap_request(sitemap_request)
+
+        if 'result' not in sitemap_request or not sitemap_request['result']:
+            raise ValueError('Sitemap not found in sitemap request')
+
+        result = sitemap_request['result']
+        if isinstance(result, (dict, list)):
+            yield from result if isinstance(result, list) else [result]
+            return
+
+        with requests.get(result, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_json_items(response.iter_content(chunk_size=chunk_size))
+
+    @traced()
+    def download_sitemap_results(self, sitemap_request: Union[str, dict], sink: Union[str, IO[bytes]],
+                                 output_format: Literal['json', 'graph', 'markdown'] = 'json',
+                                 chunk_size: int = 64 * 1024) -> int:
+        """
+        Stream the sitemap results to a file without loading them into memory.
+        :param sitemap_request: UUID or sitemap request object
+        :param sink: Path or binary file object to write to
+        :param output_format: One of json, graph, markdown
+        :param chunk_size: Number of bytes read from the network at a time
+        :return: Number of bytes written
+        """
+        if isinstance(sitemap_request, str):
+            sitemap_request = self.get_sitemap_request(sitemap_request)
+
+        if 'result' not in sitemap_request or not sitemap_request['result']:
+            raise ValueError('Sitemap not found in sitemap request')
+
+        if output_format == 'json':
+            if isinstance(sitemap_request['result'], (dict, list)):
+                return write_chunks([json.dumps(sitemap_request['result']).encode('utf-8')], sink)
+            response = requests.get(sitemap_request['result'], stream=True)
+        elif output_format in ('graph', 'markdown'):
+            response = self._get(
+                f'/api/v1/core/sitemaps/{sitemap_request["uuid"]}/{output_format}/',
+                stream=True,
+            )
+        else:
+            raise ValueError(f'Unknown format: {output_format}. Supported formats are: json, graph, markdown.')
+
+        return self.__write_response(response, sink, chunk_size)
+
+    @staticmethod
+    def __write_response(response: Response, sink: Union[str, IO[bytes]], chunk_size: int) -> int:
+        with response:
+            response.raise_for_status()
+            return write_chunks(response.iter_content(chunk_size=chunk_size), sink)
+
+    def monitor_sitemap_request(self, item_id: str, download: bool = True,
+                                mode: Literal['stream', 'poll', 'auto'] = None,
+                                stop_on_close: bool = False) -> MonitorStream:
         """
         Monitor a sitemap request in real-time.
 
         Args:
             item_id: UUID of the sitemap request to monitor
             download: If True, download results; if False, return URLs
+            mode: Monitoring mode, see `monitor_crawl_request`
+            stop_on_close: Stop the sitemap request if the monitor is closed before it reached a final state
 
         Returns:
-            Generator yielding sitemap events
+            Closeable MonitorStream yielding sitemap events
 
         Yields:
             Dictionary containing event type and data
         """
-        return self.process_response(
-            self._get(
-                f'/api/v1/core/sitemaps/{item_id}/status/',
-                stream=True,
-                query_params={
-                    'prefetched': download
-                }
-            )
+        return self.__monitor(
+            mode,
+            lambda timeout: self.process_response(
+                self._get(
+                    f'/api/v1/core/sitemaps/{item_id}/status/',
+                    stream=True,
+                    query_params={
+                        'prefetched': download
+                    },
+                    timeout=timeout,
+                )
+            ),
+            lambda: self.get_sitemap_request(item_id),
+            stop=(lambda: self.stop_sitemap_request(item_id)) if stop_on_close else None,
         )
 
     def stop_sitemap_request(self, item_id: str) -> None:
@@ -540,3 +899,287 @@ class WaterCrawlAPIClient(BaseAPIClient):
                 f'/api/v1/core/sitemaps/{item_id}/',
             )
         )
+
+    @traced()
+    def stop_crawl_requests(self, item_ids: Iterable[str], max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Stop many crawl requests concurrently.
+
+        Args:
+            item_ids: UUIDs of the crawl requests to stop
+            max_workers: Maximum number of stop calls in flight
+
+        Returns:
+            Dictionary mapping each UUID to its BulkResult
+        """
+        return run_bulk(self.stop_crawl_request, item_ids, max_workers=max_workers)
+
+    @traced()
+    def stop_search_requests(self, item_ids: Iterable[str], max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Stop many search requests concurrently.
+
+        Args:
+            item_ids: UUIDs of the search requests to stop
+            max_workers: Maximum number of stop calls in flight
+
+        Returns:
+            Dictionary mapping each UUID to its BulkResult
+        """
+        return run_bulk(self.stop_search_request, item_ids, max_workers=max_workers)
+
+    @traced()
+    def stop_sitemap_requests(self, item_ids: Iterable[str], max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Stop many sitemap requests concurrently.
+
+        Args:
+            item_ids: UUIDs of the sitemap requests to stop
+            max_workers: Maximum number of stop calls in flight
+
+        Returns:
+            Dictionary mapping each UUID to its BulkResult
+        """
+        return run_bulk(self.stop_sitemap_request, item_ids, max_workers=max_workers)
+
+    @traced()
+    def get_crawl_requests(self, item_ids: Iterable[str], max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Get the details of many crawl requests concurrently.
+
+        Args:
+            item_ids: UUIDs of the crawl requests
+            max_workers: Maximum number of GET calls in flight
+
+        Returns:
+            Dictionary mapping each UUID to its BulkResult
+        """
+        return run_bulk(self.get_crawl_request, item_ids, max_workers=max_workers)
+
+    @traced()
+    def get_crawl_requests_status(self, item_ids: Iterable[str], page_size: int = 100, max_pages: int = 3,
+                                  max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Get a status snapshot for many crawl requests.
+
+        The first pages of the list endpoint are read first so that recent requests cost one call per page
+        instead of one call per UUID. Requests not found in the scanned pages are fetched individually.
+        No more pages are read than there are UUIDs, since each page costs as much as a GET.
+
+        Args:
+            item_ids: UUIDs of the crawl requests
+            page_size: Number of items requested per list page
+            max_pages: Maximum number of list pages to scan before falling back to individual GETs, None for
+                one page per UUID
+            max_workers: Maximum number of fallback GET calls in flight
+
+        Returns:
+            Dictionary mapping each UUID to its BulkResult
+        """
+        return self.__get_requests_status(
+            self.get_crawl_requests_list, self.get_crawl_request, item_ids, page_size, max_pages, max_workers
+        )
+
+    @traced()
+    def get_search_requests_status(self, item_ids: Iterable[str], page_size: int = 100, max_pages: int = 3,
+                                   max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Get a status snapshot for many search requests.
+
+        Works like `get_crawl_requests_status` using the search request endpoints.
+        """
+        return self.__get_requests_status(
+            self.get_search_requests_list, self.get_search_request, item_ids, page_size, max_pages, max_workers
+        )
+
+    @traced()
+    def get_sitemap_requests_status(self, item_ids: Iterable[str], page_size: int = 100, max_pages: int = 3,
+                                    max_workers: int = 8) -> Dict[str, BulkResult]:
+        """
+        Get a status snapshot for many sitemap requests.
+
+        Works like `get_crawl_requests_status` using the sitemap request endpoints.
+        """
+        return self.__get_requests_status(
+            self.get_sitemap_requests_list, self.get_sitemap_request, item_ids, page_size, max_pages, max_workers
+        )
+
+    def __get_requests_status(self, list_func, get_func, item_ids, page_size, max_pages, max_workers):
+        item_ids = unique_ids(item_ids)
+        found = collect_from_pages(
+            lambda page, size: list_func(page=page, page_size=size),
+            item_ids,
+            page_size=page_size,
+            max_pages=len(item_ids) if max_pages is None else min(max_pages, len(item_ids)),
+        )
+        missing = run_bulk(get_func, [item_id for item_id in item_ids if item_id not in found], max_workers)
+        return {
+            item_id: BulkResult(item_id, result=found[item_id]) if item_id in found else missing[item_id]
+            for item_id in item_ids
+        }
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Run ``func(*args, **kwargs)`` on the client's thread pool.
+
+        The call runs in a copy of the caller's context, so a scheduler workload chosen by the caller applies.
+        The client can be shared between threads: with the default transport every pool thread uses its own
+        session. A submitted call must not wait for other submitted calls, which could exhaust the pool.
+
+        Returns:
+            Future of the call's result
+        """
+        return self.executor.submit(copy_context().run, func, *args, **kwargs)
+
+    def submit_scrape(self, url: str, **kwargs) -> Future:
+        """Future of `scrape_url`."""
+        return self.submit(self.scrape_url, url, **kwargs)
+
+    def submit_crawl(self, url: Union[list, str], **kwargs) -> Future:
+        """Future of `create_crawl_request`."""
+        return self.submit(self.create_crawl_request, url, **kwargs)
+
+    def submit_search(self, query: str, **kwargs) -> Future:
+        """Future of `create_search_request`."""
+        return self.submit(self.create_search_request, query, **kwargs)
+
+    def submit_get_results(self, item_id: str, **kwargs) -> Future:
+        """Future of `get_crawl_request_results`."""
+        return self.submit(self.get_crawl_request_results, item_id, **kwargs)
+
+    def map_completed(self, func: Callable, items: Iterable, max_in_flight: int = None,
+                      **kwargs) -> Iterator[BulkResult]:
+        """
+        Call ``func(item, **kwargs)`` for every item on the client's thread pool.
+
+        Items are submitted lazily, keeping at most ``max_in_flight`` calls (default: twice ``max_workers``)
+        pending.
+
+        Yields:
+            A BulkResult per item, in completion order, with errors captured instead of raised
+        """
+        return iter_completed(
+            lambda item: self.submit(func, item, **kwargs),
+            items,
+            max_in_flight=max_in_flight or 2 * self.max_workers,
+        )
+
+    def map_scrape(self, urls: Iterable[str], max_in_flight: int = None, **kwargs) -> Iterator[BulkResult]:
+        """`scrape_url` for every URL, yielding a BulkResult per URL in completion order."""
+        return self.map_completed(self.scrape_url, urls, max_in_flight=max_in_flight, **kwargs)
+
+    def map_search(self, queries: Iterable[str], max_in_flight: int = None, **kwargs) -> Iterator[BulkResult]:
+        """`create_search_request` for every query, yielding a BulkResult per query in completion order."""
+        return self.map_completed(self.create_search_request, queries, max_in_flight=max_in_flight, **kwargs)
+
+    @traced()
+    def search_many(self, queries: Iterable[str], search_options: dict = None, result_limit: int = 5,
+                    download: bool = True, dedupe: bool = True, max_in_flight: int = None) -> MultiSearch:
+        """
+        Run many searches concurrently and merge their results.
+
+        Searches run on the client's thread pool, see `map_search`. Results are yielded as soon as each search
+        finishes, every result carrying the ``query`` that found it, and URLs found by several queries are
+        yielded once.
+
+        Args:
+            queries: Search queries, duplicates are searched once
+            search_options: Search options shared by all queries, see `create_search_request`
+            result_limit: Maximum number of results per query
+            download: If True, download results; if False, the result file URL of each search is yielded
+            dedupe: Yield each URL only for the first query that found it
+            max_in_flight: Maximum number of searches submitted at a time (default: twice ``max_workers``)
+
+        Returns:
+            MultiSearch iterator, also exposing `queries_by_url`, `errors` and `duplicates`
+        """
+        outcomes = self.map_search(
+            unique_ids(queries),
+            max_in_flight=max_in_flight,
+            search_options=search_options,
+            result_limit=result_limit,
+            download=download,
+        )
+        return MultiSearch(outcomes, dedupe=dedupe)
+
+    def search_and_scrape(self, query: str, search_options: dict = None, result_limit: int = 5,
+                          max_concurrency: int = 4, batch_size: int = 1, batch_wait: float = 1.0,
+                          page_options: dict = None, plugin_options: dict = None,
+                          download: bool = True) -> SearchScrapePipeline:
+        """
+        Search and scrape the hits, starting each scrape as soon as its hit appears.
+
+        Scrapes run on the client's thread pool while the search is still running, and scraped pages are
+        yielded in completion order, hiding most of the search latency behind the scraping.
+
+        Args:
+            query: Search query
+            search_options: Search options, see `create_search_request`
+            result_limit: Maximum number of search results
+            max_concurrency: Maximum number of scrapes or batch crawl requests running at the same time
+            batch_size: URLs per batch crawl request, 1 scrapes each hit with `scrape_url`
+            batch_wait: Seconds to wait for a batch to fill up before submitting it partially filled
+            page_options: Page options of the scrapes
+            plugin_options: Plugin options of the scrapes
+            download: If True, download results; if False, return URLs
+
+        Returns:
+            SearchScrapePipeline yielding a BulkResult per scraped page, keyed by URL
+        """
+        return SearchScrapePipeline(
+            self,
+            query,
+            search_options=search_options,
+            result_limit=result_limit,
+            max_concurrency=max_concurrency,
+            batch_size=batch_size,
+            batch_wait=batch_wait,
+            page_options=page_options,
+            plugin_options=plugin_options,
+            download=download,
+        )
+
+    def discover_and_crawl(self, url: str, sitemap_options: dict = None, include: List[str] = None,
+                           exclude: List[str] = None, max_depth: int = None, batch_size: int = 50,
+                           batch_wait: float = 2.0, max_concurrency: int = 4, spider_options: dict = None,
+                           page_options: dict = None, plugin_options: dict = None,
+                           download: bool = True) -> SitemapCrawlPipeline:
+        """
+        Generate the sitemap of a site and crawl its URLs while they are discovered.
+
+        URLs from the sitemap monitor's ``feed`` events are filtered, deduplicated and crawled in batch crawl
+        requests of up to ``batch_size`` URLs on the client's thread pool, so crawling overlaps with discovery.
+        URLs missing from the feed are picked up from the finished sitemap.
+
+        Args:
+            url: Site to generate the sitemap of
+            sitemap_options: Options of the sitemap request, see `create_sitemap_request`
+            include: Patterns a URL must match to be crawled; patterns starting with ``/`` match the path
+            exclude: Patterns excluding a URL from the crawl
+            max_depth: Skip URLs with more path segments than this
+            batch_size: Maximum number of URLs per batch crawl request
+            batch_wait: Seconds to wait for a batch to fill up before submitting it partially filled
+            max_concurrency: Maximum number of batch crawl requests running at the same time
+            spider_options: Spider options of the batch crawl requests
+            page_options: Page options of the batch crawl requests
+            plugin_options: Plugin options of the batch crawl requests
+            download: If True, download results; if False, return URLs
+
+        Returns:
+            SitemapCrawlPipeline yielding a BulkResult per crawled page, keyed by URL
+        """
+        return SitemapCrawlPipeline(
+            self,
+            url,
+            sitemap_options=sitemap_options,
+            include=include,
+            exclude=exclude,
+            max_depth=max_depth,
+            batch_size=batch_size,
+            batch_wait=batch_wait,
+            max_concurrency=max_concurrency,
+            spider_options=spider_options,
+            page_options=page_options,
+            plugin_options=plugin_options,
+            download=download,
+        )
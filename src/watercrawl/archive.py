@@ -0,0 +1,102 @@
+import json
+import os
+import zipfile
+from typing import IO, Dict, Generator, List, Optional, Tuple, Union
+
+
+class CrawlArchive:
+    """
+    Random-access reader over a downloaded crawl request archive.
+
+    The archive is read straight from a (spooled) file, entries are only decompressed when they are
+    opened, and results are decoded one at a time.
+    """
+
+    def __init__(self, file: Union[str, os.PathLike, IO[bytes]], close_file: bool = True):
+        """
+        Args:
+            file: Path or seekable binary file object holding the zip archive
+            close_file: If True, close the file object together with the archive
+        """
+        self._file = file if hasattr(file, 'read') else None
+        self._close_file = close_file and self._file is not None
+        self._zip = zipfile.ZipFile(file)
+        self._url_index: Optional[Dict[str, str]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.result_names())
+
+    def __iter__(self):
+        return self.iter_results()
+
+    def close(self):
+        self._zip.close()
+        if self._close_file:
+            self._file.close()
+
+    def entries(self) -> List[zipfile.ZipInfo]:
+        """List archive members without decompressing them."""
+        return [info for info in self._zip.infolist() if not info.is_dir()]
+
+    def result_names(self) -> List[str]:
+        """Names of the members holding a JSON result object."""
+        return [info.filename for info in self.entries() if info.filename.endswith('.json')]
+
+    def open(self, name: str) -> IO[bytes]:
+        """Open a single member as a streaming binary file object."""
+        return self._zip.open(name)
+
+    def read_result(self, name: str) -> dict:
+        """Decode a single result member."""
+        with self.open(name) as f:
+            return json.load(f)
+
+    def iter_results(self, with_names: bool = False) -> Generator[Union[dict, Tuple[str, dict]], None, None]:
+        """
+        Lazily decode every result member in archive order.
+
+        Args:
+            with_names: If True, yield ``(member_name, result)`` tuples instead of bare results
+        """
+        index = {} if self._url_index is None else None
+        for name in self.result_names():
+            result = self.read_result(name)
+            if index is not None:
+                self.__index_result(index, name, result)
+            yield (name, result) if with_names else result
+
+        if index is not None:
+            self._url_index = index
+
+    def build_url_index(self) -> Dict[str, str]:
+        """Build (once) and return the mapping of page URL to member name."""
+        if self._url_index is None:
+            for _ in self.iter_results():
+                pass
+        return self._url_index
+
+    def member_for_url(self, url: str) -> Optional[str]:
+        return self.build_url_index().get(url)
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the decoded result for ``url``, or None if the archive does not contain it."""
+        name = self.member_for_url(url)
+        if name is None:
+            return None
+        return self.read_result(name)
+
+    @staticmethod
+    def __index_result(index: Dict[str, str], name: str, result: dict):
+        if not isinstance(result, dict):
+            return
+        url = result.get('url')
+        if url is None and isinstance(result.get('metadata'), dict):
+            url = result['metadata'].get('url')
+        if url is not None:
+            index.setdefault(url, name)
@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Iterable, Optional
+
+from .events import close_monitor
+
+
+class BufferedMonitor:
+    """
+    Reads a `monitor_*` event stream eagerly on a background thread.
+
+    Events are kept in a bounded in-memory queue. When the queue is full, further events are appended to a
+    local spill file and read back once the queue has drained, so a slow consumer neither stalls the server
+    stream nor grows memory without bound. The consumer sees the events in their original order.
+    """
+
+    def __init__(
+            self,
+            events: Iterable[dict],
+            max_queue: int = 1000,
+            spill: bool = True,
+            spill_path: str = None
+    ):
+        """
+        Args:
+            events: Iterator returned by one of the `monitor_*` methods
+            max_queue: Maximum number of events held in memory
+            spill: If True, overflow is spilled to disk; if False, reading pauses while the queue is full
+            spill_path: Spill file to use, a temporary file is created (and removed on close) if not given
+        """
+        if max_queue < 1:
+            raise ValueError('max_queue must be at least 1')
+        self.events = events
+        self.max_queue = max_queue
+        self.spill = spill
+        self.spill_path = spill_path
+
+        self.spilled_total = 0
+        self._iterator = iter(events)
+        self._queue = deque()
+        self._spilled = 0
+        self._spill_writer = None
+        self._spill_reader = None
+        self._owns_spill_file = False
+        self._done = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self.__pump, name='watercrawl-buffered-monitor', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        with self._cond:
+            while True:
+                if self._queue:
+                    event = self._queue.popleft()
+                    self._cond.notify_all()
+                    return event
+                if self._spilled:
+                    return self.__read_spilled()
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                if self._done or self._closed:
+                    raise StopIteration
+                self._cond.wait()
+
+    @property
+    def pending(self) -> int:
+        """Number of events read from the server but not yet consumed."""
+        with self._cond:
+            return len(self._queue) + self._spilled
+
+    def close(self):
+        """Stop reading, release the underlying stream and remove a temporary spill file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+
+        close_monitor(self.events)
+        self._thread.join(timeout=5)
+
+        with self._cond:
+            self._queue.clear()
+            self._spilled = 0
+            for f in (self._spill_writer, self._spill_reader):
+                if f is not None:
+                    f.close()
+            self._spill_writer = self._spill_reader = None
+            if self._owns_spill_file and os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+
+    def __pump(self):
+        try:
+            for event in self._iterator:
+                with self._cond:
+                    while not self.spill and len(self._queue) >= self.max_queue and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    # Once spilling started, keep spilling until the file is drained to preserve ordering.
+                    if self._spilled or len(self._queue) >= self.max_queue:
+                        self.__write_spilled(event)
+                    else:
+                        self._queue.append(event)
+                    self._cond.notify_all()
+        except BaseException as e:
+            with self._cond:
+                if not self._closed:
+                    self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def __write_spilled(self, event: dict):
+        if self._spill_writer is None:
+            if self.spill_path is None:
+                fd, self.spill_path = tempfile.mkstemp(prefix='watercrawl-monitor-', suffix='.jsonl')
+                os.close(fd)
+                self._owns_spill_file = True
+            self._spill_writer = open(self.spill_path, 'ab')
+            self._spill_reader = open(self.spill_path, 'rb')
+            self._spill_reader.seek(self._spill_writer.tell())
+        self._spill_writer.write(json.dumps(event).encode('utf-8') + b'\n')
+        self._spill_writer.flush()
+        self._spilled += 1
+        self.spilled_total += 1
+
+    def __read_spilled(self) -> dict:
+        event = json.loads(self._spill_reader.readline())
+        self._spilled -= 1
+        if not self._spilled and self._owns_spill_file:
+            # Everything on disk has been consumed, start over with an empty file.
+            self._spill_writer.truncate(0)
+            self._spill_reader.seek(0)
+        return event
@@ -0,0 +1,121 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+@dataclass
+class BulkResult:
+    """Outcome of a single call made as part of a bulk operation."""
+    item_id: str
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def unique_ids(item_ids: Iterable[str]) -> List[str]:
+    """Drop duplicate ids while keeping their first-seen order."""
+    return list(dict.fromkeys(item_ids))
+
+
+def run_bulk(func: Callable[[str], Any], item_ids: Iterable[str], max_workers: int = 8) -> Dict[str, BulkResult]:
+    """
+    Call ``func(item_id)`` for every id on a bounded thread pool.
+
+    Errors are captured per id instead of aborting the whole batch. Calls run in a copy of the caller's
+    context, so a scheduler workload chosen by the caller applies to them.
+
+    Args:
+        func: Callable taking a single request UUID
+        item_ids: Request UUIDs, duplicates are called only once
+        max_workers: Maximum number of calls in flight at the same time
+
+    Returns:
+        Dictionary mapping each id to its BulkResult, in input order
+    """
+    item_ids = unique_ids(item_ids)
+    if not item_ids:
+        return {}
+
+    context = copy_context()
+
+    def call(item_id: str) -> BulkResult:
+        try:
+            return BulkResult(item_id, result=context.copy().run(func, item_id))
+        except Exception as e:
+            return BulkResult(item_id, error=e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(item_ids)))) as executor:
+        return {outcome.item_id: outcome for outcome in executor.map(call, item_ids)}
+
+
+def iter_completed(submit: Callable[[Any], Future], items: Iterable, max_in_flight: int = 16) -> Iterator[BulkResult]:
+    """
+    Submit a call for every item and yield their outcomes as they complete.
+
+    Items are consumed lazily so that at most ``max_in_flight`` calls are pending at a time, and errors are
+    captured per item.
+
+    Args:
+        submit: Callable taking an item and returning a Future of its result
+        items: Items to submit, duplicates included
+        max_in_flight: Maximum number of submitted calls not yet yielded
+
+    Yields:
+        A BulkResult per item, in completion order
+    """
+    pending: Dict[Future, Any] = {}
+    try:
+        for item in items:
+            while len(pending) >= max(1, max_in_flight):
+                yield from _pop_completed(pending)
+            pending[submit(item)] = item
+        while pending:
+            yield from _pop_completed(pending)
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _pop_completed(pending: Dict[Future, Any]) -> Iterator[BulkResult]:
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        item = pending.pop(future)
+        error = future.exception()
+        yield BulkResult(item, error=error) if error is not None else BulkResult(item, result=future.result())
+
+
+def collect_from_pages(
+        list_page: Callable[[int, int], dict],
+        item_ids: Iterable[str],
+        page_size: int = 100,
+        max_pages: int = None
+) -> Dict[str, dict]:
+    """
+    Walk a paginated list endpoint until every wanted id has been seen.
+
+    Args:
+        list_page: Callable taking ``(page, page_size)`` and returning a paginated response
+        item_ids: Request UUIDs to look for
+        page_size: Number of items requested per page
+        max_pages: Stop after this many pages even if some ids are still missing
+
+    Returns:
+        Dictionary mapping the ids that were found to their list entries
+    """
+    wanted = set(item_ids)
+    found = {}
+    page = 1
+    while wanted and (max_pages is None or page <= max_pages):
+        response = list_page(page, page_size)
+        for item in response.get('results') or []:
+            if item.get('uuid') in wanted:
+                wanted.discard(item['uuid'])
+                found[item['uuid']] = item
+        if not response.get('next'):
+            break
+        page += 1
+    return found
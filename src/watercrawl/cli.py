@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, Set, TextIO
+
+from .api import WaterCrawlAPIClient
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` calls per second with bursts of up to ``burst`` calls."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+def read_inputs(sources: Iterable[str]) -> Iterator[str]:
+    """Yield non-empty, non-comment lines from files, ``-`` meaning stdin."""
+    for source in sources:
+        f = sys.stdin if source == '-' else open(source, encoding='utf-8')
+        try:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def completed_inputs(path: str, done_key: str = None) -> Set[str]:
+    """
+    Inputs already written successfully to a JSONL output file.
+
+    With ``done_key``, an input only counts once a record holding that key was written for it, for jobs
+    writing several records whose last one marks completion.
+    """
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption.
+                continue
+            if isinstance(record, dict) and 'error' not in record and (done_key is None or done_key in record):
+                done.add(record.get('input'))
+    return done
+
+
+def written_results(path: str) -> Dict[str, int]:
+    """Number of ``result`` records written to a JSONL output file for every input."""
+    counts = Counter()
+    if not path or not os.path.exists(path):
+        return counts
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and 'result' in record:
+                counts[record.get('input')] += 1
+    return counts
+
+
+def drop_partial_line(path: str):
+    """Truncate a file after its last newline, removing a record cut short by an interruption."""
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 64 * 1024)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def run_jobs(
+        inputs: Iterable[str],
+        job: Callable[[str], Iterable[dict]],
+        output: TextIO,
+        concurrency: int = 8,
+        rate: float = None
+) -> dict:
+    """
+    Run ``job`` for every input with bounded concurrency and write its records as JSON lines.
+
+    Inputs are read lazily, so at most ``concurrency`` jobs run at a time, and every record is written as
+    soon as its job yields it. A failed input gets a ``{"input": ..., "error": ...}`` record after the
+    records it yielded before failing.
+    """
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    write_lock = threading.Lock()
+    stats = {'succeeded': 0, 'failed': 0}
+
+    def write(record: dict):
+        with write_lock:
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+
+    def execute(item: str):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            for record in job(item):
+                write(dict(record, input=item))
+            outcome = 'succeeded'
+        except Exception as e:
+            write({'input': item, 'error': f'{type(e).__name__}: {e}'})
+            outcome = 'failed'
+        with write_lock:
+            stats[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for item in inputs:
+            if len(pending) >= concurrency:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending.add(executor.submit(execute, item))
+        wait(pending)
+    return stats
+
+
+def scrape_job(client: WaterCrawlAPIClient, args):
+    page_options = json.loads(args.page_options) if args.page_options else None
+    plugin_options = json.loads(args.plugin_options) if args.plugin_options else None
+
+    def job(url):
+        yield {'result': client.scrape_url(url, page_options=page_options, plugin_options=plugin_options)}
+
+    return job
+
+
+def search_job(client: WaterCrawlAPIClient, args):
+    search_options = json.loads(args.search_options) if args.search_options else None
+
+    def job(query):
+        yield {'result': client.create_search_request(
+            query, search_options=search_options, result_limit=args.result_limit
+        )}
+
+    return job
+
+
+def export_job(client: WaterCrawlAPIClient, args):
+    # Results already written by an interrupted run, set by main with --resume.
+    written = getattr(args, 'written', None) or {}
+
+    def job(item_id):
+        exported = written.get(item_id, 0)
+        page, skip = divmod(exported, args.page_size)
+        page += 1
+        while True:
+            response = client.get_crawl_request_results(item_id, page=page, page_size=args.page_size, download=True)
+            for result in response['results'][skip:]:
+                exported += 1
+                yield {'result': result}
+            if not response.get('next'):
+                break
+            page, skip = page + 1, 0
+        # Marks the export as complete for --resume.
+        yield {'exported': exported}
+
+    return job
+
+
+COMMANDS = {
+    'scrape': (scrape_job, 'Scrape one URL per input line'),
+    'search': (search_job, 'Run one search query per input line'),
+    'export': (export_job, 'Export all results of one crawl request UUID per input line'),
+}
+
+# Key of the record marking an input as complete, for commands writing several records per input.
+DONE_KEYS = {'export': 'exported'}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='watercrawl', description='Bulk WaterCrawl jobs from the command line.')
+    parser.add_argument('--api-key', default=os.environ.get('WATERCRAWL_API_KEY'),
+                        help='API key (default: $WATERCRAWL_API_KEY)')
+    parser.add_argument('--base-url', default=os.environ.get('WATERCRAWL_BASE_URL', 'https://app.watercrawl.dev/'))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('inputs', nargs='*', default=['-'], help='Input files, one item per line (default: stdin)')
+        sub.add_argument('-o', '--output', help='JSONL output file (default: stdout)')
+        sub.add_argument('-c', '--concurrency', type=int, default=8, help='Jobs running at the same time')
+        sub.add_argument('-r', '--rate', type=float, help='Maximum jobs started per second')
+        sub.add_argument('--resume', action='store_true',
+                         help='Append to --output and skip inputs it already holds a successful record for')
+        if name == 'scrape':
+            sub.add_argument('--page-options', help='page_options as a JSON object')
+            sub.add_argument('--plugin-options', help='plugin_options as a JSON object')
+        elif name == 'search':
+            sub.add_argument('--search-options', help='search_options as a JSON object')
+            sub.add_argument('--result-limit', type=int, default=5)
+        elif name == 'export':
+            sub.add_argument('--page-size', type=int, default=100)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.api_key:
+        print('An API key is required, pass --api-key or set WATERCRAWL_API_KEY.', file=sys.stderr)
+        return 2
+    if args.resume and not args.output:
+        print('--resume requires --output.', file=sys.stderr)
+        return 2
+
+    inputs = read_inputs(args.inputs)
+    if args.resume:
+        if os.path.exists(args.output):
+            drop_partial_line(args.output)
+        done = completed_inputs(args.output, DONE_KEYS.get(args.command))
+        inputs = (item for item in inputs if item not in done)
+        if args.command in DONE_KEYS:
+            args.written = written_results(args.output)
+
+    client = WaterCrawlAPIClient(args.api_key, base_url=args.base_url)
+    job = COMMANDS[args.command][0](client, args)
+
+    output = open(args.output, 'a' if args.resume else 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        stats = run_jobs(inputs, job, output, concurrency=max(1, args.concurrency), rate=args.rate)
+    except KeyboardInterrupt:
+        print('Interrupted, rerun with --resume to continue.', file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{stats['succeeded']} succeeded, {stats['failed']} failed", file=sys.stderr)
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import random
+import re
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .postprocess import html_to_text, normalize_text, result_text
+from .sitemap import entry_url
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Upper bound on signature matrix columns computed at once by the NumPy backend (about 32 MB at 128 permutations).
+_MAX_COLUMNS = 32768
+
+BACKENDS = ('auto', 'numpy', 'python')
+
+
+def _numpy(required: bool = False):
+    try:
+        import numpy
+    except ImportError:
+        if required:
+            raise ImportError(
+                'The numpy backend requires NumPy, install it with: pip install "watercrawl-py[numpy]"'
+            )
+        return None
+    return numpy
+
+
+def shingles(text: str, size: int = 5) -> List[int]:
+    """
+    32-bit hashes of the word ``size``-grams of a text, lowercased.
+
+    A text shorter than ``size`` words is a single shingle; an empty text has none.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return []
+    if len(words) <= size:
+        return [zlib.crc32(' '.join(words).encode())]
+    return list({zlib.crc32(' '.join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)})
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Number of bands and rows per band whose LSH threshold, ``(1 / bands) ** (1 / rows)``, is closest to
+    the Jaccard similarity ``threshold``.
+    """
+    candidates = [(bands, num_perm // bands) for bands in range(1, num_perm + 1)]
+    return min(candidates, key=lambda pair: abs((1 / pair[0]) ** (1 / pair[1]) - threshold))
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets, in batches.
+
+    With NumPy installed, a batch is hashed with one vectorized matrix operation; otherwise a pure Python
+    loop computes the same signatures.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1, backend: str = 'auto'):
+        """
+        Args:
+            num_perm: Number of hash permutations, the signature length
+            seed: Seed of the permutations; signatures are only comparable between equal seeds
+            backend: ``numpy``, ``python``, or ``auto`` to use NumPy when it is installed
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown backend: {backend}. Supported backends are: {", ".join(BACKENDS)}.')
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        # Coefficients below 2 ** 31 keep ``a * x + b`` under 2 ** 64 for 32-bit x, so NumPy's uint64 is exact.
+        self._a = [rng.randrange(1, 1 << 31) for _ in range(num_perm)]
+        self._b = [rng.randrange(0, 1 << 31) for _ in range(num_perm)]
+        self._np = None if backend == 'python' else _numpy(required=backend == 'numpy')
+
+    @property
+    def backend(self) -> str:
+        return 'numpy' if self._np is not None else 'python'
+
+    def signatures(self, shingle_sets: Sequence[Sequence[int]]) -> List[Tuple[int, ...]]:
+        """Signatures of non-empty shingle sets."""
+        if self._np is None:
+            return [self.__python_signature(hashes) for hashes in shingle_sets]
+        signatures = []
+        start = 0
+        while start < len(shingle_sets):
+            end, columns = start, 0
+            while end < len(shingle_sets) and (end == start or columns + len(shingle_sets[end]) <= _MAX_COLUMNS):
+                columns += len(shingle_sets[end])
+                end += 1
+            signatures.extend(self.__numpy_signatures(shingle_sets[start:end]))
+            start = end
+        return signatures
+
+    def __python_signature(self, hashes: Sequence[int]) -> Tuple[int, ...]:
+        return tuple(
+            min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in hashes)
+            for a, b in zip(self._a, self._b)
+        )
+
+    def __numpy_signatures(self, shingle_sets: Sequence[Sequence[int]]) -> List[Tuple[int, ...]]:
+        np = self._np
+        offsets = np.cumsum([0] + [len(hashes) for hashes in shingle_sets[:-1]])
+        x = np.fromiter((x for hashes in shingle_sets for x in hashes), dtype=np.uint64)
+        a = np.array(self._a, dtype=np.uint64)[:, None]
+        b = np.array(self._b, dtype=np.uint64)[:, None]
+        hashed = ((a * x[None, :] + b) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+        minimums = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return [tuple(row) for row in minimums.tolist()]
+
+
+class NearDuplicateFilter:
+    """
+    Flags near-duplicate pages in crawl results with MinHash and LSH banding.
+
+    Page texts are shingled into word n-grams and signed in batches. Signatures are split into bands; pages
+    sharing a band with an earlier page are compared by estimated Jaccard similarity, so each page is checked
+    against a handful of candidates instead of every page seen. A page at or above ``threshold`` similarity is
+    a duplicate of the first page it matches.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.8,
+            num_perm: int = 128,
+            shingle_size: int = 5,
+            source: str = 'markdown',
+            mode: str = 'filter',
+            batch_size: int = 256,
+            seed: int = 1,
+            backend: str = 'auto'
+    ):
+        """
+        Args:
+            threshold: Estimated Jaccard similarity from which pages are duplicates
+            num_perm: MinHash signature length; longer signatures estimate similarity more precisely
+            shingle_size: Number of words per shingle
+            source: ``markdown`` or ``html``, the result field compared
+            mode: ``filter`` drops duplicates, ``tag`` adds a ``duplicate_of`` key to every result object
+            batch_size: Maximum number of results signed at once
+            seed: Seed of the MinHash permutations
+            backend: ``numpy``, ``python``, or ``auto`` to use NumPy when it is installed
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError('threshold must be in (0, 1]')
+        if mode not in ('filter', 'tag'):
+            raise ValueError('mode must be "filter" or "tag"')
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.source = source
+        self.mode = mode
+        self.batch_size = batch_size
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed, backend=backend)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.duplicates = 0
+        self.seen = 0
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[Tuple[int, ...]] = []
+        self._keys: List[str] = []
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        """Index a text; returns the key of the earlier text it duplicates, or None."""
+        return self.add_many([(key, text)])[0]
+
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> List[Optional[str]]:
+        """Index ``(key, text)`` pairs as one batch; returns the key each duplicates, or None, in order."""
+        items = [(key, shingles(text, self.shingle_size)) for key, text in items]
+        signed = [index for index, (_, hashes) in enumerate(items) if hashes]
+        signatures = self.hasher.signatures([items[index][1] for index in signed])
+        originals: List[Optional[str]] = [None] * len(items)
+        for index, signature in zip(signed, signatures):
+            originals[index] = self.__index(items[index][0], signature)
+        return originals
+
+    def similarity(self, first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    def filter(self, results: Iterable) -> Iterator:
+        """
+        Drop or tag near-duplicates in a stream of monitor events or result objects.
+
+        Results are buffered until ``batch_size`` of them are waiting or another event arrives, then signed
+        together and yielded in their original order. Results without downloaded content pass through.
+        """
+        pending: List = []
+        for item in results:
+            if result_text(item, self.source) is None:
+                yield from self.__flush(pending)
+                pending = []
+                yield item
+                continue
+            pending.append(item)
+            if len(pending) >= self.batch_size:
+                yield from self.__flush(pending)
+                pending = []
+        yield from self.__flush(pending)
+
+    def __flush(self, pending: List) -> Iterator:
+        if not pending:
+            return
+        items = []
+        for item in pending:
+            text, is_html, _ = result_text(item, self.source)
+            data = item.get('data') if item.get('type') == 'result' else item
+            items.append((entry_url(data), normalize_text(html_to_text(text) if is_html else text)))
+        for item, original in zip(pending, self.add_many(items)):
+            if original is not None and self.mode == 'filter':
+                continue
+            if self.mode == 'tag':
+                if item.get('type') == 'result':
+                    item = dict(item, data=dict(item['data'], duplicate_of=original))
+                else:
+                    item = dict(item, duplicate_of=original)
+            yield item
+
+    def __index(self, key: str, signature: Tuple[int, ...]) -> Optional[str]:
+        self.seen += 1
+        bands = [signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+        checked = set()
+        for buckets, band in zip(self._buckets, bands):
+            for candidate in buckets.get(band, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if self.similarity(signature, self._signatures[candidate]) >= self.threshold:
+                    self.duplicates += 1
+                    return self._keys[candidate]
+        # Only originals are indexed, duplicates are attributed to the first page of their cluster.
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        for buckets, band in zip(self._buckets, bands):
+            buckets.setdefault(band, []).append(position)
+        return None
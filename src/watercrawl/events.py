@@ -0,0 +1,185 @@
+import json
+from types import GeneratorType
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional
+
+import urllib3
+from requests import Response
+from requests.exceptions import ChunkedEncodingError, ConnectionError
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+FINAL_STATUSES = ('finished', 'failed', 'canceled', 'cancelled')
+
+
+def is_final_state(event: dict) -> bool:
+    data = event.get('data') if isinstance(event, dict) else None
+    return event.get('type') == 'state' and isinstance(data, dict) and data.get('status') in FINAL_STATUSES
+
+
+def iter_response_chunks(response: Response, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read a streaming response in chunks of up to ``chunk_size`` bytes.
+
+    ``raw.read1`` is used when available since it returns whatever is already buffered instead of
+    blocking until a full chunk has arrived, which keeps event latency low with large chunk sizes.
+    """
+    raw = getattr(response, 'raw', None)
+    read1 = getattr(raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+
+    while True:
+        try:
+            chunk = read1(chunk_size, decode_content=True)
+        except TypeError:
+            chunk = read1(chunk_size)
+        except urllib3.exceptions.ProtocolError as e:
+            raise ChunkedEncodingError(e)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise ConnectionError(e)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_sse_data(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """
+    Split a server-sent events byte stream into the payloads of its ``data`` lines.
+
+    Lines are split at the byte level and only ``data`` payloads are sliced out, so comments,
+    keep-alives and other fields are never decoded.
+
+    Args:
+        chunks: Raw byte chunks of the stream
+
+    Yields:
+        The stripped payload of every ``data:`` line, as bytes
+    """
+    pending = []
+    for chunk in chunks:
+        if b'\n' not in chunk:
+            # Part of a line longer than a chunk, join once the line is complete.
+            pending.append(chunk)
+            continue
+        if pending:
+            pending.append(chunk)
+            chunk = b''.join(pending)
+        lines = chunk.split(b'\n')
+        pending = [lines.pop()]
+        for line in lines:
+            if line[:5] == b'data:':
+                yield line[5:].strip()
+    line = b''.join(pending)
+    if line[:5] == b'data:':
+        yield line[5:].strip()
+
+
+class MonitorStream:
+    """
+    Closeable iterator over the events returned by the ``monitor_*`` methods.
+
+    Reading it to the end, calling `close` or leaving its ``with`` block releases the underlying connection
+    at once. If ``on_abandon`` is set, closing it before the request reached a final state also calls
+    ``on_abandon``, which the ``monitor_*`` methods use to stop the remote request.
+    """
+
+    def __init__(self, events: Iterator[dict], on_abandon: Optional[Callable[[], Any]] = None):
+        self.on_abandon = on_abandon
+        self.finished = False
+        self.closed = False
+        self._events = events
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        if self.closed:
+            raise StopIteration
+        try:
+            event = next(self._events)
+        except BaseException:
+            # Ended or failed on its own, nothing was abandoned.
+            self.closed = True
+            self._release()
+            raise
+        if is_final_state(event):
+            self.finished = True
+        return event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Release the connection and, if the request has not finished, call ``on_abandon``."""
+        if self.closed:
+            return
+        self.closed = True
+        self._release()
+        if self.on_abandon is not None and not self.finished:
+            self.on_abandon()
+
+    def _release(self):
+        close = getattr(self._events, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # Being read on another thread, which stops once its connection is closed.
+                pass
+
+
+def close_monitor(events: Iterable):
+    """
+    Close a monitor that may be being read on another thread.
+
+    Monitors with a ``close`` method are closed, which also stops the remote request of monitors created
+    with ``stop_on_close``. A plain generator cannot be closed while another thread runs it, so only its
+    ``response``, if it exposes one, is closed.
+    """
+    close = getattr(events, 'close', None)
+    if close is not None and not isinstance(events, GeneratorType):
+        try:
+            close()
+            return
+        except ValueError:
+            # Wraps a plain generator that is being read, fall back to its connection.
+            pass
+    response = getattr(events, 'response', None)
+    if response is not None:
+        response.close()
+
+
+class EventStream(MonitorStream):
+    """
+    Iterator over the decoded ``data`` events of a ``text/event-stream`` response.
+
+    Besides the events themselves it keeps simple counters (`bytes_read`, `events_read`) that
+    instrumentation such as `InstrumentedMonitor` can read while the stream is consumed.
+    """
+
+    def __init__(self, response: Response, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 decode: Callable[[bytes], Any] = json.loads, on_abandon: Optional[Callable[[], Any]] = None):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.decode = decode
+        self.bytes_read = 0
+        self.events_read = 0
+        super().__init__(self._read(), on_abandon=on_abandon)
+
+    def _chunks(self):
+        for chunk in iter_response_chunks(self.response, self.chunk_size):
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def _read(self):
+        for payload in iter_sse_data(self._chunks()):
+            data = self.decode(payload)
+            self.events_read += 1
+            yield data
+
+    def _release(self):
+        self.response.close()
+        super()._release()
@@ -0,0 +1,330 @@
+import sys
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from .dedup import BACKENDS, _numpy
+from .sitemap import entry_url
+
+
+def result_links(result) -> Tuple[Optional[str], List[str]]:
+    """
+    The URL of a result event or result object and the links found on the page.
+
+    Links are read from ``result.links`` (present with the ``include_links`` page option) or a top-level
+    ``links`` key, as URLs or objects with a ``url`` or ``href`` key.
+    """
+    if isinstance(result, dict) and result.get('type') == 'result':
+        result = result.get('data')
+    if not isinstance(result, dict):
+        return entry_url(result), []
+    content = result.get('result')
+    links = content.get('links') if isinstance(content, dict) else None
+    if links is None:
+        links = result.get('links')
+    urls = []
+    for link in links if isinstance(links, list) else []:
+        url = link.get('url') or link.get('href') if isinstance(link, dict) else link
+        if isinstance(url, str) and url:
+            urls.append(url)
+    return entry_url(result), urls
+
+
+class LinkGraphBuilder:
+    """
+    Streams pages and their links into a `LinkGraph`.
+
+    URLs are interned and numbered as they are first seen, and edges are appended to two flat integer
+    arrays, so memory grows by a few bytes per edge. `build` sorts the edges into compressed sparse rows.
+    """
+
+    def __init__(self, internal_only: bool = False, keep_fragments: bool = False):
+        """
+        Args:
+            internal_only: Drop links to another host than the linking page's
+            keep_fragments: Keep ``#fragment`` parts, which are stripped by default
+        """
+        self.internal_only = internal_only
+        self.keep_fragments = keep_fragments
+        self._ids: Dict[str, int] = {}
+        self._urls: List[str] = []
+        self._sources = array('I')
+        self._targets = array('I')
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._sources)
+
+    def node(self, url: str) -> int:
+        """The id of a URL, assigned on first sight."""
+        node = self._ids.get(url)
+        if node is None:
+            url = sys.intern(url)
+            node = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+        return node
+
+    def add_edge(self, source: str, target: str):
+        self._sources.append(self.node(source))
+        self._targets.append(self.node(target))
+
+    def add_page(self, url: str, links: Iterable[str]):
+        """Add a page and the links found on it; relative links are resolved against the page URL."""
+        url = self.__clean(url)
+        source = self.node(url)
+        host = urlsplit(url).netloc
+        for link in links:
+            link = self.__clean(urljoin(url, link))
+            if not link.startswith(('http://', 'https://')):
+                continue
+            if self.internal_only and urlsplit(link).netloc != host:
+                continue
+            self._sources.append(source)
+            self._targets.append(self.node(link))
+
+    def add_result(self, result):
+        """Add a result event or result object; results without a URL are ignored."""
+        url, links = result_links(result)
+        if url:
+            self.add_page(url, links)
+
+    def add_results(self, results: Iterable) -> 'LinkGraphBuilder':
+        """Add every result of a monitor or results iterator; other events are ignored."""
+        for result in results:
+            if not isinstance(result, dict) or result.get('type', 'result') == 'result':
+                self.add_result(result)
+        return self
+
+    def add_sitemap_graph(self, graph: Union[dict, list], parent: str = None) -> 'LinkGraphBuilder':
+        """
+        Add the edges of a sitemap graph.
+
+        Accepted shapes are edge lists (objects with ``source`` and ``target``, also under ``edges`` or
+        ``links``), node lists whose objects hold ``links`` or ``children``, and nested dictionaries mapping
+        a URL to its children.
+        """
+        if isinstance(graph, list):
+            for item in graph:
+                self.add_sitemap_graph(item, parent)
+        elif isinstance(graph, str):
+            if parent is not None:
+                self.add_edge(parent, graph)
+            else:
+                self.node(graph)
+        elif isinstance(graph, dict):
+            if 'source' in graph and 'target' in graph:
+                self.add_edge(str(graph['source']), str(graph['target']))
+                return self
+            for key in ('nodes', 'edges', 'links'):
+                if isinstance(graph.get(key), list) and not entry_url(graph):
+                    self.add_sitemap_graph(graph[key], parent)
+            url = entry_url(graph)
+            if url:
+                if parent is not None:
+                    self.add_edge(parent, url)
+                else:
+                    self.node(url)
+                for key in ('links', 'children'):
+                    if isinstance(graph.get(key), (list, dict)):
+                        self.add_sitemap_graph(graph[key], url)
+            elif not any(key in graph for key in ('nodes', 'edges', 'links')):
+                for key, children in graph.items():
+                    if parent is not None:
+                        self.add_edge(parent, key)
+                    else:
+                        self.node(key)
+                    if isinstance(children, (dict, list, str)):
+                        self.add_sitemap_graph(children, key)
+        return self
+
+    def build(self, self_loops: bool = False, backend: str = 'auto') -> 'LinkGraph':
+        """
+        Sort the edges into a `LinkGraph`, dropping duplicate edges and, by default, self links.
+
+        Args:
+            self_loops: Keep links from a page to itself
+            backend: ``numpy``, ``python``, or ``auto`` to use NumPy when it is installed
+        """
+        size = len(self._urls)
+        np = None if backend == 'python' else _numpy(required=backend == 'numpy')
+        if np is not None:
+            # Edges are packed as ``source << 32 | target`` so one sort orders and deduplicates them.
+            sources = np.frombuffer(self._sources, dtype=np.uint32).astype(np.uint64)
+            targets = np.frombuffer(self._targets, dtype=np.uint32).astype(np.uint64)
+            keys = (sources << np.uint64(32)) | targets
+            if not self_loops:
+                keys = keys[sources != targets]
+            keys = np.unique(keys)
+            counts = np.bincount((keys >> np.uint64(32)).astype(np.int64), minlength=size)
+            offsets = array('Q', [0])
+            offsets.extend(np.cumsum(counts, dtype=np.uint64).tolist())
+            targets = array('I', (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32).tobytes())
+        else:
+            keys = sorted({
+                source << 32 | target for source, target in zip(self._sources, self._targets)
+                if self_loops or source != target
+            })
+            offsets = array('Q', [0] * (size + 1))
+            for key in keys:
+                offsets[(key >> 32) + 1] += 1
+            for node in range(size):
+                offsets[node + 1] += offsets[node]
+            targets = array('I', (key & 0xFFFFFFFF for key in keys))
+        return LinkGraph(list(self._urls), offsets, targets, backend=backend)
+
+    def __clean(self, url: str) -> str:
+        return url if self.keep_fragments else urldefrag(url)[0]
+
+
+class LinkGraph:
+    """
+    Directed link graph in compressed sparse row form.
+
+    Node ids index `urls`; the links of node ``n`` are ``targets[offsets[n]:offsets[n + 1]]``. PageRank and
+    degree counts are vectorized with NumPy when it is installed and computed in pure Python otherwise.
+    """
+
+    def __init__(self, urls: List[str], offsets: array, targets: array, backend: str = 'auto'):
+        """
+        Args:
+            urls: URL of every node id
+            offsets: Start of every node's links in ``targets``, followed by the number of edges
+            targets: Concatenated, sorted link targets of all nodes
+            backend: ``numpy``, ``python``, or ``auto`` to use NumPy when it is installed
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown backend: {backend}. Supported backends are: {", ".join(BACKENDS)}.')
+        self.urls = urls
+        self.offsets = offsets
+        self.targets = targets
+        self._ids = {url: node for node, url in enumerate(urls)}
+        self._np = None if backend == 'python' else _numpy(required=backend == 'numpy')
+        self._in_degrees = None
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __contains__(self, url: str):
+        return url in self._ids
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def id(self, url: str) -> int:
+        """The node id of a URL; raises KeyError for URLs not in the graph."""
+        return self._ids[url]
+
+    def links(self, url: str) -> List[str]:
+        """URLs linked from a page."""
+        node = self._ids[url]
+        return [self.urls[target] for target in self.__successors(node)]
+
+    def out_degree(self, url: str) -> int:
+        node = self._ids[url]
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def in_degree(self, url: str) -> int:
+        return self.in_degrees()[self._ids[url]]
+
+    def in_degrees(self) -> List[int]:
+        """Number of pages linking to every node id."""
+        if self._in_degrees is None:
+            if self._np is not None:
+                np = self._np
+                counts = np.bincount(np.frombuffer(self.targets, dtype=np.uint32), minlength=len(self.urls))
+                self._in_degrees = counts.tolist()
+            else:
+                counts = [0] * len(self.urls)
+                for target in self.targets:
+                    counts[target] += 1
+                self._in_degrees = counts
+        return self._in_degrees
+
+    def top_in_degree(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """The ``limit`` most linked-to URLs with their in-degree."""
+        return self.__top(self.in_degrees(), limit)
+
+    def pagerank(self, damping: float = 0.85, tolerance: float = 1e-6, max_iterations: int = 100) -> List[float]:
+        """
+        PageRank of every node id, by power iteration.
+
+        The rank of pages without links is spread over all pages. Iteration stops once the L1 change
+        falls under ``tolerance``.
+        """
+        size = len(self.urls)
+        if not size:
+            return []
+        if self._np is not None:
+            return self.__numpy_pagerank(damping, tolerance, max_iterations)
+        out_degrees = [self.offsets[node + 1] - self.offsets[node] for node in range(size)]
+        ranks = [1.0 / size] * size
+        for _ in range(max_iterations):
+            dangling = sum(rank for rank, degree in zip(ranks, out_degrees) if not degree)
+            base = (1 - damping + damping * dangling) / size
+            updated = [base] * size
+            for node in range(size):
+                if out_degrees[node]:
+                    share = damping * ranks[node] / out_degrees[node]
+                    for target in self.__successors(node):
+                        updated[target] += share
+            change = sum(abs(new - old) for new, old in zip(updated, ranks))
+            ranks = updated
+            if change < tolerance:
+                break
+        return ranks
+
+    def top_pagerank(self, limit: int = 10, **kwargs) -> List[Tuple[str, float]]:
+        """The ``limit`` URLs with the highest PageRank, see `pagerank` for the options."""
+        return self.__top(self.pagerank(**kwargs), limit)
+
+    def reachable(self, start: Union[str, Iterable[str]], max_depth: int = None) -> Set[str]:
+        """URLs reachable by following links from one or more start URLs, within ``max_depth`` links."""
+        starts = [start] if isinstance(start, str) else list(start)
+        seen = {self._ids[url] for url in starts}
+        frontier = deque((node, 0) for node in seen)
+        while frontier:
+            node, depth = frontier.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for target in self.__successors(node):
+                if target not in seen:
+                    seen.add(target)
+                    frontier.append((target, depth + 1))
+        return {self.urls[node] for node in seen}
+
+    def edges(self) -> Iterator[Tuple[str, str]]:
+        for node, url in enumerate(self.urls):
+            for target in self.__successors(node):
+                yield url, self.urls[target]
+
+    def __successors(self, node: int):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def __top(self, scores: List, limit: int) -> List[Tuple[str, float]]:
+        ranked = sorted(range(len(scores)), key=lambda node: (-scores[node], self.urls[node]))[:limit]
+        return [(self.urls[node], scores[node]) for node in ranked]
+
+    def __numpy_pagerank(self, damping: float, tolerance: float, max_iterations: int) -> List[float]:
+        np = self._np
+        size = len(self.urls)
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        targets = np.frombuffer(self.targets, dtype=np.uint32)
+        out_degrees = np.diff(offsets)
+        sources = np.repeat(np.arange(size), out_degrees)
+        dangling = out_degrees == 0
+        weights = np.divide(1.0, out_degrees, out=np.zeros(size), where=~dangling)
+        ranks = np.full(size, 1.0 / size)
+        for _ in range(max_iterations):
+            shares = (ranks * weights)[sources]
+            base = (1 - damping + damping * ranks[dangling].sum()) / size
+            updated = base + damping * np.bincount(targets, weights=shares, minlength=size)
+            change = np.abs(updated - ranks).sum()
+            ranks = updated
+            if change < tolerance:
+                break
+        return ranks.tolist()
@@ -0,0 +1,347 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .bulk import BulkResult, run_bulk
+from .events import FINAL_STATUSES, close_monitor
+from .sitemap import entry_url
+
+PENDING = 'pending'
+SUBMITTED = 'submitted'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    uuid TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_uuid ON submissions (uuid);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    url TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (key, seq)
+);
+CREATE INDEX IF NOT EXISTS results_url ON results (key, url);
+"""
+
+
+@dataclass
+class JournalEntry:
+    """A submission recorded in a `JobJournal`."""
+    key: str
+    kind: str
+    params: dict
+    uuid: Optional[str]
+    status: str
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+    @property
+    def in_flight(self) -> bool:
+        """True if the request was created but its results have not all been consumed."""
+        return self.status == SUBMITTED
+
+
+class JobJournal:
+    """
+    Durable record of submitted requests and of the results consumed from them, stored in SQLite.
+
+    A submission is journaled as ``pending`` before its create call and as ``submitted`` with the returned
+    UUID right after, so after a crash a job can tell created requests from those that were never sent.
+    The journal can be shared between threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, created if missing
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, key: str) -> Optional[JournalEntry]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM submissions WHERE key = ?', (key,)).fetchone()
+        return self.__entry(row) if row else None
+
+    def entries(self, kind: str = None, status: str = None) -> List[JournalEntry]:
+        query = ('SELECT * FROM submissions WHERE (? IS NULL OR kind = ?) AND (? IS NULL OR status = ?) '
+                 'ORDER BY created_at')
+        with self._lock:
+            rows = self._db.execute(query, (kind, kind, status, status)).fetchall()
+        return [self.__entry(row) for row in rows]
+
+    def has_uuid(self, uuid: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM submissions WHERE uuid = ?', (uuid,)).fetchone() is not None
+
+    def begin(self, key: str, kind: str, params: dict) -> JournalEntry:
+        """Record that a request is about to be created; an existing entry for ``key`` is returned unchanged."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR IGNORE INTO submissions (key, kind, params, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, kind, json.dumps(params), PENDING, now, now)
+            )
+            return self.get(key)
+
+    def submitted(self, key: str, uuid: str):
+        self.__update(key, status=SUBMITTED, uuid=uuid, error=None)
+
+    def completed(self, key: str):
+        self.__update(key, status=COMPLETED)
+
+    def failed(self, key: str, error: str):
+        self.__update(key, status=FAILED, error=error)
+
+    def record_result(self, key: str, data, url: str = None):
+        """Record a result consumed from the request journaled under ``key``."""
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO results (key, seq, url, data) '
+                'VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM results WHERE key = ?), ?, ?)',
+                (key, key, url, json.dumps(data))
+            )
+
+    def consumed(self, key: str) -> Set[str]:
+        """URLs of the results already consumed for ``key``."""
+        with self._lock:
+            rows = self._db.execute('SELECT url FROM results WHERE key = ? AND url IS NOT NULL', (key,)).fetchall()
+        return {row[0] for row in rows}
+
+    def results(self, key: str) -> Iterator:
+        """Results recorded for ``key``, in the order they were consumed."""
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM results WHERE key = ? ORDER BY seq', (key,)).fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def __update(self, key: str, **values):
+        assignments = ', '.join(f'{column} = ?' for column in values)
+        with self._lock:
+            self._db.execute(
+                f'UPDATE submissions SET {assignments}, updated_at = ? WHERE key = ?',
+                (*values.values(), time.time(), key)
+            )
+
+    @staticmethod
+    def __entry(row) -> JournalEntry:
+        key, kind, params, uuid, status, error, created_at, updated_at = row
+        return JournalEntry(key, kind, json.loads(params), uuid, status, error, created_at, updated_at)
+
+
+def _created_at(request: dict) -> Optional[float]:
+    value = request.get('created_at')
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class ResumableJob:
+    """
+    Creates and monitors requests through a `JobJournal` so a restarted job picks up where it stopped.
+
+    Each request is identified by a caller-chosen key. Keys already completed are skipped, requests created
+    before the restart are reattached to by UUID, and results already consumed are not yielded again.
+    A submission interrupted between its create call and the journal update is matched against the
+    server's recent requests before being sent again.
+    """
+
+    KINDS: Dict[str, Tuple[str, str, str]] = {
+        # kind: (create method, monitor method, list method)
+        'crawl': ('create_crawl_request', 'monitor_crawl_request', 'get_crawl_requests_list'),
+        'batch_crawl': ('create_batch_crawl_request', 'monitor_crawl_request', 'get_crawl_requests_list'),
+        'search': ('create_search_request', 'monitor_search_request', 'get_search_requests_list'),
+        'sitemap': ('create_sitemap_request', 'monitor_sitemap_request', 'get_sitemap_requests_list'),
+    }
+
+    def __init__(self, client, journal: JobJournal, kind: str = 'crawl', download: bool = True,
+                 clock_skew: float = 300.0):
+        """
+        Args:
+            client: WaterCrawlAPIClient used to create and monitor the requests
+            journal: Journal recording the job's progress
+            kind: One of ``crawl``, ``batch_crawl``, ``search`` or ``sitemap``
+            download: Passed to the monitor method
+            clock_skew: Seconds of clock difference tolerated when matching interrupted submissions
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown kind: {kind}. Supported kinds are: {", ".join(self.KINDS)}.')
+        self.client = client
+        self.journal = journal
+        self.kind = kind
+        self.download = download
+        self.clock_skew = clock_skew
+        # Keys whose request was created by this job, so their stream has been watched from the start.
+        self._created: Set[str] = set()
+
+    def submit(self, key: str, **params) -> JournalEntry:
+        """Create the request for ``key`` unless the journal already holds it."""
+        entry = self.journal.get(key)
+        if entry is not None and entry.status in (SUBMITTED, COMPLETED):
+            return entry
+        if entry is None:
+            self.journal.begin(key, self.kind, params)
+        else:
+            # Left pending or failed by an earlier run, the create call may still have reached the server.
+            uuid = self.__find_interrupted(entry)
+            if uuid:
+                self.journal.submitted(key, uuid)
+                return self.journal.get(key)
+
+        create = getattr(self.client, self.KINDS[self.kind][0])
+        if self.kind == 'search':
+            params = dict(params, sync=False)
+        try:
+            request = create(**params)
+        except Exception as e:
+            self.journal.failed(key, f'{type(e).__name__}: {e}')
+            raise
+        self.journal.submitted(key, request['uuid'])
+        self._created.add(key)
+        return self.journal.get(key)
+
+    def monitor(self, key: str) -> Iterator[dict]:
+        """
+        Yield the events of the request journaled under ``key``, skipping results consumed by an earlier run.
+
+        A result is journaled once the consumer asks for the next event, so a result being processed when
+        the process dies is delivered again on restart. When resuming a crawl, results the stream did not
+        replay are read from the results pages. The entry is marked completed once the final state event
+        has been consumed.
+        """
+        entry = self.journal.get(key)
+        if entry is None or entry.uuid is None:
+            raise KeyError(f'No submitted request journaled under {key!r}')
+        if entry.status == COMPLETED:
+            return
+
+        consumed = self.journal.consumed(key)
+        resumed = key not in self._created or bool(consumed)
+        monitor = getattr(self.client, self.KINDS[self.kind][1])
+        final = None
+        events = monitor(entry.uuid, download=self.download)
+        try:
+            for event in events:
+                if event.get('type') == 'result':
+                    url = entry_url(event.get('data'))
+                    if url is not None:
+                        if url in consumed:
+                            continue
+                        consumed.add(url)
+                    yield event
+                    self.journal.record_result(key, event.get('data'), url)
+                elif event.get('type') == 'state' and isinstance(event.get('data'), dict) and \
+                        event['data'].get('status') in FINAL_STATUSES:
+                    final = event
+                else:
+                    yield event
+        finally:
+            close_monitor(events)
+
+        if resumed and self.kind in ('crawl', 'batch_crawl'):
+            # Results produced while no run was attached are not replayed by the stream.
+            yield from self.__backfill(key, entry.uuid, consumed)
+        if final is not None:
+            yield final
+            if self.kind in ('search', 'sitemap'):
+                self.journal.record_result(key, final['data'])
+            self.journal.completed(key)
+
+    def run(
+            self,
+            jobs: Union[Dict[str, dict], Iterable[Tuple[str, dict]]],
+            on_event: Callable[[str, dict], None] = None,
+            max_workers: int = 4
+    ) -> Dict[str, BulkResult]:
+        """
+        Submit and monitor every ``(key, params)`` job, resuming from the journal.
+
+        Args:
+            jobs: Mapping or pairs of job key and keyword arguments of the create method
+            on_event: Called from the worker threads with ``(key, event)`` for every new event
+            max_workers: Maximum number of jobs running at the same time
+
+        Returns:
+            Dictionary mapping each key to a BulkResult holding its final JournalEntry
+        """
+        jobs = dict(jobs.items() if isinstance(jobs, dict) else jobs)
+
+        def execute(key: str) -> JournalEntry:
+            self.submit(key, **jobs[key])
+            for event in self.monitor(key):
+                if on_event is not None:
+                    on_event(key, event)
+            return self.journal.get(key)
+
+        return run_bulk(execute, jobs, max_workers=max_workers)
+
+    def __backfill(self, key: str, uuid: str, consumed: Set[str]) -> Iterator[dict]:
+        page = 1
+        while True:
+            response = self.client.get_crawl_request_results(uuid, page=page, page_size=100, download=self.download)
+            for result in response.get('results') or []:
+                url = entry_url(result)
+                if url is None or url in consumed:
+                    continue
+                consumed.add(url)
+                yield {'type': 'result', 'data': result}
+                self.journal.record_result(key, result, url)
+            if not response.get('next'):
+                return
+            page += 1
+
+    def __find_interrupted(self, entry: JournalEntry) -> Optional[str]:
+        list_requests = getattr(self.client, self.KINDS[self.kind][2])
+        try:
+            candidates = list_requests(page=1, page_size=100).get('results') or []
+        except Exception:
+            return None
+        matches = []
+        for request in candidates:
+            created_at = _created_at(request)
+            if created_at is None or created_at < entry.created_at - self.clock_skew:
+                continue
+            if self.journal.has_uuid(request.get('uuid')) or not self.__same_request(entry.params, request):
+                continue
+            matches.append(request['uuid'])
+        return matches[0] if len(matches) == 1 else None
+
+    def __same_request(self, params: dict, request: dict) -> bool:
+        if self.kind == 'search':
+            return request.get('query') == params.get('query')
+        if self.kind == 'batch_crawl':
+            return sorted(request.get('urls') or []) == sorted(params.get('urls') or [])
+        return request.get('url') == params.get('url')
@@ -0,0 +1,173 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+
+@dataclass
+class LimiterStats:
+    limit: int
+    in_flight: int
+    latency_baseline: Optional[float]
+    completed: int = 0
+    overloaded: int = 0
+    slow: int = 0
+    increases: int = 0
+    decreases: int = 0
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adapted to the server's capacity by additive increase, multiplicative decrease (AIMD).
+
+    Every call reports its outcome. Calls are counted in rounds of as many calls as the limit; after a round
+    of calls that succeeded within ``latency_tolerance`` times the baseline latency, the limit grows by
+    ``increase`` if the number of calls in flight reached the limit during the round. A 429 or 5xx response,
+    a connection error or a latency spike multiplies the limit by ``decrease`` and starts a new round; calls
+    that started before the last decrease do not decrease it again, so a burst of failures from one round
+    counts once. The baseline is a moving average of the latency of every call that was not overloaded, slow
+    ones included, so after a lasting change in the server's latency the baseline follows and the limit recovers.
+
+    A limiter can be shared by several clients and threads; the bulk helpers, `submit_*` calls and monitors
+    of a client holding a limiter all draw from it.
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 4,
+            min_limit: int = 1,
+            max_limit: int = 64,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            latency_tolerance: Optional[float] = 2.0,
+            smoothing: float = 0.1
+    ):
+        """
+        Args:
+            initial_limit: Concurrency limit to start from
+            min_limit: Lowest limit, reached after repeated decreases
+            max_limit: Highest limit
+            increase: Limit added after a round of healthy calls that used the whole limit
+            decrease: Factor applied to the limit on overload, between 0 and 1
+            latency_tolerance: Latency, as a multiple of the baseline, from which a call counts as a spike;
+                None ignores latency
+            smoothing: Weight of a new sample in the baseline latency average
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError('Expected 1 <= min_limit <= initial_limit <= max_limit')
+        if not 0 < decrease < 1:
+            raise ValueError('decrease must be between 0 and 1')
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._last_decrease = float('-inf')
+        self._round_completed = 0
+        self._round_peak = 0
+        self._stats = LimiterStats(initial_limit, 0, None)
+        self._listeners: List[Callable[[int], None]] = []
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit."""
+        with self._cond:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    def stats(self) -> LimiterStats:
+        """Snapshot of the limit, in-flight calls, baseline latency and outcome counters."""
+        with self._cond:
+            stats = self._stats
+            return LimiterStats(int(self._limit), self._in_flight, self._baseline, stats.completed,
+                                stats.overloaded, stats.slow, stats.increases, stats.decreases)
+
+    def add_listener(self, listener: Callable[[int], None]):
+        """Call ``listener`` with the new limit whenever the integer limit changes."""
+        with self._cond:
+            self._listeners.append(listener)
+
+    def acquire(self, timeout: float = None, block: bool = True) -> float:
+        """
+        Start a call, waiting while the limit is reached.
+
+        With ``block=False`` the call is counted without waiting, for callers admitted by another
+        mechanism such as a `Scheduler` following this limit.
+
+        Returns:
+            Start time of the call, to pass to `release`
+
+        Raises:
+            TimeoutError: If the call could not start within ``timeout`` seconds
+        """
+        with self._cond:
+            if block and not self._cond.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                raise TimeoutError(f'No call slot within {timeout} seconds')
+            self._in_flight += 1
+            self._round_peak = max(self._round_peak, self._in_flight)
+            return time.monotonic()
+
+    def cancel(self):
+        """Finish a call without adapting the limit, for calls that ended for reasons unrelated to the server."""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, started: float, status: int = None, error: bool = False):
+        """
+        Finish a call started at ``started`` and adapt the limit to its outcome.
+
+        Args:
+            started: Value returned by `acquire`
+            status: HTTP status of the response, if one arrived
+            error: True if the call failed without a response, for instance on a connection error
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            self._in_flight -= 1
+            previous = int(self._limit)
+            stats = self._stats
+            stats.completed += 1
+            overloaded = error or (status is not None and (status == 429 or status >= 500))
+            slow = not overloaded and self.latency_tolerance is not None and self._baseline is not None and \
+                latency > self.latency_tolerance * self._baseline
+            if not overloaded and (status is None or status < 400):
+                self._baseline = latency if self._baseline is None else \
+                    (1 - self.smoothing) * self._baseline + self.smoothing * latency
+            if overloaded or slow:
+                if overloaded:
+                    stats.overloaded += 1
+                else:
+                    stats.slow += 1
+                if started >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+                    stats.decreases += 1
+                    self.__new_round()
+            else:
+                self._round_completed += 1
+                if self._round_completed >= previous:
+                    # Growing a limit that was never filled would raise it past what was ever tested.
+                    if self._round_peak >= previous and self._limit < self.max_limit:
+                        self._limit = min(self.max_limit, self._limit + self.increase)
+                        stats.increases += 1
+                    self.__new_round()
+            current = int(self._limit)
+            self._cond.notify_all()
+            listeners = list(self._listeners) if current != previous else []
+        for listener in listeners:
+            listener(current)
+
+    def __new_round(self):
+        self._round_completed = 0
+        self._round_peak = self._in_flight
@@ -0,0 +1,202 @@
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+
+@dataclass
+class MonitorStats:
+    """Point-in-time throughput figures of an `InstrumentedMonitor`."""
+    events: int
+    bytes: Optional[int]
+    elapsed: float
+    events_per_sec: float
+    bytes_per_sec: Optional[float]
+    recent_events_per_sec: float
+    seconds_since_last_event: float
+    wait_time: float
+    consumer_time: float
+    last_event_type: Optional[str]
+    stalled: bool
+    finished: bool
+
+    @property
+    def consumer_time_ratio(self) -> float:
+        """
+        Share of the iteration time spent in the consumer between events rather than waiting for the server.
+
+        This measures how much of the stream's pace the consumer sets, not how far it is behind the server:
+        values close to 1 mean events are read as fast as they are processed and may be piling up server-side.
+        """
+        busy = self.wait_time + self.consumer_time
+        return self.consumer_time / busy if busy else 0.0
+
+
+class InstrumentedMonitor:
+    """
+    Wraps a `monitor_*` event iterator and tracks its throughput while it is consumed.
+
+    Byte counts are available when the wrapped iterator exposes ``bytes_read``, as the client's
+    `EventStream` does. Stall detection runs on a small watchdog thread so a stall is reported
+    even while the consumer is blocked waiting for the next event. The watchdog stops when the
+    events run out, when the monitor is closed or leaves its ``with`` block, and when it is dropped.
+    """
+
+    def __init__(
+            self,
+            events: Iterable[dict],
+            on_event: Callable[[dict, MonitorStats], None] = None,
+            on_stats: Callable[[MonitorStats], None] = None,
+            stats_interval: float = 1.0,
+            stall_timeout: float = None,
+            on_stall: Callable[[MonitorStats], None] = None,
+            window: float = 10.0
+    ):
+        """
+        Args:
+            events: Iterator returned by one of the `monitor_*` methods
+            on_event: Called with every event and the stats after it was received
+            on_stats: Called with a stats snapshot at most every ``stats_interval`` seconds
+            stats_interval: Minimum number of seconds between two ``on_stats`` calls
+            stall_timeout: Seconds without an event after which the stream is considered stalled
+            on_stall: Called once per stall with the stats at the time the stall was detected
+            window: Number of seconds used for the recent events/sec rate
+        """
+        self.events = events
+        self.on_event = on_event
+        self.on_stats = on_stats
+        self.stats_interval = stats_interval
+        self.stall_timeout = stall_timeout
+        self.on_stall = on_stall
+        self.window = window
+
+        self._iterator = iter(events)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._count = 0
+        self._started = None
+        self._last_event_at = None
+        self._last_yield_at = None
+        self._last_stats_at = 0.0
+        self._last_event_type = None
+        self._wait_time = 0.0
+        self._consumer_time = 0.0
+        self._stalled = False
+        self._finished = False
+        self._waiting_since = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __next__(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            if self._started is None:
+                self._started = self._last_event_at = now
+                self.__start_watchdog()
+            elif self._last_yield_at is not None:
+                self._consumer_time += now - self._last_yield_at
+            self._waiting_since = now
+
+        try:
+            event = next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+        received = time.monotonic()
+        with self._lock:
+            self._waiting_since = None
+            self._wait_time += received - now
+            self._count += 1
+            self._last_event_at = received
+            self._last_event_type = event.get('type') if isinstance(event, dict) else None
+            self._stalled = False
+            self._recent.append(received)
+            while self._recent and self._recent[0] < received - self.window:
+                self._recent.popleft()
+
+        if self.on_event is not None:
+            self.on_event(event, self.snapshot())
+        if self.on_stats is not None and received - self._last_stats_at >= self.stats_interval:
+            self._last_stats_at = received
+            self.on_stats(self.snapshot())
+
+        self._last_yield_at = time.monotonic()
+        return event
+
+    def close(self):
+        """Stop the watchdog and close the wrapped iterator if it supports it."""
+        with self._lock:
+            self._finished = True
+            self._waiting_since = None
+        self._stop.set()
+        close = getattr(self._iterator, 'close', None)
+        if close is not None:
+            close()
+
+    def snapshot(self) -> MonitorStats:
+        """Return the current throughput figures."""
+        now = time.monotonic()
+        with self._lock:
+            started = self._started if self._started is not None else now
+            elapsed = now - started
+            bytes_read = getattr(self.events, 'bytes_read', None)
+            recent = [t for t in self._recent if t >= now - self.window]
+            recent_span = min(self.window, elapsed)
+            return MonitorStats(
+                events=self._count,
+                bytes=bytes_read,
+                elapsed=elapsed,
+                events_per_sec=self._count / elapsed if elapsed else 0.0,
+                bytes_per_sec=(bytes_read / elapsed if elapsed else 0.0) if bytes_read is not None else None,
+                recent_events_per_sec=len(recent) / recent_span if recent_span else 0.0,
+                seconds_since_last_event=now - self._last_event_at if self._last_event_at is not None else 0.0,
+                wait_time=self._wait_time,
+                consumer_time=self._consumer_time,
+                last_event_type=self._last_event_type,
+                stalled=self._stalled,
+                finished=self._finished,
+            )
+
+    def __start_watchdog(self):
+        if self.stall_timeout is None:
+            return
+        # The thread only holds a weak reference, so a monitor dropped without close() stops it too.
+        self._watchdog = threading.Thread(
+            target=_watch, args=(weakref.ref(self), self._stop, min(1.0, self.stall_timeout / 4)),
+            name='watercrawl-monitor-watchdog', daemon=True
+        )
+        self._watchdog.start()
+
+    def _check_stall(self):
+        with self._lock:
+            # Only time spent blocked on the server counts, not time the consumer spends on an event.
+            report = (
+                self._waiting_since is not None
+                and not self._stalled
+                and time.monotonic() - self._waiting_since >= self.stall_timeout
+            )
+            if report:
+                self._stalled = True
+        if report and self.on_stall is not None:
+            self.on_stall(self.snapshot())
+
+
+def _watch(monitor_ref: weakref.ref, stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        monitor = monitor_ref()
+        if monitor is None:
+            return
+        monitor._check_stall()
+        del monitor
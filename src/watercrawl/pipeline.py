@@ -0,0 +1,340 @@
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from .bulk import BulkResult
+from .events import FINAL_STATUSES, close_monitor
+from .planner import path_depth, url_matches
+from .sitemap import entry_url
+
+_URL = re.compile(r'https?://[^\s"\'<>]+')
+# Files a sitemap generator fetches or reports that are not pages to crawl.
+_NON_PAGE_SUFFIXES = (
+    '.xml', '.xml.gz', '.txt', '.gz', '.json', '.rss', '.atom', '.css', '.js', '.ico', '.png', '.jpg',
+    '.jpeg', '.gif', '.svg', '.webp', '.woff', '.woff2',
+)
+
+class UrlPipeline:
+    """
+    Scrapes URLs while they are still being discovered.
+
+    A discovery function runs on a background thread and emits URLs. New URLs are scraped with `scrape_url`
+    or, with ``batch_size`` above 1, grouped into batch crawl requests, with at most ``max_concurrency``
+    scrapes or batches running on the client's thread pool. Scraped pages are yielded as soon as they arrive,
+    so discovery and scraping overlap.
+    """
+
+    def __init__(
+            self,
+            client,
+            discover: Callable[[Callable[[str], None]], None],
+            max_concurrency: int = 4,
+            batch_size: int = 1,
+            batch_wait: float = 1.0,
+            spider_options: dict = None,
+            page_options: dict = None,
+            plugin_options: dict = None,
+            download: bool = True
+    ):
+        """
+        Args:
+            client: WaterCrawlAPIClient used for scraping
+            discover: Called on the background thread with an ``emit(url)`` callback
+            max_concurrency: Maximum number of scrapes or batches running at the same time
+            batch_size: Maximum number of URLs per batch crawl request, 1 scrapes every URL with `scrape_url`
+            batch_wait: Seconds to wait for a batch to fill up before submitting it partially filled
+            spider_options: Spider options of the batch crawl requests
+            page_options: Page options of the scrapes
+            plugin_options: Plugin options of the scrapes
+            download: If True, download results; if False, return URLs
+        """
+        if max_concurrency < 1 or batch_size < 1:
+            raise ValueError('max_concurrency and batch_size must be at least 1')
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.spider_options = spider_options
+        self.page_options = page_options
+        self.plugin_options = plugin_options
+        self.download = download
+
+        self.discovered: List[str] = []
+        self.discovery_error: Optional[BaseException] = None
+        self.source_events = None
+        self._seen = set()
+        self._pending: List[str] = []
+        self._pending_since = None
+        self._in_flight: List[Future] = []
+        self._queue = queue.Queue()
+        self._closed = False
+        self._discover = discover
+        self._thread = None
+        self._results = self._run()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> BulkResult:
+        return next(self._results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Stop discovery and cancel the scrapes that have not started."""
+        self._closed = True
+        if self.source_events is not None:
+            close_monitor(self.source_events)
+        for future in list(self._in_flight):
+            future.cancel()
+
+    def accept(self, url: str) -> bool:
+        """Whether a discovered URL should be scraped."""
+        return True
+
+    def _run(self) -> Iterator[BulkResult]:
+        self._thread = threading.Thread(target=self.__discover, name='watercrawl-pipeline', daemon=True)
+        self._thread.start()
+        discovering = True
+        try:
+            while discovering or self._pending or self._in_flight:
+                self.__dispatch(flush=not discovering)
+                try:
+                    kind, value = self._queue.get(timeout=self.__wait_time())
+                except queue.Empty:
+                    continue
+                if kind == 'url':
+                    self.__add(value)
+                elif kind == 'discovered':
+                    discovering = False
+                else:
+                    future, urls = value
+                    self._in_flight.remove(future)
+                    yield from self.__outcomes(future, urls)
+        finally:
+            self.close()
+        if self.discovery_error is not None:
+            raise self.discovery_error
+
+    def __discover(self):
+        try:
+            self._discover(lambda url: self._queue.put(('url', url)))
+        except BaseException as e:
+            if not self._closed:
+                self.discovery_error = e
+        finally:
+            self._queue.put(('discovered', None))
+
+    def __add(self, url: Optional[str]):
+        if not url or url in self._seen:
+            return
+        self._seen.add(url)
+        if not self.accept(url):
+            return
+        self.discovered.append(url)
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.append(url)
+
+    def __wait_time(self) -> Optional[float]:
+        if self._pending and len(self._in_flight) < self.max_concurrency:
+            return max(0.0, self._pending_since + self.batch_wait - time.monotonic())
+        return None
+
+    def __dispatch(self, flush: bool):
+        while self._pending and len(self._in_flight) < self.max_concurrency and not self._closed:
+            expired = time.monotonic() >= self._pending_since + self.batch_wait
+            if len(self._pending) < self.batch_size and not (flush or expired):
+                return
+            urls, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            self._pending_since = time.monotonic()
+            future = self.client.submit(self.__scrape, urls)
+            self._in_flight.append(future)
+            future.add_done_callback(lambda done, urls=urls: self._queue.put(('scraped', (done, urls))))
+
+    def __scrape(self, urls: List[str]) -> List[dict]:
+        if self.batch_size == 1:
+            page = self.client.scrape_url(urls[0], page_options=self.page_options,
+                                          plugin_options=self.plugin_options, download=self.download)
+            return [page] if page is not None else []
+        request = self.client.create_batch_crawl_request(
+            urls=urls,
+            spider_options=self.spider_options,
+            page_options=self.page_options,
+            plugin_options=self.plugin_options,
+        )
+        return [
+            event['data'] for event in self.client.monitor_crawl_request(request['uuid'], download=self.download)
+            if event.get('type') == 'result'
+        ]
+
+    @staticmethod
+    def __outcomes(future: Future, urls: List[str]) -> Iterator[BulkResult]:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            for url in urls:
+                yield BulkResult(url, error=error)
+            return
+        for page in future.result():
+            yield BulkResult(entry_url(page) or urls[0], result=page)
+
+
+class SearchScrapePipeline(UrlPipeline):
+    """
+    Scrapes the hits of a search while the search is still running.
+
+    Hit URLs are taken from ``result`` events and from the results listed in ``state`` events of the search
+    monitor. The final search request is available as `search_request` once iteration ends.
+    """
+
+    def __init__(self, client, query: str, search_options: dict = None, result_limit: int = 5, **kwargs):
+        """
+        Args:
+            client: WaterCrawlAPIClient
+            query: Search query
+            search_options: Search options, see `WaterCrawlAPIClient.create_search_request`
+            result_limit: Maximum number of search results
+            kwargs: Scraping options, see `UrlPipeline`
+        """
+        self.query = query
+        self.search_options = search_options
+        self.result_limit = result_limit
+        self.search_request = None
+        super().__init__(client, self.__search, **kwargs)
+
+    def __search(self, emit: Callable[[str], None]):
+        self.search_request = self.client.create_search_request(
+            self.query, search_options=self.search_options, result_limit=self.result_limit, sync=False
+        )
+        self.source_events = self.client.monitor_search_request(self.search_request['uuid'], download=True)
+        for event in self.source_events:
+            if self._closed:
+                return
+            data = event.get('data')
+            if event.get('type') == 'result':
+                emit(entry_url(data))
+            elif event.get('type') == 'state' and isinstance(data, dict):
+                self.search_request = data
+                if isinstance(data.get('result'), list):
+                    for hit in data['result']:
+                        emit(entry_url(hit))
+                if data.get('status') in FINAL_STATUSES:
+                    return
+
+
+def feed_urls(data) -> Iterable[str]:
+    """
+    URLs reported by a sitemap ``feed`` event.
+
+    URLs are read from the ``url`` and ``urls`` keys, also under ``metadata``, from lists of such entries,
+    or else from the text of the event's ``message``. A message may mention URLs that are not pages of the
+    site, such as ``robots.txt`` or other hosts; `SitemapCrawlPipeline` filters them out.
+    """
+    if isinstance(data, str):
+        return [match.rstrip('.,;:)]') for match in _URL.findall(data)]
+    if isinstance(data, list):
+        return [url for item in data for url in feed_urls(item)]
+    if not isinstance(data, dict):
+        return []
+    for source in (data, data.get('metadata')):
+        if not isinstance(source, dict):
+            continue
+        if isinstance(source.get('urls'), list):
+            return [url for url in map(entry_url, source['urls']) if isinstance(url, str) and url]
+        if isinstance(source.get('url'), str):
+            return [source['url']]
+    return feed_urls(data.get('message'))
+
+
+def _site_host(url: str) -> str:
+    host = urlsplit(url if '://' in url else f'https://{url}').hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class SitemapCrawlPipeline(UrlPipeline):
+    """
+    Crawls the URLs of a site in micro-batches while its sitemap is still being generated.
+
+    URLs announced by the ``feed`` events of the sitemap monitor are filtered, deduplicated and submitted as
+    batch crawl requests of up to ``batch_size`` URLs. Feed URLs on another host than ``url`` and files that
+    are not pages, such as ``sitemap.xml`` or ``robots.txt``, are skipped. Once the sitemap is finished, its results are read to
+    pick up URLs the feed did not announce. The final sitemap request is available as `sitemap_request`.
+    """
+
+    def __init__(
+            self,
+            client,
+            url: str,
+            sitemap_options: dict = None,
+            include: Sequence[str] = None,
+            exclude: Sequence[str] = None,
+            max_depth: int = None,
+            complete: bool = True,
+            batch_size: int = 50,
+            batch_wait: float = 2.0,
+            **kwargs
+    ):
+        """
+        Args:
+            client: WaterCrawlAPIClient
+            url: Site to generate the sitemap of
+            sitemap_options: Options of the sitemap request, see `WaterCrawlAPIClient.create_sitemap_request`
+            include: Patterns a URL must match to be crawled, see `url_matches`
+            exclude: Patterns excluding a URL from the crawl
+            max_depth: Skip URLs with more path segments than this
+            complete: Read the finished sitemap for URLs the feed did not announce
+            batch_size: Maximum number of URLs per batch crawl request
+            batch_wait: Seconds to wait for a batch to fill up before submitting it partially filled
+            kwargs: Other crawl options, see `UrlPipeline`
+        """
+        self.url = url
+        self.sitemap_options = sitemap_options
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.complete = complete
+        self.host = _site_host(url)
+        self.sitemap_request = None
+        super().__init__(client, self.__discover_sitemap, batch_size=batch_size, batch_wait=batch_wait, **kwargs)
+
+    def accept(self, url: str) -> bool:
+        if self.include and not url_matches(url, self.include):
+            return False
+        if self.exclude and url_matches(url, self.exclude):
+            return False
+        return self.max_depth is None or path_depth(url) <= self.max_depth
+
+    def is_page(self, url: str) -> bool:
+        """Whether a URL announced by the feed is a page of the site."""
+        return _site_host(url) == self.host and not urlsplit(url).path.lower().endswith(_NON_PAGE_SUFFIXES)
+
+    def __discover_sitemap(self, emit: Callable[[str], None]):
+        self.sitemap_request = self.client.create_sitemap_request(self.url, options=self.sitemap_options)
+        self.source_events = self.client.monitor_sitemap_request(self.sitemap_request['uuid'], download=True)
+        finished = False
+        for event in self.source_events:
+            if self._closed:
+                return
+            data = event.get('data')
+            if event.get('type') == 'feed':
+                for url in feed_urls(data):
+                    if self.is_page(url):
+                        emit(url)
+            elif event.get('type') == 'state' and isinstance(data, dict):
+                self.sitemap_request = data
+                if data.get('status') in FINAL_STATUSES:
+                    finished = data.get('status') == 'finished'
+                    break
+        if finished and self.complete and not self._closed:
+            for entry in self.client.iter_sitemap_results(self.sitemap_request):
+                emit(entry_url(entry))
@@ -0,0 +1,222 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+from .bulk import BulkResult
+from .events import FINAL_STATUSES
+from .sitemap import entry_url
+
+
+def url_matches(url: str, patterns: Sequence[str]) -> bool:
+    """
+    Check a URL against shell-style patterns.
+
+    Patterns starting with ``/`` are matched against the URL path, any other pattern against the full URL.
+    """
+    path = None
+    for pattern in patterns:
+        if pattern.startswith('/'):
+            if path is None:
+                path = urlsplit(url).path or '/'
+            if fnmatchcase(path, pattern):
+                return True
+        elif fnmatchcase(url, pattern):
+            return True
+    return False
+
+
+def path_depth(url: str) -> int:
+    return len([segment for segment in urlsplit(url).path.split('/') if segment])
+
+
+def plan_batches(
+        entries: Iterable[Union[str, dict]],
+        batch_size: int = 100,
+        include: Sequence[str] = None,
+        exclude: Sequence[str] = None,
+        max_depth: int = None,
+        max_per_host: int = None
+) -> List[List[str]]:
+    """
+    Partition sitemap URLs into batch crawl requests.
+
+    URLs are filtered and de-duplicated, grouped by host so that a slow host never stalls another host's batch,
+    ordered by path depth, and split into evenly sized batches of at most ``batch_size`` URLs. Groups filling
+    at most half a batch, such as the URLs of hosts with only a few pages, are packed together into shared
+    batches so a plan over many small hosts does not become many tiny requests.
+
+    Args:
+        entries: Sitemap entries or plain URLs
+        batch_size: Maximum number of URLs per batch
+        include: Patterns a URL must match to be kept (all URLs are kept if empty)
+        exclude: Patterns removing a URL even if it matched ``include``
+        max_depth: Drop URLs with more path segments than this
+        max_per_host: Maximum number of URLs of one host in a batch (default: ``batch_size``)
+
+    Returns:
+        List of URL batches, single-host batches first
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size must be at least 1')
+    if max_per_host is not None and max_per_host < 1:
+        raise ValueError('max_per_host must be at least 1')
+    per_host = min(batch_size, max_per_host or batch_size)
+
+    hosts: Dict[str, Dict[str, int]] = {}
+    for url in map(entry_url, entries):
+        if not url:
+            continue
+        if include and not url_matches(url, include):
+            continue
+        if exclude and url_matches(url, exclude):
+            continue
+        depth = path_depth(url)
+        if max_depth is not None and depth > max_depth:
+            continue
+        hosts.setdefault(urlsplit(url).netloc, {})[url] = depth
+
+    batches = []
+    small: List[Tuple[str, List[str]]] = []
+    for host, urls in hosts.items():
+        ordered = sorted(urls, key=lambda url: (urls[url], url))
+        count = -(-len(ordered) // per_host)
+        # Spread URLs evenly so the last batch of a host is not a tiny remainder.
+        size, extra = divmod(len(ordered), count)
+        start = 0
+        for i in range(count):
+            end = start + size + (1 if i < extra else 0)
+            if end - start <= batch_size // 2:
+                small.append((host, ordered[start:end]))
+            else:
+                batches.append(ordered[start:end])
+            start = end
+
+    # First-fit decreasing packing; a shared batch takes one group per host to keep the per-host cap.
+    shared: List[Tuple[Set[str], List[str]]] = []
+    for host, urls in sorted(small, key=lambda group: -len(group[1])):
+        for batch_hosts, batch in shared:
+            if host not in batch_hosts and len(batch) + len(urls) <= batch_size:
+                batch_hosts.add(host)
+                batch.extend(urls)
+                break
+        else:
+            shared.append(({host}, list(urls)))
+    return batches + [batch for _, batch in shared]
+
+
+@dataclass
+class PlannedBatch:
+    urls: List[str]
+    request: Optional[dict] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def uuid(self) -> Optional[str]:
+        return self.request['uuid'] if self.request else None
+
+
+class BatchCrawlHandle:
+    """Tracks every batch crawl request spawned by a `CrawlPlanner` submission."""
+
+    def __init__(self, client, batches: List[PlannedBatch]):
+        self.client = client
+        self.batches = batches
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    @property
+    def uuids(self) -> List[str]:
+        return [batch.uuid for batch in self.batches if batch.uuid]
+
+    @property
+    def failed(self) -> List[PlannedBatch]:
+        """Batches whose submission raised an error."""
+        return [batch for batch in self.batches if batch.error is not None]
+
+    def statuses(self, **kwargs) -> Dict[str, BulkResult]:
+        """Status snapshot of all spawned crawl requests, see `get_crawl_requests_status`."""
+        return self.client.get_crawl_requests_status(self.uuids, **kwargs)
+
+    def is_finished(self) -> bool:
+        return all(
+            outcome.ok and outcome.result.get('status') in FINAL_STATUSES
+            for outcome in self.statuses().values()
+        )
+
+    def stop(self, max_workers: int = 8) -> Dict[str, BulkResult]:
+        """Stop all spawned crawl requests."""
+        return self.client.stop_crawl_requests(self.uuids, max_workers=max_workers)
+
+
+class CrawlPlanner:
+    """Plans batch crawl requests from sitemap results and submits them with bounded concurrency."""
+
+    def __init__(
+            self,
+            client,
+            batch_size: int = 100,
+            include: Sequence[str] = None,
+            exclude: Sequence[str] = None,
+            max_depth: int = None,
+            max_per_host: int = None,
+            max_workers: int = 4,
+            spider_options: dict = None,
+            page_options: dict = None,
+            plugin_options: dict = None
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.include = include
+        self.exclude = exclude
+        self.max_depth = max_depth
+        self.max_per_host = max_per_host
+        self.max_workers = max_workers
+        self.spider_options = spider_options
+        self.page_options = page_options
+        self.plugin_options = plugin_options
+
+    def plan(self, entries: Iterable[Union[str, dict]]) -> List[List[str]]:
+        return plan_batches(
+            entries,
+            batch_size=self.batch_size,
+            include=self.include,
+            exclude=self.exclude,
+            max_depth=self.max_depth,
+            max_per_host=self.max_per_host,
+        )
+
+    def submit(self, entries: Iterable[Union[str, dict]]) -> BatchCrawlHandle:
+        """
+        Plan batches from sitemap entries and create one batch crawl request per batch.
+
+        Submission errors are recorded on the batch instead of aborting the remaining submissions.
+        """
+        return self.submit_batches(self.plan(entries))
+
+    def submit_batches(self, batches: Iterable[List[str]]) -> BatchCrawlHandle:
+        planned = [PlannedBatch(urls=list(urls)) for urls in batches]
+        context = copy_context()
+
+        def submit(batch: PlannedBatch):
+            try:
+                batch.request = context.copy().run(
+                    self.client.create_batch_crawl_request,
+                    urls=batch.urls,
+                    spider_options=self.spider_options,
+                    page_options=self.page_options,
+                    plugin_options=self.plugin_options,
+                )
+            except Exception as e:
+                batch.error = e
+
+        if planned:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(planned)))) as executor:
+                list(executor.map(submit, planned))
+        return BatchCrawlHandle(self.client, planned)
@@ -0,0 +1,166 @@
+import time
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+from requests.exceptions import RequestException
+
+from .events import MonitorStream, is_final_state
+from .sitemap import entry_url
+
+MONITOR_MODES = ('stream', 'poll', 'auto')
+
+
+class AdaptiveInterval:
+    """
+    Polling interval that shortens while polls observe progress and backs off while they do not.
+    """
+
+    def __init__(self, min_interval: float = 1.0, max_interval: float = 15.0, backoff: float = 1.5):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError('Expected 0 < min_interval <= max_interval')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.current = min_interval
+
+    def update(self, progressed: bool) -> float:
+        if progressed:
+            self.current = max(self.min_interval, self.current / 2)
+        else:
+            self.current = min(self.max_interval, self.current * self.backoff)
+        return self.current
+
+
+def poll_request(
+        get_request: Callable[[], dict],
+        get_results_page: Callable[[int, int], dict] = None,
+        interval: AdaptiveInterval = None,
+        page_size: int = 100,
+        seen: Set[str] = None,
+        sleep: Callable[[float], None] = time.sleep
+) -> Iterator[dict]:
+    """
+    Monitor a request by polling, yielding events shaped like the event stream's.
+
+    Every poll reads the request and, when ``get_results_page`` is given, the results pages from the
+    first one that may hold unseen results. A ``state`` event is yielded whenever the request object
+    changes and a ``result`` event for every new result; polling stops after the request reaches a
+    final status.
+
+    Args:
+        get_request: Returns the current request object
+        get_results_page: Returns the results page for ``(page, page_size)``
+        interval: Polling interval, adapted to the observed progress
+        page_size: Number of results fetched per page
+        seen: URLs of results that were already delivered, for instance by an interrupted stream
+        sleep: Function used to wait between polls
+    """
+    interval = interval or AdaptiveInterval()
+    seen = set() if seen is None else seen
+    # Results are listed in a stable order, so only the page holding result number ``offset`` onwards can be new.
+    offset = 0
+    last_state = None
+    while True:
+        request = get_request()
+        progressed = False
+
+        if get_results_page is not None:
+            page = offset // page_size + 1
+            while True:
+                response = get_results_page(page, page_size)
+                results = response.get('results') or []
+                for position, result in enumerate(results, start=(page - 1) * page_size):
+                    if position < offset:
+                        continue
+                    offset = position + 1
+                    url = entry_url(result)
+                    if url is not None:
+                        if url in seen:
+                            continue
+                        seen.add(url)
+                    progressed = True
+                    yield {'type': 'result', 'data': result}
+                if not response.get('next') or len(results) < page_size:
+                    break
+                page += 1
+
+        if request != last_state:
+            progressed = True
+            last_state = request
+            event = {'type': 'state', 'data': request}
+            yield event
+            if is_final_state(event):
+                return
+        sleep(interval.update(progressed))
+
+
+class FallbackMonitor(MonitorStream):
+    """
+    Event stream that switches to polling when the stream stalls or breaks.
+
+    The stream is opened with a read timeout of ``stall_timeout`` seconds. If no data arrives within that
+    time, the connection fails, or the stream ends before the request reached a final state, monitoring
+    continues with polling. Results already delivered by the stream are not delivered again.
+    """
+
+    def __init__(
+            self,
+            open_stream: Callable[[], Iterable[dict]],
+            poll: Callable[[Set[str]], Iterator[dict]],
+            errors=(RequestException, OSError),
+            on_abandon: Callable[[], None] = None
+    ):
+        """
+        Args:
+            open_stream: Opens the event stream
+            poll: Starts polling, given the URLs of the results already delivered
+            errors: Exceptions that trigger the switch to polling
+            on_abandon: Called when the monitor is closed before the request reached a final state
+        """
+        self.open_stream = open_stream
+        self.poll = poll
+        self.errors = errors
+        self.stream = None
+        self.switched = False
+        self.switch_reason: Optional[str] = None
+        self._seen: Set[str] = set()
+        super().__init__(self._read(), on_abandon=on_abandon)
+
+    @property
+    def response(self):
+        return getattr(self.stream, 'response', None)
+
+    @property
+    def bytes_read(self) -> int:
+        return getattr(self.stream, 'bytes_read', 0)
+
+    @property
+    def events_read(self) -> int:
+        return getattr(self.stream, 'events_read', 0)
+
+    def _release(self):
+        if self.response is not None:
+            self.response.close()
+        super()._release()
+
+    def _read(self):
+        try:
+            self.stream = self.open_stream()
+            for event in self.stream:
+                if event.get('type') == 'result':
+                    url = entry_url(event.get('data'))
+                    if url is not None:
+                        self._seen.add(url)
+                yield event
+                if is_final_state(event):
+                    return
+            self.switch_reason = 'stream ended before a final state'
+        except self.errors as e:
+            self.switch_reason = f'{type(e).__name__}: {e}'
+        finally:
+            if self.response is not None:
+                self.response.close()
+        if self.closed:
+            return
+        self.switched = True
+        yield from self.poll(self._seen)
+
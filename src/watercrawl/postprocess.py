@@ -0,0 +1,318 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from queue import Queue
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .events import close_monitor
+from .sitemap import entry_url
+
+_TOKEN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_HORIZONTAL_SPACE = re.compile(r'[^\S\n]+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+_CONTROL = dict.fromkeys(c for c in range(32) if c not in (9, 10))
+_LINK_ONLY = re.compile(r'^\W*(\[[^\]]*\]\([^)]*\)\W*)+$')
+_BOILERPLATE = re.compile(
+    r'^\W*(skip to (main )?content|accept( all)? cookies|we use cookies|all rights reserved|©|copyright \d{4}'
+    r'|privacy policy|terms of (use|service)|share (this|on)|follow us|subscribe to our newsletter)',
+    re.IGNORECASE
+)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize, drop control characters, collapse runs of spaces and of blank lines."""
+    text = unicodedata.normalize('NFKC', text).translate(_CONTROL)
+    text = _HORIZONTAL_SPACE.sub(' ', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Remove navigation-like lines from markdown or text.
+
+    Dropped are lines made of links only, lines matching common cookie, copyright and sharing notices,
+    and short lines repeated three times or more on the page.
+    """
+    lines = text.split('\n')
+    repeated = Counter(line.strip() for line in lines if 0 < len(line.strip()) < 80)
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped and (_LINK_ONLY.match(stripped) or _BOILERPLATE.match(stripped) or repeated[stripped] >= 3):
+            continue
+        kept.append(line)
+    return '\n'.join(kept)
+
+
+class _TextExtractor(HTMLParser):
+    SKIPPED = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer', 'aside', 'form'}
+    BLOCKS = {'p', 'div', 'section', 'article', 'main', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'pre', 'blockquote', 'table', 'ul', 'ol'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append('\n\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append('\n\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Extract the visible text of an HTML document, skipping scripts, styles and page chrome."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def chunk_text(text: str, max_tokens: int = 512, overlap: int = 0,
+               tokenizer: Callable[[str], int] = count_tokens) -> List[str]:
+    """
+    Split text into chunks of at most ``max_tokens`` tokens.
+
+    Chunks break at paragraph boundaries, then at sentence boundaries, then between words. With ``overlap``,
+    each chunk starts with up to that many tokens worth of the previous chunk's trailing sentences.
+    """
+    if max_tokens < 1:
+        raise ValueError('max_tokens must be at least 1')
+    pieces = []
+    for paragraph in text.split('\n\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if tokenizer(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if tokenizer(sentence) <= max_tokens:
+                pieces.append(sentence)
+                continue
+            words, current = sentence.split(), []
+            for word in words:
+                if current and tokenizer(' '.join(current + [word])) > max_tokens:
+                    pieces.append(' '.join(current))
+                    current = []
+                current.append(word)
+            if current:
+                pieces.append(' '.join(current))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        tokens = tokenizer(piece)
+        if current and size + tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            carried, carried_size = [], 0
+            for previous in reversed(current):
+                previous_size = tokenizer(previous)
+                if carried_size + previous_size > overlap or carried_size + previous_size + tokens > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous_size
+            current, size = carried, carried_size
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def result_text(result, source: str = 'markdown') -> Optional[Tuple[str, bool, dict]]:
+    """
+    The downloaded text of a result event or result object, whether it is HTML, and the page metadata.
+
+    ``source`` names the preferred field, ``markdown`` or ``html``; the other one is used if it is missing.
+    Returns None for other events and for results that were not downloaded.
+    """
+    if isinstance(result, dict) and result.get('type') == 'result':
+        result = result.get('data')
+    if not isinstance(result, dict) or not isinstance(result.get('result'), dict):
+        return None
+    content = result['result']
+    fields = ('markdown', 'html') if source == 'markdown' else ('html', 'markdown')
+    for name in fields:
+        if isinstance(content.get(name), str) and content[name]:
+            metadata = content.get('metadata') if isinstance(content.get('metadata'), dict) else {}
+            return content[name], name == 'html', metadata
+    return None
+
+
+@dataclass
+class Chunk:
+    """A piece of a page's text, with the position of the page in the stream and of the chunk in the page."""
+    url: Optional[str]
+    page_index: int
+    index: int
+    count: int
+    text: str
+    tokens: int
+    metadata: dict = field(default_factory=dict)
+
+
+def process_text(url: Optional[str], page_index: int, text: str, is_html: bool, metadata: dict,
+                 max_tokens: int, overlap: int, boilerplate: bool,
+                 tokenizer: Callable[[str], int] = count_tokens) -> List[Chunk]:
+    """Extract, clean, normalize and chunk the text of one page. Runs in the worker processes."""
+    if is_html:
+        text = html_to_text(text)
+    if boilerplate:
+        text = strip_boilerplate(text)
+    texts = chunk_text(normalize_text(text), max_tokens=max_tokens, overlap=overlap, tokenizer=tokenizer)
+    return [Chunk(url, page_index, index, len(texts), chunk, tokenizer(chunk), metadata)
+            for index, chunk in enumerate(texts)]
+
+
+class PostProcessor:
+    """
+    Chunks scraped pages for embedding on a process pool.
+
+    `process` takes a result stream, such as a `monitor_crawl_request` monitor or a list of result objects,
+    and reads it on a background thread, so network reads never wait for the CPU-bound work. Every page's
+    text (markdown by default, or HTML) goes through boilerplate stripping, normalization and token-bounded
+    chunking on the pool, and its chunks come back in order with their page and chunk positions.
+    """
+
+    def __init__(
+            self,
+            max_tokens: int = 512,
+            overlap: int = 0,
+            source: str = 'markdown',
+            boilerplate: bool = True,
+            tokenizer: Callable[[str], int] = count_tokens,
+            max_workers: int = None,
+            max_pending: int = None,
+            ordered: bool = True,
+            executor: Executor = None
+    ):
+        """
+        Args:
+            max_tokens: Maximum number of tokens per chunk
+            overlap: Tokens of trailing sentences repeated at the start of the next chunk
+            source: ``markdown`` or ``html``, the result field to chunk; the other one is used if it is missing
+            boilerplate: Strip navigation, cookie and copyright lines
+            tokenizer: Picklable function counting the tokens of a text
+            max_workers: Number of worker processes (default: number of CPUs)
+            max_pending: Maximum number of pages read ahead of the consumer (default: 4 per worker)
+            ordered: Yield pages in stream order; if False, pages are yielded as soon as they are processed
+            executor: Executor to use instead of a new process pool; it is not shut down by `close`
+        """
+        if source not in ('markdown', 'html'):
+            raise ValueError('source must be "markdown" or "html"')
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.source = source
+        self.boilerplate = boilerplate
+        self.tokenizer = tokenizer
+        self.ordered = ordered
+        self.skipped = 0
+        self._owns_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+        workers = max_workers or getattr(self.executor, '_max_workers', None) or 4
+        self.max_pending = max_pending or 4 * workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+
+    def page_text(self, result) -> Optional[Tuple[str, bool, dict]]:
+        """The text to chunk of a result event or result object, whether it is HTML, and its metadata."""
+        return result_text(result, self.source)
+
+    def process(self, results: Iterable) -> Iterator[Chunk]:
+        """
+        Chunk every page of ``results``.
+
+        Events other than results and results without downloaded content are skipped and counted in `skipped`.
+
+        Yields:
+            Chunks, page by page, in chunk order
+        """
+        outcomes: Queue = Queue()
+        slots = threading.Semaphore(self.max_pending)
+        stop = threading.Event()
+        submitted = []
+
+        def read():
+            try:
+                page_index = 0
+                for result in results:
+                    if stop.is_set():
+                        return
+                    page = self.page_text(result)
+                    if page is None:
+                        if not isinstance(result, dict) or result.get('type', 'result') == 'result':
+                            self.skipped += 1
+                        continue
+                    text, is_html, metadata = page
+                    url = entry_url(result.get('data') if result.get('type') == 'result' else result)
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    future = self.executor.submit(
+                        process_text, url, page_index, text, is_html, metadata,
+                        self.max_tokens, self.overlap, self.boilerplate, self.tokenizer
+                    )
+                    submitted.append(future)
+                    if self.ordered:
+                        outcomes.put(('page', future))
+                    else:
+                        future.add_done_callback(lambda done: outcomes.put(('page', done)))
+                    page_index += 1
+            except BaseException as e:
+                outcomes.put(('error', e))
+            finally:
+                outcomes.put(('read', len(submitted)))
+
+        reader = threading.Thread(target=read, name='watercrawl-postprocess', daemon=True)
+        reader.start()
+        received, total = 0, None
+        try:
+            while total is None or received < total:
+                kind, value = outcomes.get()
+                if kind == 'error':
+                    raise value
+                if kind == 'read':
+                    total = value
+                    continue
+                received += 1
+                try:
+                    chunks = value.result()
+                finally:
+                    slots.release()
+                yield from chunks
+        finally:
+            stop.set()
+            for future in submitted:
+                future.cancel()
+            if reader.is_alive():
+                close_monitor(results)
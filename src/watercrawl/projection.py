@@ -0,0 +1,173 @@
+import json
+import re
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+_WHITESPACE = b' \t\n\r'
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+
+Spec = Dict[str, Union[bool, 'Spec']]
+
+
+def compile_fields(fields: Iterable[str]) -> Spec:
+    """
+    Turn dotted field paths into a projection spec.
+
+    ``['url', 'result.markdown']`` becomes ``{'url': True, 'result': {'markdown': True}}``.
+    """
+    if isinstance(fields, str):
+        fields = [fields]
+    spec = {}
+    for field in fields:
+        node = spec
+        parts = field.split('.')
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return spec
+
+
+def project(raw: Union[bytes, str], spec: Spec):
+    """
+    Decode ``raw`` keeping only the keys selected by ``spec``.
+
+    The projection works on the encoded bytes: unwanted values are skipped by scanning for their end,
+    so large strings such as ``html`` or ``markdown`` are never materialized when not requested.
+    Nested specs are applied to nested objects and to every object of a nested array; values that are
+    not objects are decoded as they are.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    pos = _skip_whitespace(raw, 0)
+    value, _ = _project_value(raw, pos, spec)
+    return value
+
+
+def scan_object(raw: bytes, pos: int = 0) -> Dict[str, Tuple[int, int]]:
+    """
+    Locate the values of a JSON object's top-level keys without decoding them.
+
+    Returns:
+        Dictionary mapping each key to the ``(start, end)`` byte span of its value
+    """
+    return _scan_object(raw, pos)[0]
+
+
+def _scan_object(raw: bytes, pos: int) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    pos = _skip_whitespace(raw, pos)
+    if raw[pos:pos + 1] != b'{':
+        raise ValueError(f'Expected a JSON object at position {pos}')
+    spans = {}
+    pos = _skip_whitespace(raw, pos + 1)
+    if raw[pos:pos + 1] == b'}':
+        return spans, pos + 1
+    while True:
+        key_end = _skip_string(raw, pos)
+        key = json.loads(raw[pos:key_end])
+        pos = _skip_whitespace(raw, key_end)
+        if raw[pos:pos + 1] != b':':
+            raise ValueError(f'Expected ":" at position {pos}')
+        start = _skip_whitespace(raw, pos + 1)
+        end = _skip_value(raw, start)
+        spans[key] = (start, end)
+        pos = _skip_whitespace(raw, end)
+        separator = raw[pos:pos + 1]
+        if separator == b'}':
+            return spans, pos + 1
+        if separator != b',':
+            raise ValueError(f'Expected "," or "}}" at position {pos}')
+        pos = _skip_whitespace(raw, pos + 1)
+
+
+def event_decoder(spec: Optional[Spec]):
+    """
+    Build a decoder for monitor event payloads applying ``spec`` to the ``data`` of ``result`` events.
+
+    Other events (state, feed, ...) are decoded in full.
+    """
+    if not spec:
+        return json.loads
+
+    def decode(payload: bytes):
+        spans = scan_object(payload)
+        if 'type' not in spans or 'data' not in spans:
+            return json.loads(payload)
+        event = {key: json.loads(payload[start:end]) for key, (start, end) in spans.items() if key != 'data'}
+        start, end = spans['data']
+        data = payload[start:end]
+        event['data'] = project(data, spec) if event['type'] == 'result' else json.loads(data)
+        return event
+
+    return decode
+
+
+def _project_value(raw: bytes, pos: int, spec: Spec):
+    first = raw[pos:pos + 1]
+    if first == b'{':
+        spans, end = _scan_object(raw, pos)
+        value = {}
+        for key, child in spec.items():
+            if key not in spans:
+                continue
+            start, stop = spans[key]
+            value[key] = json.loads(raw[start:stop]) if child is True else _project_value(raw, start, child)[0]
+        return value, end
+    if first == b'[':
+        items = []
+        pos = _skip_whitespace(raw, pos + 1)
+        if raw[pos:pos + 1] == b']':
+            return items, pos + 1
+        while True:
+            item, pos = _project_value(raw, pos, spec)
+            items.append(item)
+            pos = _skip_whitespace(raw, pos)
+            if raw[pos:pos + 1] == b']':
+                return items, pos + 1
+            pos = _skip_whitespace(raw, pos + 1)
+    end = _skip_value(raw, pos)
+    return json.loads(raw[pos:end]), end
+
+
+def _skip_whitespace(raw: bytes, pos: int) -> int:
+    while raw[pos:pos + 1] and raw[pos:pos + 1] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _skip_string(raw: bytes, pos: int) -> int:
+    end = pos
+    while True:
+        end = raw.find(b'"', end + 1)
+        if end == -1:
+            raise ValueError(f'Unterminated string starting at position {pos}')
+        backslashes = 0
+        while raw[end - 1 - backslashes] == 0x5c:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+
+
+def _skip_value(raw: bytes, pos: int) -> int:
+    first = raw[pos:pos + 1]
+    if first == b'"':
+        return _skip_string(raw, pos)
+    if first in (b'{', b'['):
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(raw, pos)
+            if match is None:
+                raise ValueError('Unterminated JSON value')
+            char = match.group()
+            if char == b'"':
+                pos = _skip_string(raw, match.start())
+                continue
+            pos = match.end()
+            depth += 1 if char in b'{[' else -1
+            if depth == 0:
+                return pos
+    match = _SCALAR_END.search(raw, pos)
+    return match.start() if match else len(raw)
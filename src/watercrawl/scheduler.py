@@ -0,0 +1,289 @@
+import functools
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+_current_workload = ContextVar('watercrawl_workload', default=None)
+
+
+@dataclass
+class WorkloadClass:
+    """
+    A class of calls sharing a queue.
+
+    Classes with a higher ``priority`` are always admitted first; classes with the same priority share
+    the budget in proportion to their ``weight``.
+    """
+    name: str
+    priority: int = 0
+    weight: float = 1.0
+
+
+@dataclass
+class WorkloadStats:
+    name: str
+    priority: int
+    weight: float
+    queued: int = 0
+    running: int = 0
+    admitted: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        """Mean time in seconds admitted calls spent queued."""
+        return self.wait_total / self.admitted if self.admitted else 0.0
+
+
+class _Ticket:
+    __slots__ = ('workload', 'finish', 'seq', 'enqueued', 'granted')
+
+    def __init__(self, workload: str, finish: float, seq: int):
+        self.workload = workload
+        self.finish = finish
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class Scheduler:
+    """
+    Client-side admission control with priorities and weighted fair queuing.
+
+    Every HTTP call of a client holding a scheduler waits for a slot. At most ``max_concurrency`` calls
+    run at once and, if ``rate`` is set, at most ``rate`` calls start per second. When the budget is
+    exhausted calls are queued per workload class: the highest priority class with queued calls goes first,
+    and classes of equal priority are served by weighted fair queuing, so a backlog of bulk work cannot
+    starve interactive calls.
+
+    The workload of a call is taken from the innermost `workload` block, then from the client's
+    classification of the endpoint (``crawl``, ``search`` or ``sitemap``), then ``default_workload``.
+    Unknown workload names, such as tenant ids, get their own class with priority 0 and weight 1.
+    A slot is held until the response headers arrive, so reading an event stream does not hold one.
+    """
+
+    DEFAULT_CLASSES = (
+        WorkloadClass('interactive', priority=10),
+        WorkloadClass('crawl'),
+        WorkloadClass('search'),
+        WorkloadClass('sitemap'),
+    )
+
+    def __init__(
+            self,
+            max_concurrency: int = 8,
+            rate: float = None,
+            burst: int = None,
+            classes: Iterable[WorkloadClass] = None,
+            default_workload: str = 'default'
+    ):
+        """
+        Args:
+            max_concurrency: Maximum number of calls in flight
+            rate: Maximum number of calls started per second, unlimited if not given
+            burst: Number of calls that may start at once under the rate limit (default: max_concurrency)
+            classes: Workload classes, `DEFAULT_CLASSES` if not given
+            default_workload: Workload of calls that are not otherwise classified
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = max(1, burst or max_concurrency)
+        self.default_workload = default_workload
+
+        self._classes: Dict[str, WorkloadClass] = {}
+        self._stats: Dict[str, WorkloadStats] = {}
+        self._queues: Dict[str, deque] = {}
+        self._last_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        for workload_class in (self.DEFAULT_CLASSES if classes is None else classes):
+            self.add_class(workload_class.name, workload_class.priority, workload_class.weight)
+
+    def add_class(self, name: str, priority: int = 0, weight: float = 1.0) -> WorkloadClass:
+        """Add a workload class or change the priority and weight of an existing one."""
+        if weight <= 0:
+            raise ValueError('weight must be positive')
+        with self._cond:
+            workload_class = self._classes[name] = WorkloadClass(name, priority, weight)
+            stats = self._stats.setdefault(name, WorkloadStats(name, priority, weight))
+            stats.priority, stats.weight = priority, weight
+            self._queues.setdefault(name, deque())
+            return workload_class
+
+    def set_max_concurrency(self, max_concurrency: int):
+        """Change the number of calls in flight; running calls above a lowered limit are not interrupted."""
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        with self._cond:
+            self.max_concurrency = max_concurrency
+            self.__dispatch()
+
+    @property
+    def classes(self) -> Dict[str, WorkloadClass]:
+        with self._cond:
+            return dict(self._classes)
+
+    @staticmethod
+    @contextmanager
+    def workload(name: str, override: bool = True):
+        """
+        Run the enclosed calls under workload ``name``.
+
+        The workload follows the current context, including the worker threads of the client's bulk helpers.
+        With ``override=False`` an enclosing workload is kept.
+        """
+        if not override and _current_workload.get() is not None:
+            yield
+            return
+        token = _current_workload.set(name)
+        try:
+            yield
+        finally:
+            _current_workload.reset(token)
+
+    @staticmethod
+    def current_workload() -> Optional[str]:
+        return _current_workload.get()
+
+    def acquire(self, workload: str = None, timeout: float = None) -> float:
+        """
+        Wait for a slot.
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            TimeoutError: If no slot was granted within ``timeout`` seconds
+        """
+        workload = workload or self.current_workload() or self.default_workload
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if workload not in self._classes:
+                self.add_class(workload)
+            ticket = self.__enqueue(workload)
+            while True:
+                delay = self.__dispatch()
+                if ticket.granted:
+                    return self.__admitted(ticket)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._queues[workload].remove(ticket)
+                        self._stats[workload].queued -= 1
+                        self._cond.notify_all()
+                        raise TimeoutError(f'No slot for workload {workload!r} within {timeout} seconds')
+                    delay = remaining if delay is None else min(delay, remaining)
+                self._cond.wait(delay)
+
+    def release(self, workload: str):
+        """Return the slot of a call of ``workload`` that has finished."""
+        with self._cond:
+            self._running -= 1
+            self._stats[workload].running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, workload: str = None, timeout: float = None):
+        """Hold a slot for the enclosed block, yielding the workload it was granted to."""
+        workload = workload or self.current_workload() or self.default_workload
+        self.acquire(workload, timeout=timeout)
+        try:
+            yield workload
+        finally:
+            self.release(workload)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a slot."""
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        with self._cond:
+            return self._running
+
+    def stats(self) -> Dict[str, WorkloadStats]:
+        """Snapshot of the queue depth, running calls and wait times of every workload class."""
+        with self._cond:
+            return {
+                name: WorkloadStats(stats.name, stats.priority, stats.weight, stats.queued, stats.running,
+                                    stats.admitted, stats.wait_total, stats.wait_max)
+                for name, stats in self._stats.items()
+            }
+
+    def __enqueue(self, workload: str) -> _Ticket:
+        # Start-time fair queuing: a class that has been idle restarts at the current virtual time
+        # instead of claiming the share it did not use.
+        start = max(self._virtual_time, self._last_finish.get(workload, 0.0))
+        finish = self._last_finish[workload] = start + 1.0 / self._classes[workload].weight
+        ticket = _Ticket(workload, finish, next(self._seq))
+        self._queues[workload].append(ticket)
+        self._stats[workload].queued += 1
+        return ticket
+
+    def __dispatch(self) -> Optional[float]:
+        """Grant slots to the queue heads in scheduling order, returning how long to wait for a rate token."""
+        granted = False
+        delay = None
+        while self._running < self.max_concurrency:
+            heads = [queue[0] for queue in self._queues.values() if queue]
+            if not heads:
+                break
+            if self.rate:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens < 1:
+                    delay = (1 - self._tokens) / self.rate
+                    break
+                self._tokens -= 1
+            ticket = min(heads, key=lambda head: (-self._classes[head.workload].priority, head.finish, head.seq))
+            self._queues[ticket.workload].popleft()
+            self._virtual_time = max(self._virtual_time, ticket.finish - 1.0 / self._classes[ticket.workload].weight)
+            ticket.granted = True
+            self._running += 1
+            stats = self._stats[ticket.workload]
+            stats.queued -= 1
+            stats.running += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        return delay
+
+    def __admitted(self, ticket: _Ticket) -> float:
+        waited = time.monotonic() - ticket.enqueued
+        stats = self._stats[ticket.workload]
+        stats.admitted += 1
+        stats.wait_total += waited
+        stats.wait_max = max(stats.wait_max, waited)
+        return waited
+
+
+def scheduled(workload: str):
+    """Decorator running a client method under ``workload`` unless the caller already chose one."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if getattr(self, 'scheduler', None) is None:
+                return method(self, *args, **kwargs)
+            with self.scheduler.workload(workload, override=False):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,72 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .bulk import BulkResult
+from .sitemap import entry_url
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for deduplication: lowercase scheme and host, no fragment, no trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+class MultiSearch:
+    """
+    Iterator over the merged results of many searches, in the order the searches finish.
+
+    Every result is a copy of the search result with a ``query`` key naming the query that found it.
+    With ``dedupe`` a URL is yielded only the first time it is found; `queries_by_url` lists every query
+    that found it. Failed searches do not stop the iteration and are collected in `errors`.
+    """
+
+    def __init__(self, outcomes: Iterable[BulkResult], dedupe: bool = True):
+        """
+        Args:
+            outcomes: BulkResults of `create_search_request` calls keyed by query, in completion order
+            dedupe: Drop results whose URL was already yielded for another query
+        """
+        self.dedupe = dedupe
+        self.queries_by_url: Dict[str, List[str]] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.completed: List[str] = []
+        self.duplicates = 0
+        self._results = self._merge(outcomes)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        return next(self._results)
+
+    def _merge(self, outcomes: Iterable[BulkResult]) -> Iterator[dict]:
+        for outcome in outcomes:
+            query = outcome.item_id
+            request = outcome.result
+            if outcome.ok and (not isinstance(request, dict) or request.get('status') != 'finished'):
+                outcome = BulkResult(query, error=Exception(f'Search request failed: {query}'))
+            if not outcome.ok:
+                self.errors[query] = outcome.error
+                continue
+
+            self.completed.append(query)
+            results = request.get('result')
+            if not isinstance(results, list):
+                # Results are only merged when downloaded, a URL to the result file is passed through.
+                yield {'query': query, 'result': results}
+                continue
+            for result in results:
+                key = self.__key(result)
+                if key is not None:
+                    queries = self.queries_by_url.setdefault(key, [])
+                    queries.append(query)
+                    if self.dedupe and len(queries) > 1:
+                        self.duplicates += 1
+                        continue
+                yield dict(result, query=query) if isinstance(result, dict) else {'query': query, 'result': result}
+
+    @staticmethod
+    def __key(result) -> Optional[str]:
+        url = entry_url(result)
+        return normalize_url(url) if isinstance(url, str) and url else None
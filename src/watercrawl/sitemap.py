@@ -0,0 +1,151 @@
+import sys
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Iterable, List, Optional, Union
+from urllib.parse import urlsplit
+
+
+def entry_url(entry: Union[str, dict]) -> Optional[str]:
+    """Return the URL of a sitemap entry, which is either a plain URL or an object with a ``url`` key."""
+    if isinstance(entry, str):
+        return entry
+    if isinstance(entry, dict):
+        return entry.get('url')
+    return None
+
+
+@dataclass
+class SitemapDiff:
+    added: List[str]
+    removed: List[str]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class SitemapIndex:
+    """
+    Compact, query-friendly index over the URLs of a sitemap.
+
+    URLs are interned and kept in one sorted list, so prefix queries are two binary searches and
+    glob queries only scan the range matching the pattern's literal prefix.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._urls = sorted({sys.intern(url) for url in urls})
+        self._url_set = None
+        self._origins = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Union[str, dict]]) -> 'SitemapIndex':
+        """Build an index from sitemap JSON entries, such as the output of `iter_sitemap_results`."""
+        return cls(url for url in map(entry_url, entries) if url)
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __iter__(self):
+        return iter(self._urls)
+
+    def __contains__(self, url: str):
+        return url in self.url_set
+
+    @property
+    def url_set(self) -> frozenset:
+        if self._url_set is None:
+            self._url_set = frozenset(self._urls)
+        return self._url_set
+
+    @property
+    def origins(self) -> List[str]:
+        """Distinct ``scheme://host`` prefixes present in the index."""
+        if self._origins is None:
+            origins = {}
+            i = 0
+            while i < len(self._urls):
+                parts = urlsplit(self._urls[i])
+                origin = f'{parts.scheme}://{parts.netloc}'
+                origins[origin] = None
+                if self._urls[i].startswith(origin + '/'):
+                    # Skip the contiguous run of URLs sharing this origin.
+                    i = bisect_left(self._urls, origin + '/\U0010ffff', i)
+                else:
+                    i += 1
+            self._origins = list(origins)
+        return self._origins
+
+    def prefix(self, prefix: str) -> List[str]:
+        """
+        Return all URLs starting with ``prefix``.
+
+        A prefix starting with ``/`` is treated as a path and matched on every origin in the index.
+        """
+        if prefix.startswith('/'):
+            return [url for origin in self.origins for url in self.__range(origin + prefix)]
+        return self.__range(prefix)
+
+    def count_prefix(self, prefix: str) -> int:
+        if prefix.startswith('/'):
+            return sum(self.__count(origin + prefix) for origin in self.origins)
+        return self.__count(prefix)
+
+    def glob(self, pattern: str) -> List[str]:
+        """
+        Return all URLs matching a shell-style pattern (``*``, ``?``, ``[...]``).
+
+        Like `prefix`, a pattern starting with ``/`` is matched against the path of every origin.
+        """
+        if pattern.startswith('/'):
+            return [url for origin in self.origins for url in self.glob(origin + pattern)]
+
+        literal = pattern
+        for i, char in enumerate(pattern):
+            if char in '*?[':
+                literal = pattern[:i]
+                break
+        return [url for url in self.__range(literal) if fnmatchcase(url, pattern)]
+
+    def count_by_segment(self, prefix: str = '/', depth: int = 1) -> Counter:
+        """
+        Count URLs per path segment below ``prefix``.
+
+        Args:
+            prefix: URL or path prefix to restrict the count to
+            depth: Number of path segments after the prefix to group by
+
+        Returns:
+            Counter mapping the grouped segments (e.g. ``docs/api``) to the number of URLs below them
+        """
+        counts = Counter()
+        base = prefix if prefix.startswith('/') else urlsplit(prefix).path
+        for url in self.prefix(prefix):
+            path = urlsplit(url).path
+            rest = path[len(base):] if path.startswith(base) else path
+            segments = [segment for segment in rest.split('/') if segment][:depth]
+            counts['/'.join(segments)] += 1
+        return counts
+
+    def diff(self, other: 'SitemapIndex') -> SitemapDiff:
+        """
+        Compare this sitemap with an older one.
+
+        Returns:
+            SitemapDiff with the sorted URLs added and removed since ``other``
+        """
+        current, previous = self.url_set, other.url_set
+        return SitemapDiff(
+            added=sorted(current - previous),
+            removed=sorted(previous - current),
+        )
+
+    def __range(self, prefix: str) -> List[str]:
+        start = bisect_left(self._urls, prefix)
+        end = bisect_left(self._urls, prefix + '\U0010ffff', start)
+        return self._urls[start:end]
+
+    def __count(self, prefix: str) -> int:
+        start = bisect_left(self._urls, prefix)
+        return bisect_left(self._urls, prefix + '\U0010ffff', start) - start
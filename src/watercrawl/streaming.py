@@ -0,0 +1,132 @@
+import codecs
+import json
+from typing import Any, Generator, IO, Iterable, Union
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_items(chunks: Iterable[bytes], key: str = None) -> Generator[Any, None, None]:
+    """
+    Incrementally parse a JSON document from byte chunks.
+
+    If the top-level value is an array its elements are yielded one by one as soon as they are complete,
+    so only the element being parsed is held in memory. With ``key``, the top-level value may instead be an
+    object whose ``key`` member is the array to stream, such as ``results``; the object's other members are
+    parsed one at a time and dropped, and nothing is yielded if the member is missing.
+
+    Any other top-level value is read whole and yielded once, so a large document that is neither an array
+    nor an object holding the ``key`` array is held in memory.
+
+    Args:
+        chunks: Iterable of raw (utf-8 encoded) byte chunks
+        key: Member of a top-level object holding the array to stream
+
+    Yields:
+        Decoded array elements, or the single decoded top-level value
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+
+    def fill():
+        nonlocal buffer, pos, exhausted
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if pos:
+                buffer = buffer[pos:]
+                pos = 0
+            buffer += text_decoder.decode(chunk)
+            return True
+        buffer += text_decoder.decode(b'', final=True)
+        exhausted = True
+        return False
+
+    def skip(characters):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in characters:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                fill()
+                continue
+            # A value touching the end of the buffer may be a truncated number or literal.
+            if end >= len(buffer) and not exhausted and fill():
+                continue
+            pos = end
+            return value
+
+    def items():
+        nonlocal pos
+        pos += 1
+        while True:
+            skip(_WHITESPACE + ',')
+            if pos >= len(buffer):
+                raise ValueError('Unexpected end of JSON array')
+            if buffer[pos] == ']':
+                pos += 1
+                return
+            yield decode()
+
+    skip(_WHITESPACE)
+    if pos >= len(buffer):
+        return
+
+    if buffer[pos] == '[':
+        yield from items()
+        return
+
+    if key is not None and buffer[pos] == '{':
+        pos += 1
+        while True:
+            skip(_WHITESPACE + ',')
+            if pos >= len(buffer):
+                raise ValueError('Unexpected end of JSON object')
+            if buffer[pos] == '}':
+                return
+            name = decode()
+            skip(_WHITESPACE)
+            if pos >= len(buffer) or buffer[pos] != ':':
+                raise ValueError('Expected ":" after a JSON object key')
+            pos += 1
+            skip(_WHITESPACE)
+            if name == key and buffer[pos:pos + 1] == '[':
+                yield from items()
+                return
+            decode()
+
+    while fill():
+        pass
+    yield json.loads(buffer[pos:])
+
+
+def write_chunks(chunks: Iterable[bytes], sink: Union[str, IO[bytes]]) -> int:
+    """
+    Write byte chunks to a path or binary file object.
+
+    Returns:
+        Number of bytes written
+    """
+    if isinstance(sink, str):
+        with open(sink, 'wb') as f:
+            return write_chunks(chunks, f)
+
+    written = 0
+    for chunk in chunks:
+        if chunk:
+            sink.write(chunk)
+            written += len(chunk)
+    return written
@@ -1,12 +1,43 @@
+import gc
+import io
+import json
 import os
 import unittest
+import zipfile
 import logging
 import sys
+import tempfile
+import threading
 import time
-from requests import api
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import requests
+from requests import Response, api
 from requests.exceptions import HTTPError, RequestException
 
 from .api import WaterCrawlAPIClient
+from .limiter import AdaptiveLimiter
+from .graph import LinkGraphBuilder
+from .dedup import NearDuplicateFilter, lsh_bands
+from .postprocess import PostProcessor, chunk_text, html_to_text, strip_boilerplate
+from .pipeline import SearchScrapePipeline, SitemapCrawlPipeline, feed_urls
+from .search import MultiSearch, normalize_url
+from .polling import AdaptiveInterval, FallbackMonitor, poll_request
+from .journal import JobJournal, ResumableJob
+from .scheduler import Scheduler, WorkloadClass
+from .transport import HTTPXTransport, RequestsTransport, Transport, Urllib3Transport
+from .tracing import Tracer
+from .cli import completed_inputs, drop_partial_line, export_job, run_jobs, written_results
+from .buffering import BufferedMonitor
+from .projection import compile_fields, event_decoder, project
+from .events import EventStream, MonitorStream, iter_sse_data
+from .monitoring import InstrumentedMonitor
+from .planner import CrawlPlanner, plan_batches
+from .sitemap import SitemapIndex
+from .streaming import iter_json_items, write_chunks
+from .archive import CrawlArchive
+from .bulk import BulkResult, run_bulk, collect_from_pages
 
 
 # Set up logging
@@ -481,5 +512,1173 @@ class TestWaterCrawlAPI(unittest.TestCase):
             error_msg = self.handle_api_error(e, "stop_sitemap_request")
             self.fail(error_msg)
 
+
+class TestBulkHelpers(unittest.TestCase):
+    def test_run_bulk_captures_errors_per_id(self):
+        def stop(item_id):
+            if item_id == 'bad':
+                raise ValueError('boom')
+            return item_id.upper()
+
+        outcomes = run_bulk(stop, ['a', 'bad', 'b', 'a'], max_workers=4)
+        self.assertEqual(list(outcomes), ['a', 'bad', 'b'])
+        self.assertEqual(outcomes['a'].result, 'A')
+        self.assertFalse(outcomes['bad'].ok)
+        self.assertIsInstance(outcomes['bad'].error, ValueError)
+
+    def test_collect_from_pages_stops_when_all_found(self):
+        pages = {
+            1: {'results': [{'uuid': 'a'}, {'uuid': 'x'}], 'next': 'page2'},
+            2: {'results': [{'uuid': 'b'}], 'next': 'page3'},
+        }
+        calls = []
+
+        def list_page(page, page_size):
+            calls.append(page)
+            return pages[page]
+
+        found = collect_from_pages(list_page, ['a', 'b'])
+        self.assertEqual(set(found), {'a', 'b'})
+        self.assertEqual(calls, [1, 2])
+
+    def test_status_scans_a_bounded_number_of_pages(self):
+        client = WaterCrawlAPIClient('key')
+        pages = []
+        client.get_crawl_requests_list = lambda page, page_size: pages.append(page) or {
+            'results': [{'uuid': f'recent-{page}', 'status': 'running'}], 'next': 'more'
+        }
+        client.get_crawl_request = lambda item_id: {'uuid': item_id, 'status': 'finished'}
+
+        statuses = client.get_crawl_requests_status(['recent-1', 'old-1', 'old-2', 'old-3', 'old-4'])
+        self.assertEqual(pages, [1, 2, 3])
+        self.assertEqual(statuses['recent-1'].result['status'], 'running')
+        self.assertEqual(statuses['old-4'].result['status'], 'finished')
+
+        pages.clear()
+        client.get_crawl_requests_status(['old-1'])
+        self.assertEqual(pages, [1])
+
+
+class TestCrawlArchive(unittest.TestCase):
+    def make_archive(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('a.json', json.dumps({'url': 'https://example.com/a', 'result': {'markdown': 'A'}}))
+            zf.writestr('b.json', json.dumps({'url': 'https://example.com/b', 'result': {'markdown': 'B'}}))
+            zf.writestr('readme.txt', 'not a result')
+        buffer.seek(0)
+        return CrawlArchive(buffer)
+
+    def test_lists_and_iterates_results(self):
+        with self.make_archive() as archive:
+            self.assertEqual(len(archive.entries()), 3)
+            self.assertEqual(archive.result_names(), ['a.json', 'b.json'])
+            self.assertEqual([r['url'] for r in archive.iter_results()],
+                             ['https://example.com/a', 'https://example.com/b'])
+
+    def test_url_lookup(self):
+        with self.make_archive() as archive:
+            self.assertEqual(archive.get('https://example.com/b')['result']['markdown'], 'B')
+            self.assertEqual(archive.member_for_url('https://example.com/a'), 'a.json')
+            self.assertIsNone(archive.get('https://example.com/missing'))
+
+
+class TestStreaming(unittest.TestCase):
+    def test_iter_json_items_across_chunk_boundaries(self):
+        entries = [{'url': f'https://example.com/{i}', 'title': 'é' * i} for i in range(50)] + [1234, None]
+        raw = json.dumps(entries).encode('utf-8')
+        for size in (1, 7, 4096):
+            chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+            self.assertEqual(list(iter_json_items(chunks)), entries)
+
+    def test_iter_json_items_non_array(self):
+        self.assertEqual(list(iter_json_items([b'{"a": ', b'1}'])), [{'a': 1}])
+        self.assertEqual(list(iter_json_items([b' [] '])), [])
+
+    def test_iter_json_items_nested_array(self):
+        document = {'count': 3, 'next': None, 'meta': {'results': [0]}, 'results': [{'url': 'a'}, 1, [2]],
+                    'after': 'x'}
+        raw = json.dumps(document).encode('utf-8')
+        for size in (1, 5, 4096):
+            chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+            self.assertEqual(list(iter_json_items(chunks, key='results')), [{'url': 'a'}, 1, [2]])
+        self.assertEqual(list(iter_json_items([b'{"count": 0}'], key='results')), [])
+        self.assertEqual(list(iter_json_items([b'[1, 2]'], key='results')), [1, 2])
+
+    def test_write_chunks(self):
+        sink = io.BytesIO()
+        self.assertEqual(write_chunks([b'ab', b'', b'c'], sink), 3)
+        self.assertEqual(sink.getvalue(), b'abc')
+
+
+class TestSitemapIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SitemapIndex.from_entries([
+            {'url': 'https://example.com/docs/api/create'},
+            {'url': 'https://example.com/docs/api/list'},
+            {'url': 'https://example.com/docs/guide'},
+            {'url': 'https://example.com/blog/post-1'},
+            'https://example.com.cdn/docs/asset',
+            {'title': 'entry without url'},
+        ])
+
+    def test_prefix_and_glob(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertCountEqual(self.index.origins, ['https://example.com', 'https://example.com.cdn'])
+        self.assertEqual(self.index.count_prefix('/docs/'), 4)
+        self.assertEqual(self.index.prefix('https://example.com/docs/api/'),
+                         ['https://example.com/docs/api/create', 'https://example.com/docs/api/list'])
+        self.assertEqual(self.index.glob('/docs/*/list'), ['https://example.com/docs/api/list'])
+
+    def test_count_by_segment(self):
+        counts = self.index.count_by_segment('https://example.com/')
+        self.assertEqual(counts, {'docs': 3, 'blog': 1})
+
+    def test_diff(self):
+        previous = SitemapIndex(['https://example.com/docs/guide', 'https://example.com/old'])
+        diff = self.index.diff(previous)
+        self.assertIn('https://example.com/blog/post-1', diff.added)
+        self.assertEqual(diff.removed, ['https://example.com/old'])
+        self.assertTrue(diff.changed)
+
+
+class TestCrawlPlanner(unittest.TestCase):
+    def test_plan_batches_groups_by_host_and_filters(self):
+        urls = [f'https://a.com/docs/{i}' for i in range(5)] + [
+            'https://a.com/docs/file.pdf',
+            'https://a.com/blog/post',
+            'https://b.com/docs/x',
+            'https://a.com/docs/1',
+        ]
+        batches = plan_batches(urls, batch_size=2, include=['/docs/*'], exclude=['*.pdf'])
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2])
+        self.assertEqual(batches[-1], ['https://a.com/docs/4', 'https://b.com/docs/x'])
+        self.assertTrue(all(len({url.split('/')[2] for url in batch}) == 1 for batch in batches[:2]))
+
+    def test_plan_batches_packs_small_hosts(self):
+        urls = [f'https://host{i}.com/' for i in range(25)] + [f'https://big.com/{i}' for i in range(12)]
+        batches = plan_batches(urls, batch_size=10)
+        self.assertEqual([len(batch) for batch in batches], [6, 6, 10, 10, 5])
+        self.assertCountEqual([url for batch in batches for url in batch], urls)
+
+        batches = plan_batches(urls, batch_size=10, max_per_host=2)
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 10, 3, 2, 2])
+        for batch in batches:
+            hosts = [url.split('/')[2] for url in batch]
+            self.assertLessEqual(max(hosts.count(host) for host in hosts), 2)
+
+    def test_submit_records_errors_per_batch(self):
+        class FakeClient:
+            def create_batch_crawl_request(self, urls, **kwargs):
+                if 'https://b.com/' in urls:
+                    raise ValueError('rejected')
+                return {'uuid': urls[0]}
+
+        handle = CrawlPlanner(FakeClient(), batch_size=1).submit(['https://a.com/', 'https://b.com/'])
+        self.assertEqual(handle.uuids, ['https://a.com/'])
+        self.assertEqual(len(handle.failed), 1)
+
+    def test_is_finished_uses_every_final_status(self):
+        class FakeClient:
+            def get_crawl_requests_status(self, item_ids):
+                return {item_id: BulkResult(item_id, result={'status': status})
+                        for item_id, status in zip(item_ids, ['finished', 'cancelled'])}
+
+            def create_batch_crawl_request(self, urls, **kwargs):
+                return {'uuid': urls[0]}
+
+        handle = CrawlPlanner(FakeClient(), batch_size=1).submit(['https://a.com/', 'https://a.com/b'])
+        self.assertTrue(handle.is_finished())
+
+
+class TestInstrumentedMonitor(unittest.TestCase):
+    def test_counts_events_and_bytes(self):
+        class Events:
+            bytes_read = 0
+
+            def __init__(self):
+                self.items = iter([{'type': 'state'}, {'type': 'result'}])
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                item = next(self.items)
+                self.bytes_read += 10
+                return item
+
+        seen = []
+        monitor = InstrumentedMonitor(Events(), on_event=lambda event, stats: seen.append(stats.events))
+        self.assertEqual([event['type'] for event in monitor], ['state', 'result'])
+        stats = monitor.snapshot()
+        self.assertEqual(seen, [1, 2])
+        self.assertEqual(stats.events, 2)
+        self.assertEqual(stats.bytes, 20)
+        self.assertTrue(stats.finished)
+
+    def test_reports_stall(self):
+        def slow_events():
+            yield {'type': 'state'}
+            time.sleep(0.3)
+            yield {'type': 'state'}
+
+        stalls = []
+        monitor = InstrumentedMonitor(slow_events(), stall_timeout=0.1, on_stall=stalls.append)
+        self.assertEqual(len(list(monitor)), 2)
+        self.assertEqual(len(stalls), 1)
+        self.assertTrue(stalls[0].stalled)
+
+
+    def test_watchdog_stops_when_done_or_dropped(self):
+        def events():
+            yield {'type': 'state'}
+            yield {'type': 'result'}
+
+        with InstrumentedMonitor(events(), stall_timeout=0.04) as monitor:
+            next(monitor)
+            watchdog = monitor._watchdog
+            self.assertTrue(watchdog.is_alive())
+        watchdog.join(1)
+        self.assertFalse(watchdog.is_alive())
+
+        monitor = InstrumentedMonitor(events(), stall_timeout=0.04)
+        self.assertEqual(len(list(monitor)), 2)
+        monitor._watchdog.join(1)
+        self.assertFalse(monitor._watchdog.is_alive())
+
+        monitor = InstrumentedMonitor(events(), stall_timeout=0.04)
+        next(monitor)
+        watchdog = monitor._watchdog
+        del monitor
+        gc.collect()
+        watchdog.join(1)
+        self.assertFalse(watchdog.is_alive())
+
+class TestEventStream(unittest.TestCase):
+    body = (b': keep-alive\n\ndata: {"type": "state", "data": {"status": "running"}}\r\n\r\n'
+            b'event: message\ndata: {"type": "result", "data": {"url": "https://example.com"}}\n\n')
+
+    def test_iter_sse_data_any_chunking(self):
+        for size in (1, 5, 1024):
+            chunks = [self.body[i:i + size] for i in range(0, len(self.body), size)]
+            payloads = [json.loads(payload) for payload in iter_sse_data(chunks)]
+            self.assertEqual([payload['type'] for payload in payloads], ['state', 'result'])
+
+    def test_event_stream_reads_raw_response(self):
+        class FakeResponse:
+            raw = io.BytesIO(self.body)
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        response = FakeResponse()
+        stream = EventStream(response, chunk_size=16)
+        self.assertEqual([event['type'] for event in stream], ['state', 'result'])
+        self.assertEqual(stream.bytes_read, len(self.body))
+        self.assertEqual(stream.events_read, 2)
+        self.assertTrue(response.closed)
+
+    def test_closing_early_releases_and_stops(self):
+        class FakeResponse:
+            raw = io.BytesIO(b'data: {"type": "state", "data": {"status": "running"}}\n\n' * 3)
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        stopped = []
+        response = FakeResponse()
+        with EventStream(response, on_abandon=lambda: stopped.append(True)) as stream:
+            next(stream)
+        self.assertTrue(response.closed)
+        self.assertEqual(stopped, [True])
+        self.assertEqual(list(stream), [])
+
+        finished = io.BytesIO(b'data: {"type": "state", "data": {"status": "finished"}}\n\n')
+        response = FakeResponse()
+        response.raw = finished
+        with EventStream(response, on_abandon=lambda: stopped.append(False)) as stream:
+            next(stream)
+        self.assertEqual(stopped, [True])
+
+
+class TestProjection(unittest.TestCase):
+    def test_project_nested_fields(self):
+        page = {'uuid': 'u', 'url': 'https://example.com', 'result': {
+            'html': '<p class="x">"quoted" \\ text</p>', 'markdown': 'text',
+            'links': ['https://example.com/a'], 'metadata': {'title': 'Example', 'size': 1.5e3},
+        }}
+        spec = compile_fields(['url', 'result.metadata.title', 'result.links'])
+        self.assertEqual(project(json.dumps(page).encode('utf-8'), spec), {
+            'url': 'https://example.com',
+            'result': {'metadata': {'title': 'Example'}, 'links': ['https://example.com/a']},
+        })
+
+    def test_project_applies_to_arrays(self):
+        body = json.dumps({'count': 2, 'results': [{'url': 'a', 'result': 'x'}, {'url': 'b'}]})
+        self.assertEqual(project(body, {'count': True, 'results': compile_fields(['url'])}),
+                         {'count': 2, 'results': [{'url': 'a'}, {'url': 'b'}]})
+
+    def test_event_decoder_only_projects_results(self):
+        decode = event_decoder(compile_fields(['url']))
+        result = json.dumps({'type': 'result', 'data': {'url': 'a', 'result': {'html': 'x'}}}).encode('utf-8')
+        state = json.dumps({'type': 'state', 'data': {'status': 'running'}}).encode('utf-8')
+        self.assertEqual(decode(result), {'type': 'result', 'data': {'url': 'a'}})
+        self.assertEqual(decode(state), {'type': 'state', 'data': {'status': 'running'}})
+
+
+class TestBufferedMonitor(unittest.TestCase):
+    def test_spills_overflow_and_preserves_order(self):
+        events = [{'type': 'result', 'data': {'index': i}} for i in range(50)]
+        with BufferedMonitor(iter(events), max_queue=3) as monitor:
+            time.sleep(0.1)  # let the reader run ahead of the consumer
+            received = list(monitor)
+            self.assertEqual(received, events)
+            self.assertGreater(monitor.spilled_total, 0)
+            spill_path = monitor.spill_path
+        self.assertFalse(os.path.exists(spill_path))
+
+    def test_without_spill_applies_backpressure(self):
+        events = ({'index': i} for i in range(10))
+        monitor = BufferedMonitor(events, max_queue=2, spill=False)
+        time.sleep(0.05)
+        self.assertLessEqual(monitor.pending, 2)
+        self.assertEqual([event['index'] for event in monitor], list(range(10)))
+        self.assertEqual(monitor.spilled_total, 0)
+
+    def test_propagates_stream_errors(self):
+        def events():
+            yield {'index': 0}
+            raise ConnectionError('stream dropped')
+
+        monitor = BufferedMonitor(events())
+        self.assertEqual(next(monitor), {'index': 0})
+        with self.assertRaises(ConnectionError):
+            next(monitor)
+
+    def test_close_closes_the_wrapped_monitor(self):
+        def events():
+            while True:
+                yield {'type': 'state', 'data': {'status': 'running'}}
+
+        stopped = []
+        stream = MonitorStream(events(), on_abandon=lambda: stopped.append(True))
+        monitor = BufferedMonitor(stream, max_queue=2, spill=False)
+        next(monitor)
+        monitor.close()
+        self.assertTrue(stream.closed)
+        self.assertEqual(stopped, [True])
+
+
+class TestCli(unittest.TestCase):
+    def test_run_jobs_writes_jsonl_and_resumes(self):
+        def job(item):
+            if item == 'bad':
+                raise ValueError('nope')
+            yield {'result': item.upper()}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.jsonl')
+            with open(path, 'w') as output:
+                stats = run_jobs(['a', 'bad', 'b'], job, output, concurrency=2)
+            self.assertEqual(stats, {'succeeded': 2, 'failed': 1})
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(sorted(r['input'] for r in records), ['a', 'b', 'bad'])
+            self.assertEqual(completed_inputs(path), {'a', 'b'})
+
+    def test_export_streams_pages_and_marks_completion(self):
+        class FakeClient:
+            def get_crawl_request_results(self, item_id, page, page_size, download):
+                written.append(os.path.getsize(path))
+                if item_id == 'broken' and page == 2:
+                    raise ConnectionError('dropped')
+                return {'results': [{'url': f'{item_id}-{page}'}], 'next': 'more' if page < 2 else None}
+
+        written = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.jsonl')
+            job = export_job(FakeClient(), SimpleNamespace(page_size=1))
+            with open(path, 'w') as output:
+                run_jobs(['a', 'broken'], job, output, concurrency=1)
+            # The first page was on disk before the second one was requested.
+            self.assertGreater(written[1], 0)
+            self.assertEqual(completed_inputs(path, 'exported'), {'a'})
+
+            with open(path, 'a') as output:
+                output.write('{"input": "b", "resu')
+            drop_partial_line(path)
+            with open(path, 'a') as output:
+                run_jobs(['broken'], export_job(FakeClient(), SimpleNamespace(page_size=1)), output)
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual([r for r in records if r['input'] == 'a'][-1], {'input': 'a', 'exported': 2})
+
+    def test_export_resumes_after_written_results(self):
+        class FakeClient:
+            def get_crawl_request_results(self, item_id, page, page_size, download):
+                requested.append(page)
+                urls = [f'{item_id}-{i}' for i in range(5)]
+                return {'results': [{'url': url} for url in urls[(page - 1) * page_size:page * page_size]],
+                        'next': 'more' if page * page_size < len(urls) else None}
+
+        requested = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.jsonl')
+            with open(path, 'w') as output:
+                for i in range(3):
+                    output.write(json.dumps({'result': {'url': f'a-{i}'}, 'input': 'a'}) + '\n')
+                output.write(json.dumps({'input': 'a', 'error': 'ConnectionError: dropped'}) + '\n')
+            self.assertEqual(completed_inputs(path, 'exported'), set())
+            args = SimpleNamespace(page_size=2, written=written_results(path))
+            with open(path, 'a') as output:
+                run_jobs(['a'], export_job(FakeClient(), args), output)
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            urls = [r['result']['url'] for r in records if 'result' in r]
+            self.assertEqual(urls, [f'a-{i}' for i in range(5)])
+            self.assertEqual(records[-1], {'input': 'a', 'exported': 5})
+            self.assertEqual(requested, [2, 3])
+
+
+class TestTracer(unittest.TestCase):
+    def test_client_calls_are_traced(self):
+        class FakeResponse:
+            status_code = 200
+            headers = {'Content-Type': 'application/json'}
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {'uuid': 'abc'}
+
+        class FakeSession:
+            headers = {}
+
+            def request(self, method, url, **kwargs):
+                return FakeResponse()
+
+        tracer = Tracer()
+        client = WaterCrawlAPIClient('key', tracer=tracer, transport=RequestsTransport(FakeSession()))
+        client.get_crawl_requests(['abc'])
+
+        spans = {span.name: span for span in tracer.spans}
+        self.assertEqual(set(spans), {'get_crawl_requests', 'GET', 'process_response'})
+        self.assertIsNone(spans['get_crawl_requests'].parent_id)
+        self.assertEqual(spans['GET'].args['endpoint'], '/api/v1/core/crawl-requests/abc/')
+
+        trace = tracer.to_chrome_trace()
+        self.assertEqual(len(trace['traceEvents']), 3)
+        self.assertTrue(all(event['ph'] == 'X' for event in trace['traceEvents']))
+        otlp_spans = tracer.to_otlp()['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual(len(otlp_spans), 3)
+
+    def test_nested_spans_and_errors(self):
+        tracer = Tracer()
+        with self.assertRaises(ValueError):
+            with tracer.span('outer'):
+                with tracer.span('inner'):
+                    raise ValueError('boom')
+        inner, outer = tracer.spans
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertIn('ValueError', inner.args['error'])
+
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class TestHTTPXTransport(unittest.TestCase):
+    def make_client(self, handler):
+        return WaterCrawlAPIClient('key', transport=HTTPXTransport(transport=httpx.MockTransport(handler)))
+
+    def test_json_and_event_stream(self):
+        def handler(request):
+            self.assertEqual(request.headers['X-API-Key'], 'key')
+            if request.url.path.endswith('/status/'):
+                self.assertEqual(request.url.params['prefetched'], 'True')
+                body = b'data: {"type": "state", "data": {"status": "finished"}}\n\n'
+                return httpx.Response(200, headers={'Content-Type': 'text/event-stream'}, content=body)
+            return httpx.Response(200, json={'uuid': 'abc'})
+
+        client = self.make_client(handler)
+        self.assertEqual(client.get_crawl_request('abc'), {'uuid': 'abc'})
+        events = list(client.monitor_crawl_request('abc'))
+        self.assertEqual(events[0]['data']['status'], 'finished')
+
+    def test_errors_raise_requests_http_error(self):
+        client = self.make_client(lambda request: httpx.Response(404, json={'detail': 'Not found'}))
+        with self.assertRaises(HTTPError) as context:
+            client.get_crawl_request('missing')
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_http2_option_is_passed_on(self):
+        self.assertFalse(WaterCrawlAPIClient('key', transport='httpx').transport.http2)
+        self.assertTrue(WaterCrawlAPIClient('key', transport='httpx', http2=True).transport.http2)
+        self.assertTrue(WaterCrawlAPIClient('key', http2=True).transport.http2)
+        for transport in ('urllib3', 'requests'):
+            with self.assertRaises(ValueError):
+                WaterCrawlAPIClient('key', transport=transport, http2=True)
+
+    def test_events_are_delivered_live(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _LocalAPIHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = WaterCrawlAPIClient('key', base_url=f'http://127.0.0.1:{server.server_port}/', transport='httpx')
+            start = time.monotonic()
+            arrivals = [time.monotonic() - start for _ in client.monitor_crawl_request('slow')]
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(len(arrivals), 3)
+        self.assertLess(arrivals[0], 0.25)
+        self.assertLess(arrivals[1], 0.55)
+
+
+class _LocalAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/api/v1/core/crawl-requests/missing/'):
+            self.reply(404, 'application/json', b'{"detail": "Not found"}')
+        elif self.path.startswith('/api/v1/core/crawl-requests/slow/status/'):
+            self.stream_events(['running', 'running', 'finished'], delay=0.3)
+        elif '/status/' in self.path:
+            self.reply(200, 'text/event-stream', b'data: {"type": "state", "data": {"status": "finished"}}\n\n')
+        else:
+            self.reply(200, 'application/json', json.dumps({'path': self.path}).encode('utf-8'))
+
+    def stream_events(self, statuses, delay):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, status in enumerate(statuses):
+            if index:
+                time.sleep(delay)
+            body = f'data: {{"type": "state", "data": {{"status": "{status}"}}}}\n\n'.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(body), body))
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUrllib3Transport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _LocalAPIHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.client = WaterCrawlAPIClient(
+            'key', base_url=f'http://127.0.0.1:{self.server.server_port}/', transport='urllib3'
+        )
+
+    def test_json_event_stream_and_errors(self):
+        self.assertIsInstance(self.client.transport, Urllib3Transport)
+        response = self.client.get_crawl_request_results('abc', page=2, download=True)
+        self.assertEqual(response['path'], '/api/v1/core/crawl-requests/abc/results/?page=2&page_size=10&prefetched=True')
+        events = list(self.client.monitor_crawl_request('abc'))
+        self.assertEqual(events[0]['data']['status'], 'finished')
+        with self.assertRaises(HTTPError) as context:
+            self.client.get_crawl_request('missing')
+        self.assertEqual(context.exception.response.status_code, 404)
+
+
+class TestRequestsTransport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _LocalAPIHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_submit_uses_a_session_per_thread(self):
+        with WaterCrawlAPIClient('key', base_url=self.base_url, max_workers=3) as client:
+            futures = [client.submit_get_results(f'id-{i}') for i in range(6)]
+            self.assertEqual(sorted(f.result()['path'].split('/')[5] for f in futures),
+                             [f'id-{i}' for i in range(6)])
+            outcomes = list(client.map_completed(client.get_crawl_request, ['a', 'missing', 'b']))
+            self.assertCountEqual([o.item_id for o in outcomes], ['a', 'missing', 'b'])
+            self.assertEqual([o.item_id for o in outcomes if not o.ok], ['missing'])
+            sessions = client.transport._sessions
+            self.assertLessEqual(len(sessions), 3)
+            self.assertIs(next(iter(sessions)).headers, client.transport.headers)
+
+    def test_thread_sessions_are_closed_when_threads_exit(self):
+        with WaterCrawlAPIClient('key', base_url=self.base_url) as client:
+            for _ in range(5):
+                outcomes = client.get_crawl_requests([f'id-{i}' for i in range(8)])
+                self.assertTrue(all(outcome.ok for outcome in outcomes.values()))
+            gc.collect()
+            self.assertEqual(len(client.transport._sessions), 0)
+            client.get_crawl_request('a')
+            self.assertEqual(len(client.transport._sessions), 1)
+
+
+    def test_transport_subclasses_must_implement_request(self):
+        class Incomplete(Transport):
+            headers = {}
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_assigned_session_is_used_by_every_thread(self):
+        session = requests.Session()
+        session.headers['X-API-Key'] = 'other'
+        with WaterCrawlAPIClient('key', base_url=self.base_url) as client:
+            client.session = session
+            self.assertIs(client.session, session)
+            self.assertEqual(client.submit(client.get_crawl_request, 'a').result()['path'],
+                             '/api/v1/core/crawl-requests/a/')
+            self.assertIs(client.executor.submit(lambda: client.session).result(), session)
+
+class TestScheduler(unittest.TestCase):
+    def queue_behind_busy_slot(self, scheduler, workloads):
+        order = []
+        scheduler.acquire('blocker')
+        threads = []
+        for workload in workloads:
+            def run(workload=workload):
+                with scheduler.slot(workload):
+                    order.append(workload)
+            thread = threading.Thread(target=run)
+            thread.start()
+            threads.append(thread)
+            while scheduler.queue_depth < len(threads):
+                time.sleep(0.001)
+        scheduler.release('blocker')
+        for thread in threads:
+            thread.join()
+        return order
+
+    def test_priority_then_weighted_fair_share(self):
+        scheduler = Scheduler(max_concurrency=1, classes=[
+            WorkloadClass('interactive', priority=10), WorkloadClass('bulk', weight=1), WorkloadClass('tenant', weight=3)
+        ])
+        order = self.queue_behind_busy_slot(scheduler, ['bulk'] * 4 + ['tenant'] * 6 + ['interactive'])
+        self.assertEqual(order[0], 'interactive')
+        self.assertEqual(order[1:5].count('tenant'), 3)
+        stats = scheduler.stats()
+        self.assertEqual(stats['tenant'].admitted, 6)
+        self.assertEqual(stats['bulk'].queued, 0)
+        self.assertGreater(stats['bulk'].wait_max, 0)
+
+    def test_timeout_and_rate(self):
+        scheduler = Scheduler(max_concurrency=1)
+        scheduler.acquire()
+        with self.assertRaises(TimeoutError):
+            scheduler.acquire('search', timeout=0.01)
+        self.assertEqual(scheduler.queue_depth, 0)
+        scheduler.release('default')
+
+        scheduler = Scheduler(max_concurrency=10, rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(3):
+            with scheduler.slot():
+                pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+
+    def test_client_classifies_calls(self):
+        class FakeSession:
+            headers = {}
+
+            def request(self, method, url, **kwargs):
+                seen.append((Scheduler.current_workload(), url))
+                response = Response()
+                response.status_code = 200
+                response.headers['Content-Type'] = 'application/json'
+                response._content = b'{"uuid": "x", "results": [], "next": null}'
+                return response
+
+        seen = []
+        scheduler = Scheduler()
+        client = WaterCrawlAPIClient('key', transport=RequestsTransport(FakeSession()), scheduler=scheduler)
+        client.get_sitemap_request('x')
+        with scheduler.workload('tenant-a'):
+            client.get_crawl_requests(['a', 'b'])
+        stats = scheduler.stats()
+        self.assertEqual(stats['sitemap'].admitted, 1)
+        self.assertEqual(stats['tenant-a'].admitted, 2)
+        self.assertEqual(stats['tenant-a'].running, 0)
+
+
+class TestResumableJob(unittest.TestCase):
+    class FakeClient:
+        def __init__(self):
+            self.created = []
+
+        def create_crawl_request(self, url, **kwargs):
+            self.created.append(url)
+            return {'uuid': f'uuid-{len(self.created)}'}
+
+        def monitor_crawl_request(self, item_id, download=True):
+            yield {'type': 'state', 'data': {'status': 'running'}}
+            yield {'type': 'result', 'data': {'url': 'https://a.com/1'}}
+            yield {'type': 'result', 'data': {'url': 'https://a.com/2'}}
+            yield {'type': 'state', 'data': {'status': 'finished'}}
+
+        def get_crawl_request_results(self, item_id, page=1, page_size=10, download=False):
+            return {'results': [{'url': 'https://a.com/2'}, {'url': 'https://a.com/3'}], 'next': None}
+
+        def get_crawl_requests_list(self, page=1, page_size=10):
+            return {'results': [{'uuid': 'server-uuid', 'url': 'https://b.com/',
+                                 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}]}
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_resume_skips_consumed_results(self):
+        client = self.FakeClient()
+        with JobJournal(self.path) as journal:
+            job = ResumableJob(client, journal)
+            job.submit('a', url='https://a.com/')
+            events = job.monitor('a')
+            self.assertEqual(next(events)['type'], 'state')
+            self.assertEqual(next(events)['data']['url'], 'https://a.com/1')
+            next(events)  # the first result has been processed
+            events.close()  # the process dies while handling the second one
+
+        seen = []
+        with JobJournal(self.path) as journal:
+            outcome = ResumableJob(client, journal).run({'a': {'url': 'https://a.com/'}},
+                                                        on_event=lambda key, event: seen.append(event))
+            self.assertEqual(outcome['a'].result.status, 'completed')
+            self.assertEqual([e['data'].get('url') for e in seen if e['type'] == 'result'],
+                             ['https://a.com/2', 'https://a.com/3'])
+            self.assertEqual(len(list(journal.results('a'))), 3)
+            self.assertEqual(client.created, ['https://a.com/'])
+            self.assertEqual(list(ResumableJob(client, journal).monitor('a')), [])
+
+    def test_first_run_does_not_page_results(self):
+        client = self.FakeClient()
+        client.get_crawl_request_results = None
+        with JobJournal(self.path) as journal:
+            outcome = ResumableJob(client, journal).run({'a': {'url': 'https://a.com/'}})
+            self.assertEqual(outcome['a'].result.status, 'completed')
+            self.assertEqual([result['url'] for result in journal.results('a')], ['https://a.com/1', 'https://a.com/2'])
+
+    def test_closing_early_closes_the_monitor(self):
+        client = self.FakeClient()
+        streams = []
+        monitor_crawl_request = client.monitor_crawl_request
+
+        def monitor(item_id, download=True):
+            streams.append(MonitorStream(monitor_crawl_request(item_id, download)))
+            return streams[-1]
+
+        client.monitor_crawl_request = monitor
+        with JobJournal(self.path) as journal:
+            job = ResumableJob(client, journal)
+            job.submit('a', url='https://a.com/')
+            events = job.monitor('a')
+            next(events)
+            events.close()
+            self.assertTrue(streams[0].closed)
+
+    def test_interrupted_submission_is_matched(self):
+        client = self.FakeClient()
+        with JobJournal(self.path) as journal:
+            journal.begin('b', 'crawl', {'url': 'https://b.com/'})
+            entry = ResumableJob(client, journal).submit('b', url='https://b.com/')
+            self.assertEqual(entry.uuid, 'server-uuid')
+            self.assertEqual(client.created, [])
+
+
+class TestPolling(unittest.TestCase):
+    def test_poll_request_fetches_new_pages_and_adapts(self):
+        states = iter([{'status': 'running', 'n': 1}, {'status': 'running', 'n': 1}, {'status': 'finished', 'n': 3}])
+        available = [[{'url': 'u1'}, {'url': 'u2'}], [{'url': 'u1'}, {'url': 'u2'}], [{'url': f'u{i}'} for i in range(1, 6)]]
+        pages, sleeps = [], []
+        poll = {'count': 0}
+
+        def get_request():
+            poll['count'] += 1
+            return next(states)
+
+        def get_results_page(page, page_size):
+            pages.append(page)
+            results = available[poll['count'] - 1]
+            start = (page - 1) * page_size
+            return {'results': results[start:start + page_size], 'next': len(results) > start + page_size}
+
+        events = list(poll_request(get_request, get_results_page, AdaptiveInterval(1, 8), page_size=2,
+                                   seen={'u1'}, sleep=sleeps.append))
+        self.assertEqual([e['data'].get('url') for e in events if e['type'] == 'result'], ['u2', 'u3', 'u4', 'u5'])
+        self.assertEqual([e['data']['n'] for e in events if e['type'] == 'state'], [1, 3])
+        self.assertEqual(pages, [1, 2, 2, 3])
+        self.assertEqual(sleeps, [1, 1.5])
+
+    def test_fallback_after_stream_breaks(self):
+        def open_stream():
+            yield {'type': 'result', 'data': {'url': 'u1'}}
+            raise RequestException('stalled')
+
+        def poll(seen):
+            self.assertEqual(seen, {'u1'})
+            yield {'type': 'result', 'data': {'url': 'u2'}}
+            yield {'type': 'state', 'data': {'status': 'finished'}}
+
+        monitor = FallbackMonitor(open_stream, poll)
+        self.assertEqual([e['type'] for e in monitor], ['result', 'result', 'state'])
+        self.assertTrue(monitor.switched)
+        self.assertIn('stalled', monitor.switch_reason)
+
+
+class TestMultiSearch(unittest.TestCase):
+    def test_merges_in_completion_order_and_dedupes(self):
+        outcomes = [
+            BulkResult('b', result={'status': 'finished', 'result': [{'url': 'https://x.com/1'}, {'url': 'https://Y.com/'}]}),
+            BulkResult('c', error=RequestException('boom')),
+            BulkResult('a', result={'status': 'finished', 'result': [{'url': 'https://y.com'}, {'url': 'https://z.com/'}]}),
+            BulkResult('d', result={'status': 'failed'}),
+        ]
+        search = MultiSearch(outcomes)
+        self.assertEqual([(r['url'], r['query']) for r in search],
+                         [('https://x.com/1', 'b'), ('https://Y.com/', 'b'), ('https://z.com/', 'a')])
+        self.assertEqual(search.queries_by_url[normalize_url('https://y.com')], ['b', 'a'])
+        self.assertEqual(search.duplicates, 1)
+        self.assertEqual(sorted(search.errors), ['c', 'd'])
+        self.assertEqual(search.completed, ['b', 'a'])
+
+
+class TestSearchScrapePipeline(unittest.TestCase):
+    class FakeClient:
+        def __init__(self):
+            self.executor = ThreadPoolExecutor(max_workers=4)
+            self.first_page_seen = threading.Event()
+            self.batches = []
+
+        def submit(self, func, *args):
+            return self.executor.submit(func, *args)
+
+        def create_search_request(self, query, search_options=None, result_limit=5, sync=True):
+            return {'uuid': 'search-uuid'}
+
+        def monitor_search_request(self, item_id, download=True):
+            yield {'type': 'state', 'data': {'status': 'running', 'result': [{'url': 'https://a.com/'}]}}
+            # The search only goes on once the first hit has been scraped and yielded.
+            self.overlapped = self.first_page_seen.wait(5)
+            yield {'type': 'state', 'data': {'status': 'finished', 'result': [
+                {'url': 'https://a.com/'}, {'url': 'https://b.com/'}, {'url': 'https://c.com/'}
+            ]}}
+
+        def scrape_url(self, url, **kwargs):
+            if url == 'https://c.com/':
+                raise RequestException('boom')
+            return {'url': url, 'result': {'markdown': url}}
+
+        def create_batch_crawl_request(self, urls, **kwargs):
+            self.batches.append(urls)
+            return {'uuid': ','.join(urls)}
+
+        def monitor_crawl_request(self, item_id, download=True):
+            for url in item_id.split(','):
+                yield {'type': 'result', 'data': {'url': url}}
+
+    def test_scrapes_hits_while_searching(self):
+        client = self.FakeClient()
+        pipeline = SearchScrapePipeline(client, 'query')
+        outcomes = []
+        for outcome in pipeline:
+            outcomes.append(outcome)
+            client.first_page_seen.set()
+        self.assertTrue(client.overlapped)
+        self.assertEqual(outcomes[0].item_id, 'https://a.com/')
+        self.assertCountEqual([o.item_id for o in outcomes], ['https://a.com/', 'https://b.com/', 'https://c.com/'])
+        self.assertEqual([o.item_id for o in outcomes if not o.ok], ['https://c.com/'])
+        self.assertEqual(pipeline.search_request['status'], 'finished')
+
+    def test_batches(self):
+        client = self.FakeClient()
+        client.first_page_seen.set()
+        outcomes = list(SearchScrapePipeline(client, 'query', batch_size=2, batch_wait=5))
+        self.assertEqual(len(outcomes), 3)
+        self.assertEqual(sorted(len(batch) for batch in client.batches), [1, 2])
+
+
+class TestSitemapCrawlPipeline(unittest.TestCase):
+    def make_client(self, feed):
+        client = TestSearchScrapePipeline.FakeClient()
+        client.create_sitemap_request = lambda url, options=None: {'uuid': 'sitemap-uuid'}
+        client.monitor_sitemap_request = lambda item_id, download=True: iter(feed + [
+            {'type': 'state', 'data': {'status': 'finished', 'result': 'https://files/sitemap.json'}},
+        ])
+        client.iter_sitemap_results = lambda request: iter([])
+        return client
+
+    def test_sitemap_feed_to_filtered_batches(self):
+        client = self.make_client([
+            {'type': 'feed', 'data': {'urls': ['https://a.com/docs/1', 'https://a.com/blog/1']}},
+            {'type': 'feed', 'data': {'url': 'https://a.com/docs/2'}},
+            {'type': 'feed', 'data': {'metadata': {'url': 'https://a.com/docs/1'}}},
+        ])
+        client.iter_sitemap_results = lambda request: iter([{'url': 'https://a.com/docs/3'}, 'https://a.com/docs/1'])
+        pipeline = SitemapCrawlPipeline(client, 'https://a.com', include=['/docs/*'], batch_size=2, batch_wait=5)
+        self.assertCountEqual([o.item_id for o in pipeline], ['https://a.com/docs/1', 'https://a.com/docs/2',
+                                                              'https://a.com/docs/3'])
+        self.assertEqual(client.batches[0], ['https://a.com/docs/1', 'https://a.com/docs/2'])
+        self.assertEqual(feed_urls({'metadata': {'urls': [{'url': 'https://x.com/'}]}}), ['https://x.com/'])
+
+    def test_urls_from_feed_messages(self):
+        client = self.make_client([
+            {'type': 'feed', 'data': {'type': 'info', 'message': 'Fetching https://www.a.com/robots.txt'}},
+            {'type': 'feed', 'data': {'type': 'info', 'message': 'Parsed https://a.com/sitemap.xml.'}},
+            {'type': 'feed', 'data': {'type': 'info', 'message': 'Found https://a.com/docs/1 (linked from '
+                                                                 'https://other.com/page)'}},
+            {'type': 'feed', 'data': {'type': 'info', 'message': 'Found https://www.a.com/docs/2, https://a.com/'}},
+        ])
+        pipeline = SitemapCrawlPipeline(client, 'a.com', batch_size=1, complete=False)
+        self.assertCountEqual([o.item_id for o in pipeline],
+                              ['https://a.com/docs/1', 'https://www.a.com/docs/2', 'https://a.com/'])
+
+
+class TestPostProcessor(unittest.TestCase):
+    def test_chunk_text(self):
+        text = '\n\n'.join(f'Sentence {i} is here. Another one follows.' for i in range(20))
+        chunks = chunk_text(text, max_tokens=30, overlap=8)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk.split()) <= 30 for chunk in chunks))
+        self.assertTrue(chunks[1].startswith('Sentence'))
+
+    def test_cleanup(self):
+        html = '<html><nav>Home</nav><script>x()</script><p>Hello &amp; welcome</p><footer>(c)</footer></html>'
+        self.assertEqual(html_to_text(html).strip(), 'Hello & welcome')
+        markdown = '[Home](/) [About](/about)\nBody text\nAccept all cookies\n'
+        self.assertEqual(strip_boilerplate(markdown).strip(), 'Body text')
+
+    def test_process_stream_keeps_page_order(self):
+        pages = [
+            {'type': 'state', 'data': {'status': 'running'}},
+            {'type': 'result', 'data': {'url': 'https://a.test', 'result': {'markdown': 'word ' * 100}}},
+            {'type': 'result', 'data': {'url': 'https://b.test', 'result': {'html': '<p>Short page.</p>'}}},
+            {'type': 'result', 'data': {'url': 'https://c.test', 'result': 'https://files.test/c.json'}},
+        ]
+        with PostProcessor(max_tokens=40, max_workers=2) as processor:
+            chunks = list(processor.process(iter(pages)))
+        self.assertEqual([(c.url, c.page_index, c.index) for c in chunks],
+                         [('https://a.test', 0, 0), ('https://a.test', 0, 1), ('https://a.test', 0, 2),
+                          ('https://b.test', 1, 0)])
+        self.assertEqual(chunks[0].count, 3)
+        self.assertEqual(chunks[-1].text, 'Short page.')
+        self.assertEqual(processor.skipped, 1)
+
+    def test_unordered(self):
+        pages = [{'url': f'https://x.test/{i}', 'result': {'markdown': f'Page {i}'}} for i in range(10)]
+        with PostProcessor(ordered=False, executor=ThreadPoolExecutor(2), max_pending=2) as processor:
+            chunks = list(processor.process(pages))
+        self.assertEqual(sorted(c.page_index for c in chunks), list(range(10)))
+
+
+class TestNearDuplicateFilter(unittest.TestCase):
+    TEXT = ' '.join(f'word{i}' for i in range(300))
+
+    def results(self):
+        return [
+            {'type': 'result', 'data': {'url': 'https://a.test/1', 'result': {'markdown': self.TEXT}}},
+            {'type': 'result', 'data': {'url': 'https://a.test/1?page=2', 'result': {'markdown': self.TEXT + ' x'}}},
+            {'type': 'state', 'data': {'status': 'running'}},
+            {'type': 'result', 'data': {'url': 'https://a.test/2', 'result': {'markdown': 'something else entirely'}}},
+            {'type': 'result', 'data': {'url': 'https://a.test/3', 'result': 'https://files.test/3.json'}},
+        ]
+
+    def test_lsh_bands(self):
+        bands, rows = lsh_bands(128, 0.8)
+        self.assertLessEqual(bands * rows, 128)
+        self.assertAlmostEqual((1 / bands) ** (1 / rows), 0.8, delta=0.05)
+
+    def test_filter(self):
+        dedup = NearDuplicateFilter(threshold=0.8, backend='python')
+        events = list(dedup.filter(self.results()))
+        self.assertEqual([e['type'] for e in events], ['result', 'state', 'result', 'result'])
+        self.assertEqual(dedup.duplicates, 1)
+        self.assertEqual(dedup.seen, 3)
+
+    def test_tag(self):
+        dedup = NearDuplicateFilter(mode='tag', backend='python', batch_size=1)
+        events = [e for e in dedup.filter(self.results()) if e['type'] == 'result']
+        self.assertEqual([e['data'].get('duplicate_of') for e in events],
+                         [None, 'https://a.test/1', None, None])
+        self.assertNotIn('duplicate_of', events[3]['data'])
+
+    def test_numpy_backend_matches(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest('numpy is not installed')
+        texts = [self.TEXT, 'short text', self.TEXT[:500]]
+        python = NearDuplicateFilter(backend='python')
+        vectorized = NearDuplicateFilter(backend='numpy')
+        self.assertEqual(python.add_many(enumerate(texts)), vectorized.add_many(enumerate(texts)))
+        self.assertEqual(python._signatures, vectorized._signatures)
+
+
+class TestLinkGraph(unittest.TestCase):
+    def graph(self, backend='python'):
+        results = [
+            {'type': 'result', 'data': {'url': 'https://a.test/', 'result': {'links': ['/x', '/y#top', 'https://b.test/']}}},
+            {'type': 'state', 'data': {'status': 'running'}},
+            {'url': 'https://a.test/x', 'result': {'links': [{'url': 'https://a.test/y'}, '/x', 'mailto:a@a.test']}},
+            {'url': 'https://a.test/y', 'result': {'links': ['/', '/', '/z']}},
+        ]
+        return LinkGraphBuilder(internal_only=True).add_results(results).build(backend=backend)
+
+    def test_csr(self):
+        graph = self.graph()
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.num_edges, 5)
+        self.assertEqual(graph.links('https://a.test/'), ['https://a.test/x', 'https://a.test/y'])
+        self.assertEqual(graph.out_degree('https://a.test/z'), 0)
+        self.assertEqual(graph.top_in_degree(1), [('https://a.test/y', 2)])
+
+    def test_pagerank(self):
+        ranks = self.graph().pagerank()
+        self.assertAlmostEqual(sum(ranks), 1.0, places=4)
+        self.assertEqual(len(ranks), 4)
+
+    def test_reachable(self):
+        graph = self.graph()
+        self.assertEqual(graph.reachable('https://a.test/x', max_depth=1), {'https://a.test/x', 'https://a.test/y'})
+        self.assertEqual(len(graph.reachable('https://a.test/x')), 4)
+        self.assertEqual(graph.reachable('https://a.test/z'), {'https://a.test/z'})
+
+    def test_sitemap_graph(self):
+        builder = LinkGraphBuilder().add_sitemap_graph({'https://a.test/': {'https://a.test/docs': ['https://a.test/docs/1']}})
+        builder.add_sitemap_graph({'edges': [{'source': 'https://a.test/docs/1', 'target': 'https://a.test/'}]})
+        graph = builder.build(backend='python')
+        self.assertEqual(graph.num_edges, 3)
+        self.assertEqual(len(graph.reachable('https://a.test/')), 3)
+
+    def test_numpy_backend_matches(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest('numpy is not installed')
+        python, vectorized = self.graph('python'), self.graph('numpy')
+        self.assertEqual(list(python.offsets), list(vectorized.offsets))
+        self.assertEqual(list(python.targets), list(vectorized.targets))
+        self.assertEqual(python.in_degrees(), vectorized.in_degrees())
+        for expected, actual in zip(python.pagerank(), vectorized.pagerank()):
+            self.assertAlmostEqual(expected, actual)
+        self.assertEqual(len(LinkGraphBuilder().build(backend='numpy')), 0)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_additive_increase_once_per_saturated_round(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=32, latency_tolerance=None)
+        for _ in range(5):
+            started = [limiter.acquire(timeout=1) for _ in range(limiter.limit)]
+            for start in started:
+                limiter.release(start, status=200)
+        self.assertEqual(limiter.limit, 9)
+        self.assertEqual(limiter.stats().increases, 5)
+
+        idle = AdaptiveLimiter(initial_limit=8, latency_tolerance=None)
+        for _ in range(40):
+            idle.release(idle.acquire(), status=200)
+        self.assertEqual(idle.limit, 8)
+
+        sequential = AdaptiveLimiter(initial_limit=1, latency_tolerance=None)
+        for _ in range(40):
+            sequential.release(sequential.acquire(), status=200)
+        self.assertEqual(sequential.limit, 2)
+
+    def test_multiplicative_decrease_once_per_round(self):
+        changes = []
+        limiter = AdaptiveLimiter(initial_limit=16)
+        limiter.add_listener(changes.append)
+        started = [limiter.acquire() for _ in range(4)]
+        for start in started:
+            limiter.release(start, status=429)
+        self.assertEqual(limiter.limit, 8)
+        limiter.release(limiter.acquire(), error=True)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(changes, [8, 4])
+        stats = limiter.stats()
+        self.assertEqual((stats.overloaded, stats.decreases, stats.in_flight), (5, 2, 0))
+
+    def test_recovers_after_latency_step(self):
+        limiter = AdaptiveLimiter(initial_limit=16, max_limit=16)
+
+        def run_round(latency):
+            started = [limiter.acquire(block=False) - latency for _ in range(limiter.limit)]
+            for start in started:
+                limiter.release(start, status=200)
+
+        for _ in range(20):
+            run_round(0.01)
+        self.assertEqual(limiter.limit, 16)
+        for _ in range(200):
+            run_round(0.03)
+        stats = limiter.stats()
+        self.assertGreater(stats.decreases, 0)
+        self.assertEqual(stats.limit, 16)
+        self.assertGreater(stats.latency_baseline, 0.025)
+
+    def test_blocks_at_limit(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        with self.assertRaises(TimeoutError):
+            limiter.acquire(timeout=0.01)
+        limiter.cancel()
+        limiter.acquire(timeout=0.01)
+
+    def test_client_reports_outcomes(self):
+        statuses = [503, 200]
+
+        class FakeSession:
+            headers = {}
+
+            def request(self, method, url, **kwargs):
+                response = Response()
+                response.status_code = statuses.pop(0)
+                response.headers['Content-Type'] = 'application/json'
+                response._content = b'{"uuid": "x"}'
+                return response
+
+        limiter = AdaptiveLimiter(initial_limit=6)
+        scheduler = Scheduler()
+        client = WaterCrawlAPIClient('key', transport=RequestsTransport(FakeSession()), scheduler=scheduler,
+                                     limiter=limiter)
+        self.assertEqual(scheduler.max_concurrency, 6)
+        with self.assertRaises(HTTPError):
+            client.get_crawl_request('x')
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual(scheduler.max_concurrency, 3)
+        client.get_crawl_request('x')
+        self.assertEqual(limiter.stats().completed, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,164 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    end: float
+    thread_id: int
+    span_id: str
+    parent_id: Optional[str]
+    args: Dict = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Tracer:
+    """
+    Records spans of client operations.
+
+    Pass a tracer to `WaterCrawlAPIClient` to record every HTTP call, response decode, event stream
+    event and helper such as `scrape_url`. Spans can be exported as a Chrome trace-event file (open it
+    in ``chrome://tracing`` or Perfetto) or as OTLP-compatible JSON span data.
+    """
+
+    def __init__(self, service_name: str = 'watercrawl-py'):
+        self.service_name = service_name
+        self.trace_id = os.urandom(16).hex()
+        self._origin_perf = time.perf_counter()
+        self._origin_ns = time.time_ns()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'client', **args):
+        """Record the enclosed block as a span, nested under the current span of this thread."""
+        stack = self.__stack()
+        span_id = os.urandom(8).hex()
+        parent_id = stack[-1] if stack else None
+        stack.append(span_id)
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            with self._lock:
+                self._spans.append(Span(name, category, start, end, threading.get_ident(), span_id, parent_id, args))
+
+    def wrap(self, func: Callable, name: str = None, category: str = 'client') -> Callable:
+        """Return ``func`` recording a span around every call."""
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def to_chrome_trace(self) -> dict:
+        """Spans as a Chrome trace-event document."""
+        pid = os.getpid()
+        events = [{
+            'name': span.name,
+            'cat': span.category,
+            'ph': 'X',
+            'ts': (span.start - self._origin_perf) * 1e6,
+            'dur': span.duration * 1e6,
+            'pid': pid,
+            'tid': span.thread_id,
+            'args': span.args,
+        } for span in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def to_otlp(self) -> dict:
+        """Spans as an OTLP/JSON ``ExportTraceServiceRequest`` document."""
+
+        def timestamp(value: float) -> str:
+            return str(self._origin_ns + int((value - self._origin_perf) * 1e9))
+
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {'key': key, 'value': {'boolValue': value}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            if isinstance(value, float):
+                return {'key': key, 'value': {'doubleValue': value}}
+            return {'key': key, 'value': {'stringValue': str(value)}}
+
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 3 if span.category == 'http' else 1,
+                'startTimeUnixNano': timestamp(span.start),
+                'endTimeUnixNano': timestamp(span.end),
+                'attributes': [attribute('category', span.category), attribute('thread.id', span.thread_id)] +
+                              [attribute(key, value) for key, value in span.args.items()],
+                'status': {'code': 2, 'message': span.args['error']} if 'error' in span.args else {'code': 1},
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            spans.append(otlp_span)
+
+        return {'resourceSpans': [{
+            'resource': {'attributes': [attribute('service.name', self.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'watercrawl'}, 'spans': spans}],
+        }]}
+
+    def export_otlp(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_otlp(), f, default=str)
+
+    def __stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+
+def traced(name: str = None):
+    """Decorator recording a span around a client method when the client has a tracer."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if getattr(self, 'tracer', None) is None:
+                return method(self, *args, **kwargs)
+            with self.tracer.span(name or method.__name__, 'helper'):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,388 @@
+import json as jsonlib
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, Optional, Set, Type, Union
+from urllib.parse import urlencode
+
+import requests
+import urllib3
+from requests.structures import CaseInsensitiveDict
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ConnectTimeout, HTTPError, ReadTimeout
+
+
+def encode_query_params(params: Optional[dict]) -> Optional[dict]:
+    """Encode query parameters the way requests does: None values are dropped and booleans become True/False."""
+    if not params:
+        return params
+    return {key: str(value) if isinstance(value, bool) else value for key, value in params.items() if value is not None}
+
+
+class Transport(ABC):
+    """
+    Interface between the client and an HTTP library.
+
+    A transport sends a request and returns an object exposing the subset of the ``requests.Response``
+    API used by the client: ``status_code``, ``headers``, ``content``, ``json()``, ``raise_for_status()``,
+    ``iter_content()``, ``close()`` and an optional ``raw`` stream with ``read1``.
+    Errors are raised as ``requests`` exceptions regardless of the underlying library.
+    """
+
+    #: Headers sent with every request
+    headers: Dict[str, str]
+
+    @abstractmethod
+    def request(self, method: str, url: str, params: dict = None, json=None, stream: bool = False,
+                timeout=None, **kwargs):
+        """Send a request and return its response; ``stream`` defers reading the body."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def patch(self, url: str, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+
+class _SessionHolder:
+    __slots__ = ('session', '__weakref__')
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+
+
+def _close_session(sessions: set, lock: threading.Lock, session: requests.Session):
+    with lock:
+        sessions.discard(session)
+    session.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Transport backed by ``requests``, the default.
+
+    ``requests.Session`` is not guaranteed to be thread-safe, so given a ``session_factory`` the transport
+    keeps one session per thread, all sending the shared `headers`. Given a ``session``, every thread uses it.
+    """
+
+    def __init__(self, session: requests.Session = None, session_factory: Callable[[], requests.Session] = None):
+        if session is not None and session_factory is not None:
+            raise ValueError('Pass either session or session_factory')
+        if session is None and session_factory is None:
+            session = requests.Session()
+        self._session = session
+        self._session_factory = session_factory
+        self._local = threading.local()
+        self._sessions: Set[requests.Session] = set()
+        self._lock = threading.Lock()
+        self.headers = session.headers if session is not None else CaseInsensitiveDict()
+
+    @property
+    def session(self) -> requests.Session:
+        """The session used by the calling thread, closed when the thread exits."""
+        if self._session is not None:
+            return self._session
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            session = self._session_factory()
+            session.headers = self.headers
+            holder = self._local.holder = _SessionHolder(session)
+            with self._lock:
+                self._sessions.add(session)
+            # Thread-local values are dropped when their thread ends, which runs the finalizer.
+            weakref.finalize(holder, _close_session, self._sessions, self._lock, session)
+        return holder.session
+
+    def request(self, method: str, url: str, params: dict = None, json=None, stream: bool = False,
+                timeout=None, **kwargs) -> requests.Response:
+        return self.session.request(method, url, params=params, json=json, stream=stream, timeout=timeout, **kwargs)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class Urllib3Response:
+    """Exposes a ``urllib3.BaseHTTPResponse`` through the ``requests.Response`` subset used by the client."""
+
+    def __init__(self, response, url: str, method: str):
+        self.raw = response
+        self.url = url
+        self.request = SimpleNamespace(url=url, method=method)
+        self._content = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def status_code(self) -> int:
+        return self.raw.status
+
+    @property
+    def reason(self) -> str:
+        return self.raw.reason
+
+    @property
+    def headers(self):
+        return self.raw.headers
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.raw.data
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self, **kwargs):
+        return jsonlib.loads(self.content, **kwargs)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise HTTPError(f'{self.status_code} {kind} Error: {self.reason} for url: {self.url}', response=self)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        if self._content is not None:
+            yield self._content
+            return
+        try:
+            yield from self.raw.stream(chunk_size, decode_content=True)
+        except urllib3.exceptions.ProtocolError as e:
+            raise ChunkedEncodingError(e)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise ConnectionError(e)
+
+    def close(self):
+        # Like requests, an unfinished stream closes its connection rather than returning it dirty to the pool.
+        self.raw.close()
+        self.raw.release_conn()
+
+
+class Urllib3Transport(Transport):
+    """
+    Low-overhead transport calling ``urllib3.PoolManager`` directly.
+
+    It skips the per-call work of ``requests.Session`` (hooks, settings merging, cookie handling),
+    which dominates the cost of small, frequent calls such as status checks.
+    """
+
+    def __init__(self, num_pools: int = 10, maxsize: int = 10, **pool_options):
+        """
+        Args:
+            num_pools: Number of per-host connection pools to cache
+            maxsize: Number of connections kept per host
+            pool_options: Extra keyword arguments passed to ``urllib3.PoolManager``
+        """
+        # Like requests: follow redirects, never retry a request that may have reached the server.
+        pool_options.setdefault('retries', urllib3.Retry(total=None, connect=0, read=False, status=0, other=0,
+                                                         redirect=30, raise_on_redirect=False))
+        self.pool = urllib3.PoolManager(num_pools=num_pools, maxsize=maxsize, **pool_options)
+        self.headers = {}
+
+    def request(self, method: str, url: str, params: dict = None, json=None, stream: bool = False,
+                timeout=None, **kwargs) -> Urllib3Response:
+        params = encode_query_params(params)
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(params, doseq=True)}"
+        headers = self.headers
+        body = None
+        if json is not None:
+            body = jsonlib.dumps(json).encode('utf-8')
+        if isinstance(timeout, tuple):
+            timeout = urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        elif timeout is None:
+            timeout = urllib3.Timeout(connect=None, read=None)
+
+        try:
+            response = self.pool.request(
+                method, url, body=body, headers=headers, timeout=timeout, preload_content=not stream, **kwargs
+            )
+        except urllib3.exceptions.ConnectTimeoutError as e:
+            raise ConnectTimeout(e)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise ReadTimeout(e)
+        except urllib3.exceptions.MaxRetryError as e:
+            if isinstance(e.reason, urllib3.exceptions.ConnectTimeoutError):
+                raise ConnectTimeout(e)
+            if isinstance(e.reason, urllib3.exceptions.ReadTimeoutError):
+                raise ReadTimeout(e)
+            raise ConnectionError(e)
+        except urllib3.exceptions.HTTPError as e:
+            raise ConnectionError(e)
+        return Urllib3Response(response, url, method)
+
+    def close(self):
+        self.pool.clear()
+
+
+class HTTPXResponse:
+    """Exposes an ``httpx.Response`` through the ``requests.Response`` subset used by the client."""
+
+    raw = None
+
+    def __init__(self, response):
+        self._response = response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def status_code(self) -> int:
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def request(self):
+        return self._response.request
+
+    @property
+    def http_version(self) -> str:
+        return self._response.http_version
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self, **kwargs):
+        self._response.read()
+        return self._response.json(**kwargs)
+
+    def raise_for_status(self):
+        if self._response.is_error:
+            reason = self._response.reason_phrase
+            raise HTTPError(f'{self.status_code} Error: {reason} for url: {self._response.url}', response=self)
+
+    def iter_content(self, chunk_size: int = None) -> Iterator[bytes]:
+        """
+        Yield the body as it arrives.
+
+        ``chunk_size`` is ignored: httpx holds sized chunks back until they are full, which would delay
+        event stream messages until the request finishes.
+        """
+        import httpx
+
+        try:
+            yield from self._response.iter_bytes()
+        except httpx.TransportError as e:
+            raise ConnectionError(e)
+
+    def iter_lines(self) -> Iterator[bytes]:
+        for line in self._response.iter_lines():
+            yield line.encode('utf-8')
+
+    def close(self):
+        self._response.close()
+
+
+class HTTPXTransport(Transport):
+    """
+    Transport built on httpx, with HTTP/2 enabled by default.
+
+    Requests to the same host are multiplexed over a few shared connections, so many concurrent
+    monitors and GETs do not each need their own TCP and TLS connection.
+    """
+
+    def __init__(self, http2: bool = True, max_connections: int = 20, **client_options):
+        """
+        Args:
+            http2: Negotiate HTTP/2 when the server supports it
+            max_connections: Maximum number of connections kept by the pool
+            client_options: Extra keyword arguments passed to ``httpx.Client``
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                'The httpx transport requires httpx with the h2 extra, install it with: '
+                'pip install "watercrawl-py[http2]"'
+            )
+        self._httpx = httpx
+        self.http2 = http2
+        client_options.setdefault('timeout', None)
+        client_options.setdefault('limits', httpx.Limits(max_connections=max_connections))
+        self.client = httpx.Client(http2=http2, **client_options)
+        self.headers = self.client.headers
+
+    def request(self, method: str, url: str, params: dict = None, json=None, stream: bool = False,
+                timeout=None, **kwargs) -> HTTPXResponse:
+        if timeout is not None:
+            kwargs['timeout'] = self._httpx.Timeout(None, connect=timeout[0], read=timeout[1]) \
+                if isinstance(timeout, tuple) else timeout
+        request = self.client.build_request(method, url, params=encode_query_params(params), json=json, **kwargs)
+        try:
+            return HTTPXResponse(self.client.send(request, stream=stream))
+        except self._httpx.ConnectTimeout as e:
+            raise ConnectTimeout(e)
+        except self._httpx.ReadTimeout as e:
+            raise ReadTimeout(e)
+        except self._httpx.TransportError as e:
+            raise ConnectionError(e)
+
+    def close(self):
+        self.client.close()
+
+
+TRANSPORTS: Dict[str, Type[Transport]] = {
+    'requests': RequestsTransport,
+    'urllib3': Urllib3Transport,
+    'httpx': HTTPXTransport,
+}
+
+
+def get_transport(transport: Union[str, Transport, None] = None, http2: bool = False) -> Transport:
+    """
+    Resolve a transport name (``requests``, ``urllib3``, ``httpx``) or instance.
+
+    ``http2`` selects the httpx transport by default and is passed on to it; other transports only speak HTTP/1.1.
+    """
+    if isinstance(transport, Transport):
+        return transport
+    if transport is None:
+        transport = 'httpx' if http2 else 'requests'
+    if transport not in TRANSPORTS:
+        raise ValueError(f'Unknown transport: {transport}. Supported transports are: {", ".join(TRANSPORTS)}.')
+    if transport == 'httpx':
+        return HTTPXTransport(http2=http2)
+    if http2:
+        raise ValueError(f'HTTP/2 requires the httpx transport, not {transport}.')
+    return TRANSPORTS[transport]()